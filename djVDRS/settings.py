@@ -48,8 +48,12 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'vds.middleware.QueryInstrumentationMiddleware',
 ]
 
+# Per-request SQL/latency instrumentation of the vds views (opt-in).
+VDS_INSTRUMENTATION = False
+
 ROOT_URLCONF = 'djVDRS.urls'
 
 TEMPLATES = [
@@ -77,9 +81,64 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # file-based test database, so threaded tests can share it
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# locmem is per process; with several workers use a shared backend, e.g.
+#   'django.core.cache.backends.filebased.FileBasedCache' with a LOCATION dir
+#   'django.core.cache.backends.db.DatabaseCache' (run `createcachetable`)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'djvdrs',
     }
 }
 
+# Cache used for the vds page fragments, and their safety-net lifetime in
+# seconds (fragments are invalidated by signals on every write).
+VDS_CACHE_ALIAS = 'default'
+VDS_CACHE_TIMEOUT = 600
+
+# vds_due_digest: report documents due within this many days
+VDS_DUE_DIGEST_DAYS = 14
+
+# Store the rendered details page of finalised transmittals with their
+# snapshot (vds.snapshots), so viewing them renders no template at all
+VDS_SNAPSHOT_HTML = True
+
+# Document and transmittal deletions (vds.deletion): selections larger than
+# the threshold are deleted by a background job, in batches of this size
+VDS_DELETE_BATCH = 1000
+VDS_DELETE_BACKGROUND_THRESHOLD = 2000
+# issues of more documents than this also run as a background job
+VDS_ISSUE_BACKGROUND_THRESHOLD = 2000
+
+# Background jobs (vds.jobs, run by manage.py vds_worker): attempts per job,
+# first retry delay in seconds (doubled per attempt), seconds between the
+# heartbeats of a running job, seconds without a heartbeat after which it is
+# considered abandoned, and where job files are kept
+VDS_JOB_MAX_ATTEMPTS = 3
+VDS_JOB_RETRY_DELAY = 30
+VDS_JOB_HEARTBEAT = 60
+VDS_JOB_TIMEOUT = 3600
+VDS_JOB_FILES_DIR = BASE_DIR / 'jobfiles'
+
+# Portfolio report (vds.portfolio): seconds it is cached, and months of
+# transmittals it counts
+VDS_PORTFOLIO_TIMEOUT = 60
+VDS_PORTFOLIO_MONTHS = 12
+
+# JSON API: most documents one batch request may create, update or issue,
+# and the bearer tokens scripts write with ({token: username of a staff user})
+VDS_API_MAX_BATCH = 5000
+VDS_API_TOKENS = {}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -1,9 +1,33 @@
 from django.contrib import admin
 
-from .models import Project, Document, Transmittal, Revision
+from . import snapshots
+from .models import (Project, Document, Transmittal, Revision, TransmittalSequence, ProjectStats,
+                     DigestSubscription, DueNotice, ProjectVersion, TransmittalSnapshot, Job)
 
 # Register your models here.
 admin.site.register(Project)
 admin.site.register(Document)
-admin.site.register(Transmittal)
 admin.site.register(Revision)
+admin.site.register(TransmittalSequence)
+admin.site.register(ProjectStats)
+admin.site.register(DigestSubscription)
+admin.site.register(DueNotice)
+admin.site.register(ProjectVersion)
+admin.site.register(TransmittalSnapshot)
+admin.site.register(Job)
+
+
+@admin.register(Transmittal)
+class TransmittalAdmin(admin.ModelAdmin):
+    actions = ['finalise', 'reopen']
+
+    @admin.action(description="Finalise selected transmittals")
+    def finalise(self, request, queryset):
+        for transmittal in queryset:
+            snapshots.finalise(transmittal)
+        self.message_user(request, f"{len(queryset)} transmittal(s) finalised.")
+
+    @admin.action(description="Reopen selected transmittals (drop their snapshot)")
+    def reopen(self, request, queryset):
+        reopened = sum(snapshots.reopen(transmittal) for transmittal in queryset)
+        self.message_user(request, f"{reopened} transmittal(s) reopened.")
@@ -0,0 +1,433 @@
+"""Versioned JSON API over projects, documents, transmittals and revisions.
+
+Plain Django views, routed under `api/v1/` in vds.urls:
+- list endpoints are keyset paginated like the HTML register (`page_size`,
+  `after`/`before` cursors) and return {"results", "next_cursor",
+  "previous_cursor"};
+- list and detail endpoints take `fields=a,b,c` to return only those
+  fields;
+- `projects/<id>/documents/batch/` creates and updates many documents
+  (`revision_number` and `latest_issue` are read-only: issuing sets them);
+- `projects/<id>/issue/` issues documents into a new transmittal.
+The batch endpoints run in one transaction with a number of queries that
+does not grow with the batch (beyond the backend's own bulk batching), and
+either apply everything or answer 400 with every error found.
+
+Write endpoints only accept `application/json` bodies and require an
+active staff user, either:
+- a script sending `Authorization: Bearer <token>` with a token of
+  settings.VDS_API_TOKENS ({token: username}), with no CSRF check, or
+- a browser logged in to the site, whose request must pass the usual CSRF
+  check (the `X-CSRFToken` header).
+"""
+import json
+from dataclasses import dataclass
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.csrf import csrf_exempt
+
+from . import stats, versions
+from .export import DOCUMENT_COLUMNS
+from .importer import NULLABLE_FIELDS, REQUIRED_FIELDS, UNIQUE_FIELDS
+from .models import Document, Project, Revision, Transmittal
+from .pagination import InvalidCursor, keyset_paginate
+
+
+@dataclass(frozen=True)
+class Resource:
+    model: type
+    fields: tuple
+    ordering: tuple
+
+
+PROJECT = Resource(Project, (
+    'id', 'wa_number', 'client_number', 'drm_ref_number', 'title', 'stub', 'client_title',
+    'country', 'location',
+), ('wa_number', 'id'))
+DOCUMENT = Resource(Document, (
+    'id', 'project_id', 'document_number', 'title', 'stub', 'discipline', 'vds_status',
+    'client_number', 'supplier_number', 'revision_number', 'required_by', 'first_issue',
+    'latest_issue', 'next_due', 'penalty', 'milestone', 'priority', 'notes',
+), ('document_number', 'id'))
+TRANSMITTAL = Resource(Transmittal, (
+    'id', 'project_id', 'number', 'source', 'date_sent', 'notes',
+), ('date_sent', 'id'))
+REVISION = Resource(Revision, (
+    'id', 'transmittal_id', 'document_id', 'revision_number', 'date', 'purpose',
+    'prepared_by', 'reviewed_by', 'approved_by', 'notes',
+), ('id',))
+
+# Document fields that mirror the latest revision (Document.latest_revision);
+# only issuing revisions changes them
+DERIVED_DOCUMENT_FIELDS = ('revision_number', 'latest_issue')
+# Document fields a batch may set: the other register columns
+WRITABLE_DOCUMENT_FIELDS = tuple(name for name, _ in DOCUMENT_COLUMNS
+                                 if name not in DERIVED_DOCUMENT_FIELDS)
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str, errors=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.errors = errors or []
+
+
+def _json(data, status: int = 200) -> JsonResponse:
+    return JsonResponse(data, status=status, encoder=DjangoJSONEncoder)
+
+
+def api_view(*methods):
+    """Restrict a view to `methods` and turn ApiError into a JSON error."""
+    def decorator(view):
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            if request.method not in methods:
+                response = _json({'error': f"method {request.method} not allowed"}, 405)
+                response['Allow'] = ', '.join(methods)
+                return response
+            try:
+                return view(request, *args, **kwargs)
+            except ApiError as exc:
+                body = {'error': exc.message}
+                if exc.errors:
+                    body['errors'] = exc.errors
+                return _json(body, exc.status)
+        return inner
+    return decorator
+
+
+class _CsrfCheck(CsrfViewMiddleware):
+    def _reject(self, request, reason):
+        return reason
+
+
+def _token_user(request):
+    """Return the user of the request's bearer token, or None if it sent none."""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer':
+        return None
+    tokens = getattr(settings, 'VDS_API_TOKENS', {})
+    username = next((name for known, name in tokens.items()
+                     if token and constant_time_compare(token, known)), None)
+    if username is None:
+        raise ApiError(401, "invalid API token")
+    user = get_user_model()._default_manager.filter(
+        **{get_user_model().USERNAME_FIELD: username}).first()
+    if user is None:
+        raise ApiError(401, "invalid API token")
+    return user
+
+
+def staff_write(view):
+    """Let only staff users call write endpoint `view` (see the module docstring)."""
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        user = _token_user(request)
+        if user is None:
+            user = request.user
+            if not user.is_authenticated:
+                raise ApiError(401, "authentication required")
+            # a session login is what a cross-site request would ride on
+            reason = _CsrfCheck(lambda request: None).process_view(request, None, (), {})
+            if reason:
+                raise ApiError(403, f"CSRF check failed: {reason}")
+        if not (user.is_active and user.is_staff):
+            raise ApiError(403, "only staff users may write through the API")
+        request.user = user
+        return view(request, *args, **kwargs)
+    return inner
+
+
+def _json_body(request) -> dict:
+    if request.content_type != 'application/json':
+        raise ApiError(415, "expected an application/json body")
+    try:
+        body = json.loads(request.body or b'{}')
+    except ValueError as exc:
+        raise ApiError(400, f"invalid JSON: {exc}")
+    if not isinstance(body, dict):
+        raise ApiError(400, "expected a JSON object")
+    return body
+
+
+def _max_batch() -> int:
+    return getattr(settings, 'VDS_API_MAX_BATCH', 5000)
+
+
+def _selected_fields(request, resource: Resource) -> tuple:
+    raw = request.GET.get('fields')
+    if not raw:
+        return resource.fields
+    fields = tuple(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in resource.fields]
+    if unknown:
+        raise ApiError(400, f"unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def _page_size(request) -> int:
+    default = getattr(settings, 'VDS_PAGE_SIZE', 100)
+    maximum = getattr(settings, 'VDS_MAX_PAGE_SIZE', 1000)
+    try:
+        size = int(request.GET.get('page_size', default))
+    except ValueError:
+        raise ApiError(400, "page_size must be an integer")
+    return max(1, min(size, maximum))
+
+
+def _list(request, resource: Resource, queryset) -> JsonResponse:
+    fields = _selected_fields(request, resource)
+    # the ordering fields are needed for the cursors, returned or not
+    loaded = fields + tuple(name for name in resource.ordering if name not in fields)
+    try:
+        page = keyset_paginate(queryset.values(*loaded), resource.ordering, _page_size(request),
+                               after=request.GET.get('after'), before=request.GET.get('before'))
+    except InvalidCursor:
+        raise ApiError(400, "invalid cursor")
+    return _json({
+        'results': [{name: row[name] for name in fields} for row in page.items],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    })
+
+
+def _detail(request, resource: Resource, pk) -> JsonResponse:
+    fields = _selected_fields(request, resource)
+    row = resource.model.objects.filter(pk=pk).values(*fields).first()
+    if row is None:
+        raise ApiError(404, f"{resource.model._meta.model_name} {pk} not found")
+    return _json(row)
+
+
+def _require(model, pk):
+    if not model.objects.filter(pk=pk).exists():
+        raise ApiError(404, f"{model._meta.model_name} {pk} not found")
+
+
+def _get_project(project_id) -> Project:
+    try:
+        return Project.objects.get(pk=project_id)
+    except Project.DoesNotExist:
+        raise ApiError(404, f"project {project_id} not found")
+
+
+@api_view('GET')
+def project_list(request):
+    return _list(request, PROJECT, Project.objects.all())
+
+
+@api_view('GET')
+def project_detail(request, project_id):
+    return _detail(request, PROJECT, project_id)
+
+
+@api_view('GET')
+def document_list(request, project_id):
+    _require(Project, project_id)
+    return _list(request, DOCUMENT, Document.objects.filter(project_id=project_id))
+
+
+@api_view('GET')
+def document_detail(request, document_id):
+    return _detail(request, DOCUMENT, document_id)
+
+
+@api_view('GET')
+def document_revisions(request, document_id):
+    _require(Document, document_id)
+    return _list(request, REVISION, Revision.objects.filter(document_id=document_id))
+
+
+@api_view('GET')
+def transmittal_list(request, project_id):
+    _require(Project, project_id)
+    return _list(request, TRANSMITTAL, Transmittal.objects.filter(project_id=project_id))
+
+
+@api_view('GET')
+def transmittal_detail(request, transmittal_id):
+    return _detail(request, TRANSMITTAL, transmittal_id)
+
+
+@api_view('GET')
+def transmittal_revisions(request, transmittal_id):
+    _require(Transmittal, transmittal_id)
+    return _list(request, REVISION, Revision.objects.filter(transmittal_id=transmittal_id))
+
+
+# Batch writes ----------------------------------------------------------
+
+def _clean_document(index: int, item, errors: list, creating: bool) -> dict:
+    """Validate one batch item; return its cleaned field values."""
+    where = f"{'create' if creating else 'update'}[{index}]"
+    if not isinstance(item, dict):
+        errors.append(f"{where}: expected an object")
+        return {}
+    data = {}
+    for name, value in item.items():
+        if name == 'id':
+            continue
+        if name in DERIVED_DOCUMENT_FIELDS:
+            errors.append(f"{where}.{name}: is read-only, set by issuing revisions")
+            continue
+        if name not in WRITABLE_DOCUMENT_FIELDS:
+            errors.append(f"{where}.{name}: not a writable field")
+            continue
+        model_field = Document._meta.get_field(name)
+        if value is None and model_field.null is False and model_field.has_default():
+            value = model_field.get_default()
+        # a blank number is no number: the unique constraints only exempt NULL
+        if name in NULLABLE_FIELDS and isinstance(value, str) and not value.strip():
+            value = None
+        try:
+            data[name] = model_field.clean(value, None)
+        except ValidationError as exc:
+            errors.append(f"{where}.{name}: {' '.join(exc.messages)}")
+    if creating:
+        for name in REQUIRED_FIELDS:
+            if name not in item:
+                errors.append(f"{where}.{name}: is required")
+    return data
+
+
+def _check_unique(changes: list, errors: list):
+    """Flag unique values used twice in the batch or by other documents.
+
+    `changes` holds (label, document id or None, data) of every item; one
+    query per unique column looks up the values in use.
+    """
+    for name in UNIQUE_FIELDS:
+        values = {}
+        for label, pk, data in changes:
+            value = data.get(name)
+            if not value:
+                continue
+            if value in values:
+                errors.append(f"{label}.{name}: '{value}' is also used by {values[value][0]}")
+            else:
+                values[value] = (label, pk)
+        if not values:
+            continue
+        for value, owner in Document.objects.filter(**{f'{name}__in': list(values)}).values_list(
+                name, 'id'):
+            label, pk = values[value]
+            if owner != pk:
+                errors.append(f"{label}.{name}: '{value}' already exists")
+
+
+@csrf_exempt
+@api_view('POST')
+@staff_write
+def document_batch(request, project_id):
+    """Create and update documents of a project in one transaction.
+
+    Body: {"create": [{field: value, ...}], "update": [{"id": 1, field: value}]}.
+    Answers {"created": [{id, document_number}], "updated": [ids]}.
+    """
+    body = _json_body(request)
+    creates, updates = body.get('create') or [], body.get('update') or []
+    if not isinstance(creates, list) or not isinstance(updates, list):
+        raise ApiError(400, "'create' and 'update' must be lists")
+    if len(creates) + len(updates) > _max_batch():
+        raise ApiError(400, f"at most {_max_batch()} documents per batch")
+    project = _get_project(project_id)
+
+    errors = []
+    new_data = [_clean_document(i, item, errors, creating=True) for i, item in enumerate(creates)]
+    update_data = {}
+    for i, item in enumerate(updates):
+        pk = item.get('id') if isinstance(item, dict) else None
+        # (bool is an int subclass: `true` is not document 1)
+        if not isinstance(pk, int) or isinstance(pk, bool):
+            errors.append(f"update[{i}].id: is required")
+            continue
+        if pk in update_data:
+            errors.append(f"update[{i}].id: document {pk} is updated twice")
+            continue
+        update_data[pk] = (i, _clean_document(i, item, errors, creating=False))
+
+    documents = project.documents.in_bulk(list(update_data)) if update_data else {}
+    for pk, (i, _) in update_data.items():
+        if pk not in documents:
+            errors.append(f"update[{i}].id: document {pk} not found in project {project.wa_number}")
+    _check_unique(
+        [(f"create[{i}]", None, data) for i, data in enumerate(new_data)]
+        + [(f"update[{i}]", pk, data) for pk, (i, data) in update_data.items()],
+        errors,
+    )
+    if errors:
+        raise ApiError(400, "invalid batch, nothing was written", errors)
+
+    delta = stats.Counter()
+    changed_fields = set()
+    changed = []
+    for pk, (_, data) in update_data.items():
+        document = documents[pk]
+        before = stats.document_contributions(document)
+        for name, value in data.items():
+            if getattr(document, name) != value:
+                setattr(document, name, value)
+                changed_fields.add(name)
+        changed.append(document)
+        delta.update(stats.difference(before, stats.document_contributions(document)))
+    new_documents = [Document(project=project, **data) for data in new_data]
+    for document in new_documents:
+        delta.update(stats.document_contributions(document))
+
+    with transaction.atomic():
+        if new_documents:
+            Document.objects.bulk_create(new_documents)
+        if changed_fields:
+            Document.objects.bulk_update(changed, sorted(changed_fields))
+        stats.apply(delta)
+        if new_documents or changed_fields:
+            versions.touch(project.pk)
+    return _json({
+        'created': [{'id': d.pk, 'document_number': d.document_number} for d in new_documents],
+        'updated': [d.pk for d in changed],
+    }, status=201 if new_documents else 200)
+
+
+@csrf_exempt
+@api_view('POST')
+@staff_write
+def issue(request, project_id):
+    """Issue documents of a project into a new transmittal.
+
+    Body: {"documents": [ids], "source": optional transmittal source}.
+    Answers the new transmittal and its revisions.
+    """
+    body = _json_body(request)
+    ids = body.get('documents')
+    if not isinstance(ids, list) or not ids or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids):
+        raise ApiError(400, "'documents' must be a non-empty list of document ids")
+    if len(ids) > _max_batch():
+        raise ApiError(400, f"at most {_max_batch()} documents per batch")
+    source = body.get('source')
+    if source is not None and not isinstance(source, str):
+        raise ApiError(400, "'source' must be a string")
+    project = _get_project(project_id)
+
+    found = set(project.documents.filter(pk__in=ids).values_list('id', flat=True))
+    missing = [pk for pk in dict.fromkeys(ids) if pk not in found]
+    if missing:
+        raise ApiError(400, "invalid batch, nothing was written",
+                       [f"document {pk} not found in project {project.wa_number}"
+                        for pk in missing])
+
+    with transaction.atomic(), versions.batch():
+        transmittal = project.create_transmittal(source)
+        revisions = transmittal.issue_documents(ids)
+    return _json({
+        'transmittal': {name: getattr(transmittal, name) for name in TRANSMITTAL.fields},
+        'revisions': [{name: getattr(r, name) for name in REVISION.fields} for r in revisions],
+    }, status=201)
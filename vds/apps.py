@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class VdsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'vds'
+
+    def ready(self):
+        # connect the cache invalidation handlers
+        from . import signals
+        post_migrate.connect(signals.ensure_search_index, sender=self,
+                             dispatch_uid='vds_search_index')
@@ -0,0 +1,310 @@
+"""Synthetic-data benchmarks of the vds hot paths.
+
+Used by `manage.py vds_bench`. `build_dataset` fills the database with
+synthetic projects, documents, transmittals and revisions using bulk
+inserts; `run_scenarios` times the model methods and views that matter
+(through the test client for views) and returns, per scenario, the median
+wall time, the number of queries and the peak Python memory. `compare`
+flags regressions of such a result against a saved baseline.
+`drop_dataset` removes such projects again (`vds_bench --in-place`).
+`instrumentation_overhead` is the relative cost of the opt-in
+QueryInstrumentationMiddleware, from the same page timed with it off and on.
+
+`run_throughput` compares concurrent-request throughput of the read-only
+pages through Django's WSGI handler (a thread per concurrent client) and
+its ASGI handler (concurrent coroutines on one event loop), both driven in
+process by the test clients, so no server is needed. The data must be
+committed, since the threads use their own database connections.
+"""
+import asyncio
+import datetime
+import statistics
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection, connections, transaction
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from . import deletion, portfolio, stats, versions
+from .middleware import QueryRecorder
+from .models import Project, Document, Revision
+
+INSERT_BATCH = 2000
+
+
+def _bulk_insert(model, objects):
+    for start in range(0, len(objects), INSERT_BATCH):
+        model.objects.bulk_create(objects[start:start + INSERT_BATCH])
+
+
+def build_dataset(projects: int, documents: int, revisions: int, prefix: str = 'BENCH') -> list:
+    """Create `projects` projects of `documents` documents each.
+
+    Every document gets `revisions` revisions, issued in one transmittal per
+    revision round, and its revision_number/latest_issue/latest_revision set
+    accordingly.
+    Returns the created projects.
+    """
+    start_date = datetime.date(2020, 1, 1)
+    created = []
+    with transaction.atomic():
+        for p in range(projects):
+            project = Project.objects.create(
+                wa_number=f'{prefix}-{p:04d}', client_number=f'C-{p}', drm_ref_number=f'D-{p}',
+                title=f'Benchmark project {p}', stub='BP', client_title='Bench', country='Nowhere',
+            )
+            last_date = start_date + datetime.timedelta(days=7 * (revisions - 1)) if revisions else None
+            last_label = str(revisions - 1) if revisions else None
+            docs = [
+                Document(project=project, title=f'Document {d}', stub=f'S{d % 50}',
+                         discipline=('MECH', 'ELEC', 'CIV', 'INST')[d % 4],
+                         document_number=f'{prefix}-{p:04d}-{d:07d}',
+                         client_number=f'{prefix}C-{p:04d}-{d:07d}',
+                         revision_number=last_label, latest_issue=last_date,
+                         first_issue=start_date if revisions else None,
+                         next_due=start_date + datetime.timedelta(days=d % 400),
+                         penalty=d % 17 == 0, milestone=d % 23 == 0, priority=d % 31 == 0)
+                for d in range(documents)
+            ]
+            _bulk_insert(Document, docs)
+            doc_ids = list(project.documents.values_list('id', flat=True))
+            for r in range(revisions):
+                date = start_date + datetime.timedelta(days=7 * r)
+                transmittal = project.transmittals.create(
+                    number=f'{prefix}-{p:04d}-TR-{r + 1:03d}', source='HOUSE', date_sent=date)
+                _bulk_insert(Revision, [
+                    Revision(transmittal=transmittal, document_id=doc_id, revision_number=str(r),
+                             date=date, purpose='IFR - Issued for Review', prepared_by='AB',
+                             reviewed_by='CD', approved_by='EF')
+                    for doc_id in doc_ids
+                ])
+            Document.refresh_latest_revision(project.documents.all())
+            created.append(project)
+        # the bulk inserts above bypass the incremental statistics and versions
+        stats.rebuild([project.id for project in created])
+        versions.touch(*[project.id for project in created])
+    return created
+
+
+def drop_dataset(projects) -> None:
+    """Delete `projects` made by `build_dataset` and all they hold.
+
+    The documents and their revisions go with one set-based DELETE per
+    table (vds.deletion); what is left per project is a few rows.
+    """
+    for project in projects:
+        deletion.delete_documents(project, list(project.documents.values_list('id', flat=True)))
+    Project.objects.filter(pk__in=[project.pk for project in projects]).delete()
+
+
+def measure(func, repeat: int = 5) -> dict:
+    """Run `func` `repeat` times and return timing, query and memory figures.
+
+    Timings are taken without tracing; one extra traced run measures the
+    peak memory so tracemalloc does not distort the times.
+    """
+    times = []
+    queries = 0
+    for _ in range(repeat):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        queries = recorder.count
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'time_ms': round(statistics.median(times) * 1000, 3),
+        'min_ms': round(min(times) * 1000, 3),
+        'queries': queries,
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def _get(client, url):
+    def run():
+        response = client.get(url)
+        assert response.status_code == 200, (url, response.status_code)
+        # consume streaming responses so their queries are measured too
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+    return run
+
+
+def scenarios(project: Project, issue_size: int = 500) -> dict:
+    """Return {scenario name: callable} for the given benchmark project."""
+    client = Client()
+    documents = list(project.documents.order_by('id').values_list('id', flat=True))
+    transmittal = project.transmittals.order_by('-date_sent', '-id').first()
+    issue_ids = [str(pk) for pk in documents[:issue_size]]
+    revision_ids = iter(documents)
+
+    def create_transmittal():
+        project.create_transmittal()
+
+    def revision_new():
+        target = project.transmittals.order_by('-id').first()
+        Revision.revision_new(target.id, next(revision_ids))
+
+    # the middleware is set up with a client's handler on its first request,
+    # so this client keeps it for good
+    instrumented = Client()
+    with override_settings(VDS_INSTRUMENTATION=True):
+        instrumented.get(reverse('vds:index'))
+
+    def issue():
+        response = client.post(reverse('vds:document_list', args=(project.id,)),
+                                {'action': 'issue', 'selected': issue_ids})
+        assert response.status_code == 200, response.status_code
+
+    result = {
+        'create_transmittal': create_transmittal,
+        'revision_new': revision_new,
+        'issue': issue,
+        'document_list': _get(client, reverse('vds:document_list', args=(project.id,))),
+        'document_list_instrumented': _get(
+            instrumented, reverse('vds:document_list', args=(project.id,))),
+        'index': _get(client, reverse('vds:index')),
+        # uncached, over every project in the database
+        'portfolio': portfolio.build,
+        # a client number fragment, searched across all projects
+        'search': _get(client, reverse('vds:document_search') + '?q=0-000012'),
+    }
+    if transmittal is not None:
+        result['transmittal_details'] = _get(
+            client, reverse('vds:transmittal_details', args=(transmittal.id,)))
+    return result
+
+
+def throughput_pages(project: Project) -> dict:
+    """Return {page name: URL} of the read-only pages served asynchronously."""
+    pages = {
+        'index': reverse('vds:index'),
+        'project_details': reverse('vds:project_details', args=(project.id,)),
+        'document_list': reverse('vds:document_list', args=(project.id,)),
+        'transmittal_list': reverse('vds:transmittal_list', args=(project.id,)),
+    }
+    transmittal = project.transmittals.order_by('-date_sent', '-id').first()
+    if transmittal is not None:
+        pages['transmittal_details'] = reverse('vds:transmittal_details', args=(transmittal.id,))
+    return pages
+
+
+def _throughput_figures(latencies: list, elapsed: float) -> dict:
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3),
+    }
+
+
+def wsgi_throughput(url: str, concurrency: int, requests: int) -> dict:
+    """GET `url` `requests` times from `concurrency` threads (WSGI handler)."""
+    local = threading.local()
+    latencies = []
+
+    def get(_):
+        if not hasattr(local, 'client'):
+            local.client = Client()
+        start = time.perf_counter()
+        response = local.client.get(url)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, (url, response.status_code)
+
+    def close(_):
+        connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        list(executor.map(get, range(requests)))
+        elapsed = time.perf_counter() - start
+        # drop the connections the worker threads opened
+        list(executor.map(close, range(concurrency)))
+    return _throughput_figures(latencies, elapsed)
+
+
+def asgi_throughput(url: str, concurrency: int, requests: int) -> dict:
+    """GET `url` `requests` times from `concurrency` coroutines (ASGI handler)."""
+    latencies = []
+
+    async def main():
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def get():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(url)
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200, (url, response.status_code)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(get() for _ in range(requests)))
+        return time.perf_counter() - start
+
+    elapsed = asyncio.run(main())
+    return _throughput_figures(latencies, elapsed)
+
+
+def run_throughput(project: Project, concurrency: int = 8, requests: int = 200,
+                   only=None) -> dict:
+    """Return {page: {'wsgi': figures, 'asgi': figures}} for the async pages."""
+    results = {}
+    for name, url in throughput_pages(project).items():
+        if only and name not in only:
+            continue
+        results[name] = {
+            'wsgi': wsgi_throughput(url, concurrency, requests),
+            'asgi': asgi_throughput(url, concurrency, requests),
+        }
+    return results
+
+
+def run_scenarios(project: Project, repeat: int = 5, issue_size: int = 500,
+                  only=None) -> dict:
+    results = {}
+    for name, func in scenarios(project, issue_size).items():
+        if only and name not in only:
+            continue
+        results[name] = measure(func, repeat)
+    return results
+
+
+def instrumentation_overhead(results: dict) -> float | None:
+    """Percentage the instrumentation middleware adds to document_list, if both ran."""
+    plain = results.get('document_list')
+    instrumented = results.get('document_list_instrumented')
+    if not plain or not instrumented or not plain['time_ms']:
+        return None
+    return round((instrumented['time_ms'] / plain['time_ms'] - 1) * 100, 1)
+
+
+def compare(current: dict, baseline: dict, threshold: float = 0.2) -> list[str]:
+    """Return regressions of `current` scenario results against `baseline`.
+
+    A scenario regresses when its median time grows by more than
+    `threshold` (a fraction), or when it runs more queries than before.
+    """
+    regressions = []
+    for name, now in sorted(current.items()):
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if before['time_ms'] and now['time_ms'] > before['time_ms'] * (1 + threshold):
+            regressions.append(
+                f"{name}: time {before['time_ms']} ms -> {now['time_ms']} ms "
+                f"(+{(now['time_ms'] / before['time_ms'] - 1) * 100:.0f}%)")
+        if now['queries'] > before['queries']:
+            regressions.append(f"{name}: queries {before['queries']} -> {now['queries']}")
+    return regressions
@@ -0,0 +1,60 @@
+"""Cached fragments of the vds pages.
+
+The index page shows the latest projects and the most recent transmittals.
+Both fragments are rendered once and kept in the cache named by the
+`VDS_CACHE_ALIAS` setting ('default' unless configured), so any of
+Django's backends (locmem, file, database, ...) can be used. They are
+invalidated by the signal handlers in `vds.signals` whenever a Project or
+Transmittal is saved or deleted; `VDS_CACHE_TIMEOUT` is only a safety net.
+
+With several worker processes, use a shared backend (file or database):
+a locmem cache can only be invalidated in the process that did the write.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+LATEST_PROJECTS_KEY = 'vds:index:latest_projects'
+RECENT_TRANSMITTALS_KEY = 'vds:index:recent_transmittals'
+
+
+def get_cache():
+    return caches[getattr(settings, 'VDS_CACHE_ALIAS', 'default')]
+
+
+def cached_fragment(key: str, template_name: str, context_factory) -> str:
+    """Return the rendered `template_name`, from the cache when possible.
+
+    `context_factory` is only called (and so the database only queried) on
+    a cache miss.
+    """
+    cache = get_cache()
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string(template_name, context_factory())
+        cache.set(key, html, getattr(settings, 'VDS_CACHE_TIMEOUT', 600))
+    return mark_safe(html)
+
+
+async def acached_fragment(key: str, template_name: str, context_factory) -> str:
+    """Async version of `cached_fragment`; `context_factory` is a coroutine
+    function, which must load everything the template needs."""
+    cache = get_cache()
+    html = await cache.aget(key)
+    if html is None:
+        html = render_to_string(template_name, await context_factory())
+        await cache.aset(key, html, getattr(settings, 'VDS_CACHE_TIMEOUT', 600))
+    return mark_safe(html)
+
+
+def invalidate(*keys: str):
+    """Drop cached fragments now and again when the transaction commits.
+
+    The second delete covers a request that re-filled the cache from the
+    old rows while the writing transaction was still open.
+    """
+    cache = get_cache()
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,157 @@
+"""Returned client comment sheets, applied to a transmittal's revisions.
+
+A client returns a transmittal with a review code per document. The sheet
+is a CSV with the document number, the revision, and any of the review
+code, the client reviewer and notes (a header of field names or of the
+usual labels, see COLUMNS). Applying it:
+- parses and validates every row against the Revision fields; a blank
+  cell leaves the stored value as it is;
+- matches all rows to the transmittal's revisions by (document number,
+  revision) with one query;
+- writes the rows that change something with one `bulk_update` of the
+  changed columns, in a single transaction (skipped with `dry_run`).
+Rows that match no revision of the transmittal, repeat an earlier row or
+hold invalid values are reported and skipped.
+"""
+from dataclasses import dataclass, field
+
+from django.db import transaction
+
+from . import versions
+from .importer import NotUtf8, RowIssue, read_rows
+from .models import Revision
+
+# Revision field -> accepted column headers (lower case)
+COLUMNS = {
+    'document_number': ('document_number', 'document number', 'document'),
+    'revision_number': ('revision_number', 'revision number', 'revision', 'rev'),
+    'review_code': ('review_code', 'review code', 'code', 'status'),
+    'client_reviewer': ('client_reviewer', 'client reviewer', 'reviewer'),
+    'notes': ('notes', 'comments', 'comment'),
+}
+KEY_FIELDS = ('document_number', 'revision_number')
+UPDATE_FIELDS = ('review_code', 'client_reviewer', 'notes')
+
+
+@dataclass
+class CommentSheetResult:
+    rows: int = 0
+    matched: int = 0
+    updated: int = 0
+    unmatched: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+    dry_run: bool = False
+
+
+def _header_map(header) -> dict:
+    """Map each CSV column index to a field name."""
+    known = {label: name for name, labels in COLUMNS.items() for label in labels}
+    mapping = {}
+    for index, column in enumerate(header):
+        name = known.get((column or '').strip().lower())
+        if name is not None and name not in mapping.values():
+            mapping[index] = name
+    return mapping
+
+
+def _parse_row(line: int, values: dict) -> tuple[dict, list]:
+    data = {}
+    errors = []
+    for name, raw in values.items():
+        raw = (raw or '').strip()
+        if not raw:
+            continue
+        max_length = (Revision._meta.get_field(name).max_length if name in UPDATE_FIELDS
+                      else None)
+        if max_length and len(raw) > max_length:
+            errors.append(RowIssue(line, name, raw, f"is longer than {max_length} characters"))
+        data[name] = raw
+    for name in KEY_FIELDS:
+        if not data.get(name):
+            errors.append(RowIssue(line, name, '', "is required"))
+    return data, errors
+
+
+def apply_comment_sheet(transmittal, stream, dry_run: bool = False) -> CommentSheetResult:
+    """Apply the comment sheet read from text `stream` to `transmittal`.
+
+    The number of queries does not depend on the number of rows beyond the
+    backend's own bulk update batching. With `dry_run`, nothing is written.
+    """
+    result = CommentSheetResult(dry_run=dry_run)
+    lines = read_rows(stream)
+    try:
+        _, header = next(lines, (1, None))
+    except NotUtf8 as exc:
+        result.errors.append(exc.issue("nothing was applied"))
+        return result
+    if header is None:
+        return result
+    mapping = _header_map(header)
+    missing = [name for name in KEY_FIELDS if name not in mapping.values()]
+    if not set(UPDATE_FIELDS) & set(mapping.values()):
+        missing.append(' or '.join(UPDATE_FIELDS))
+    if missing:
+        result.errors.append(RowIssue(1, ', '.join(missing), '', "column is missing"))
+        return result
+
+    # (document number, revision) -> (line, values to set)
+    rows = {}
+    try:
+        for line, row in lines:
+            result.rows += 1
+            data, errors = _parse_row(line, {
+                name: row[index] for index, name in mapping.items() if index < len(row)
+            })
+            if errors:
+                result.errors.extend(errors)
+                continue
+            key = (data.pop('document_number'), data.pop('revision_number'))
+            if key in rows:
+                result.errors.append(RowIssue(line, 'document_number', key[0],
+                                              f"rev {key[1]} repeats line {rows[key][0]}"))
+                continue
+            rows[key] = (line, data)
+    except NotUtf8 as exc:
+        # nothing is written from a sheet that could not be read to the end
+        result.errors.append(exc.issue("nothing was applied"))
+        return result
+    if not rows:
+        return result
+
+    revisions = {
+        (revision.document.document_number, revision.revision_number): revision
+        for revision in (Revision.objects.filter(
+            transmittal=transmittal,
+            document__document_number__in={number for number, _ in rows})
+            .select_related('document').only('id', 'revision_number', 'document__document_number',
+                                             *UPDATE_FIELDS))
+    }
+    changed = []
+    columns = set()
+    for key, (line, data) in rows.items():
+        revision = revisions.get(key)
+        if revision is None:
+            result.unmatched.append(RowIssue(line, 'document_number', key[0],
+                                             f"rev {key[1]} is not in this transmittal"))
+            continue
+        result.matched += 1
+        updates = {name: value for name, value in data.items() if getattr(revision, name) != value}
+        for name, value in updates.items():
+            setattr(revision, name, value)
+        if updates:
+            columns.update(updates)
+            changed.append(revision)
+    result.updated = len(changed)
+    if changed and not dry_run:
+        with transaction.atomic():
+            Revision.objects.bulk_update(changed, sorted(columns))
+            versions.touch(transmittal.project_id)
+    return result
+
+
+def reviews(transmittal):
+    """Return the client review stored for each revision of `transmittal`, as dicts."""
+    return (Revision.objects.filter(transmittal=transmittal)
+            .order_by('document__document_number')
+            .values('document__document_number', 'revision_number', *UPDATE_FIELDS))
@@ -0,0 +1,186 @@
+"""Register consistency checks, used by `manage.py vds_check`.
+
+Each check is a set-based query over the whole database:
+- stale documents: `revision_number`, `latest_issue` or `latest_revision`
+  differ from the document's newest revision (by date, then id), found
+  with a ROW_NUMBER() window over the revisions and a null-safe CASE
+  comparison with the document columns; documents without revisions only
+  have their pointer checked, since an imported register may carry a
+  label issued before the document was tracked here;
+- orphaned transmittals: transmittals without any revision (NOT EXISTS);
+- labels: labels used twice for one document (a COUNT() window over
+  each document's labels), and labels that do not follow the previous
+  revision's label by the rules of vds.utils.next_revision_label, read
+  in one pass with a LAG() window.
+`fix_documents` copies the newest revision back onto stale documents with
+`bulk_update`, one transaction per batch, keeping the statistics (vds.stats)
+and change versions (vds.versions) in step. `fix_orphans` deletes orphaned
+transmittals older than today that are not finalised; a transmittal
+created today may still be filled. Label problems are only reported:
+issued labels have been sent out and are not rewritten here.
+"""
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models import BooleanField, Case, Count, Exists, F, OuterRef, Q, Value, When, Window
+from django.db.models.functions import Lag, RowNumber
+from django.utils import timezone
+
+from . import stats, versions
+from .models import Document, Revision, Transmittal, TransmittalSnapshot
+from .utils import next_revision_label
+
+DOCUMENT_FIX_FIELDS = ('revision_number', 'latest_issue', 'latest_revision')
+
+
+@dataclass
+class StaleDocument:
+    id: int
+    project_id: int
+    document_number: str
+    # (revision_number, latest_issue, latest_revision_id) stored and expected
+    stored: tuple
+    expected: tuple
+
+
+@dataclass
+class LabelProblem:
+    document_id: int
+    document_number: str
+    revision_id: int
+    label: str
+    problem: str
+
+
+@dataclass
+class CheckResult:
+    stale_documents: list = field(default_factory=list)
+    orphan_transmittals: list = field(default_factory=list)
+    label_problems: list = field(default_factory=list)
+
+    @property
+    def problems(self) -> int:
+        return len(self.stale_documents) + len(self.orphan_transmittals) + len(self.label_problems)
+
+
+def stale_documents() -> list:
+    """Documents whose stored latest revision is not their newest one (two queries)."""
+    in_step = Q(document__revision_number=F('revision_number'), document__latest_issue=F('date'),
+                document__latest_revision=F('pk'))
+    ranked = (Revision.objects
+              .annotate(rank=Window(RowNumber(), partition_by=[F('document_id')],
+                                    order_by=[F('date').desc(), F('id').desc()]))
+              .filter(rank=1).values('pk').order_by())
+    newest = (
+        Revision.objects.filter(pk__in=ranked)
+        # a NULL stored value never matches, so it counts as stale
+        .annotate(stale=Case(When(in_step, then=Value(False)), default=Value(True),
+                             output_field=BooleanField()))
+        .filter(stale=True)
+        .values('id', 'revision_number', 'date', 'document_id', 'document__project_id',
+                'document__document_number', 'document__revision_number',
+                'document__latest_issue', 'document__latest_revision')
+    )
+    result = [
+        StaleDocument(row['document_id'], row['document__project_id'],
+                      row['document__document_number'],
+                      (row['document__revision_number'], row['document__latest_issue'],
+                       row['document__latest_revision']),
+                      (row['revision_number'], row['date'], row['id']))
+        for row in newest
+    ]
+    pointing_elsewhere = (
+        Document.objects.filter(latest_revision__isnull=False)
+        .exclude(Exists(Revision.objects.filter(document=OuterRef('pk'))))
+        .values('id', 'project_id', 'document_number', 'revision_number', 'latest_issue',
+                'latest_revision')
+    )
+    result += [
+        StaleDocument(row['id'], row['project_id'], row['document_number'],
+                      (row['revision_number'], row['latest_issue'], row['latest_revision']),
+                      (row['revision_number'], row['latest_issue'], None))
+        for row in pointing_elsewhere
+    ]
+    return sorted(result, key=lambda document: document.id)
+
+
+def orphan_transmittals() -> list:
+    """(id, number, date_sent, finalised) of transmittals without revisions."""
+    return list(
+        Transmittal.objects
+        .exclude(Exists(Revision.objects.filter(transmittal=OuterRef('pk'))))
+        .annotate(finalised=Exists(TransmittalSnapshot.objects.filter(transmittal=OuterRef('pk'))))
+        .order_by('id').values_list('id', 'number', 'date_sent', 'finalised')
+    )
+
+
+def label_problems() -> list:
+    """Duplicate and non-incrementing revision labels (two queries)."""
+    result = []
+    duplicates = (
+        Revision.objects
+        .annotate(uses=Window(Count('id'), partition_by=[F('document_id'), F('revision_number')]))
+        .filter(uses__gt=1)
+        .values_list('id', 'document_id', 'document__document_number', 'revision_number')
+        .order_by()
+    )
+    for revision_id, document_id, number, label in duplicates:
+        result.append(LabelProblem(document_id, number, revision_id, label, 'duplicate'))
+    sequence = (
+        Revision.objects
+        .annotate(previous=Window(Lag('revision_number'), partition_by=[F('document_id')],
+                                  order_by=[F('date').asc(), F('id').asc()]))
+        .filter(previous__isnull=False)
+        .values_list('id', 'document_id', 'document__document_number', 'revision_number',
+                     'previous')
+        .order_by()
+    )
+    # few distinct labels: each is incremented once
+    following = {}
+    for revision_id, document_id, number, label, previous in sequence.iterator(chunk_size=2000):
+        if previous not in following:
+            following[previous] = next_revision_label(previous)
+        if label != following[previous]:
+            result.append(LabelProblem(document_id, number, revision_id, label,
+                                       f"follows {previous}, expected {following[previous]}"))
+    return sorted(result, key=lambda problem: (problem.document_number, problem.revision_id))
+
+
+def check() -> CheckResult:
+    return CheckResult(stale_documents(), orphan_transmittals(), label_problems())
+
+
+def fix_documents(documents, batch_size: int = 1000) -> int:
+    """Copy the expected values onto `documents` (StaleDocuments); return how many."""
+    fixed = 0
+    for start in range(0, len(documents), batch_size):
+        chunk = documents[start:start + batch_size]
+        rows = {row['id']: row for row in Document.objects.filter(pk__in=[d.id for d in chunk])
+                .values('id', *stats.DOCUMENT_FIELDS)}
+        updates = []
+        delta = stats.Counter()
+        for document in chunk:
+            if document.id not in rows:
+                continue
+            label, issue, revision_id = document.expected
+            updates.append(Document(pk=document.id, revision_number=label, latest_issue=issue,
+                                    latest_revision_id=revision_id))
+            before = rows[document.id]
+            delta.subtract(stats.document_contributions(before))
+            delta.update(stats.document_contributions(dict(before, latest_issue=issue)))
+        with transaction.atomic(), stats.batch(), versions.batch():
+            fixed += Document.objects.bulk_update(updates, DOCUMENT_FIX_FIELDS)
+            stats.apply(delta)
+            if rows:
+                versions.touch(*{row['project_id'] for row in rows.values()})
+    return fixed
+
+
+def fix_orphans(orphans) -> int:
+    """Delete the orphaned transmittals that can go; return how many."""
+    today = timezone.localdate()
+    ids = [pk for pk, _, date_sent, finalised in orphans if date_sent < today and not finalised]
+    if not ids:
+        return 0
+    # no revisions cascade: the collector's per-row signals are cheap here
+    return Transmittal.objects.filter(pk__in=ids).delete()[1].get(Transmittal._meta.label, 0)
@@ -0,0 +1,172 @@
+"""Set-based deletion of documents and transmittals.
+
+Django's deletion collector loads every cascaded Revision into Python
+(to send its signals) and deletes in chunks. The functions here issue
+one DELETE per table instead, children first:
+- documents: their due notices, their revisions, then the documents;
+- transmittals: their revisions, their snapshot, then the transmittal;
+  documents whose current revision label came from a deleted revision
+  get `revision_number`, `latest_issue` and `latest_revision` back from
+  their latest remaining revision (None when none is left), with one
+  UPDATE; documents only pointing at a deleted revision get their
+  `latest_revision` back with another.
+Because no signals are sent, the statistics deltas (vds.stats) are
+computed with grouped aggregates before deleting, and the project
+version and cached fragments are updated here. Each function returns a
+DeletionResult with the number of rows deleted or updated.
+
+`delete_documents` and `delete_transmittal` run in a single transaction.
+The `iter_delete_*` variants, used for large deletions run as background
+jobs (vds.jobs), work in batches of VDS_DELETE_BATCH documents, one
+transaction per batch, and yield their progress after each; a failed
+run keeps the batches already done and can simply be repeated.
+"""
+from dataclasses import asdict, dataclass
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from . import stats, versions
+from .caching import RECENT_TRANSMITTALS_KEY, invalidate
+from .models import Document, DueNotice, Revision, Transmittal, TransmittalSnapshot
+
+
+@dataclass
+class DeletionResult:
+    documents: int = 0
+    revisions: int = 0
+    due_notices: int = 0
+    transmittals: int = 0
+    snapshots: int = 0
+    documents_updated: int = 0
+
+    def __iadd__(self, other):
+        for name, value in asdict(other).items():
+            setattr(self, name, getattr(self, name) + value)
+        return self
+
+
+def batch_size() -> int:
+    return getattr(settings, 'VDS_DELETE_BATCH', 1000)
+
+
+def background_threshold() -> int:
+    return getattr(settings, 'VDS_DELETE_BACKGROUND_THRESHOLD', 2000)
+
+
+def _raw_delete(queryset) -> int:
+    # a single DELETE statement: no collector, no signals
+    return queryset._raw_delete(queryset.db) or 0
+
+
+def _chunks(ids, size):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _delete_document_batch(project_id, ids) -> DeletionResult:
+    documents = Document.objects.filter(project_id=project_id, pk__in=ids)
+    revisions = Revision.objects.filter(document__in=documents)
+    delta = stats.document_counters(documents)
+    delta.update(stats.revision_counters(revisions))
+    result = DeletionResult(
+        due_notices=_raw_delete(DueNotice.objects.filter(document__in=documents)),
+        revisions=_raw_delete(revisions),
+        documents=_raw_delete(documents),
+    )
+    stats.apply(stats.difference(delta, stats.Counter()))
+    versions.touch(project_id)
+    return result
+
+
+def _delete_transmittal_revisions(transmittal, document_ids=None) -> DeletionResult:
+    """Delete the revisions of `transmittal` (only for `document_ids` if given)."""
+    revisions = Revision.objects.filter(transmittal=transmittal)
+    if document_ids is not None:
+        revisions = revisions.filter(document_id__in=document_ids)
+    # documents showing the label of, or pointing at, a revision about to
+    # be deleted
+    shows_label = Exists(
+        revisions.filter(document=OuterRef('pk'), revision_number=OuterRef('revision_number')))
+    stale = (Document.objects.filter(pk__in=revisions.values('document_id'))
+             .filter(shows_label | Q(latest_revision__in=revisions))
+             .annotate(shows_label=shows_label))
+    before = list(stale.values('id', 'shows_label', *stats.DOCUMENT_FIELDS))
+    delta = stats.difference(stats.revision_counters(revisions), stats.Counter())
+    result = DeletionResult(revisions=_raw_delete(revisions))
+    pointer_ids = [row['id'] for row in before if not row['shows_label']]
+    if pointer_ids:
+        Document.refresh_latest_revision(Document.objects.filter(pk__in=pointer_ids))
+    before = [row for row in before if row['shows_label']]
+    stale_ids = [row['id'] for row in before]
+    if stale_ids:
+        result.documents_updated = Document.refresh_latest_revision(
+            Document.objects.filter(pk__in=stale_ids),
+            revision_number='revision_number', latest_issue='date')
+        after = Document.objects.filter(pk__in=stale_ids).values(*stats.DOCUMENT_FIELDS)
+        for row in before:
+            delta.subtract(stats.document_contributions(row))
+        for row in after:
+            delta.update(stats.document_contributions(row))
+    stats.apply(delta)
+    versions.touch(transmittal.project_id)
+    return result
+
+
+def _delete_transmittal_row(transmittal) -> DeletionResult:
+    result = DeletionResult(
+        snapshots=_raw_delete(TransmittalSnapshot.objects.filter(transmittal=transmittal)),
+        transmittals=_raw_delete(Transmittal.objects.filter(pk=transmittal.pk)),
+    )
+    versions.touch(transmittal.project_id)
+    transaction.on_commit(lambda: invalidate(RECENT_TRANSMITTALS_KEY))
+    return result
+
+
+def delete_documents(project, document_ids) -> DeletionResult:
+    """Delete documents `document_ids` of `project` in one transaction.
+
+    IDs of documents of other projects are ignored.
+    """
+    with transaction.atomic(), stats.batch(), versions.batch():
+        return _delete_document_batch(project.pk, list(document_ids))
+
+
+def delete_transmittal(transmittal) -> DeletionResult:
+    """Delete `transmittal` and its revisions in one transaction."""
+    with transaction.atomic(), stats.batch(), versions.batch():
+        result = _delete_transmittal_revisions(transmittal)
+        result += _delete_transmittal_row(transmittal)
+    return result
+
+
+def iter_delete_documents(project, document_ids, size=None):
+    """Delete documents batch by batch; yield (done, total, result so far)."""
+    ids = list(document_ids)
+    result = DeletionResult()
+    done = 0
+    for chunk in _chunks(ids, size or batch_size()):
+        with transaction.atomic(), stats.batch(), versions.batch():
+            result += _delete_document_batch(project.pk, chunk)
+        done += len(chunk)
+        yield done, len(ids), result
+
+
+def iter_delete_transmittal(transmittal, size=None):
+    """Delete a transmittal batch by batch; yield (done, total, result so far).
+
+    The revisions go first, a batch of documents at a time; the
+    transmittal row itself is deleted with the last batch.
+    """
+    document_ids = list(transmittal.revisions.values_list('document_id', flat=True).order_by())
+    result = DeletionResult()
+    done = 0
+    chunks = list(_chunks(document_ids, size or batch_size())) or [[]]
+    for i, chunk in enumerate(chunks):
+        with transaction.atomic(), stats.batch(), versions.batch():
+            result += _delete_transmittal_revisions(transmittal, chunk)
+            if i == len(chunks) - 1:
+                result += _delete_transmittal_row(transmittal)
+        done += len(chunk)
+        yield done, len(document_ids), result
@@ -0,0 +1,180 @@
+"""Digest emails of overdue and soon-due documents.
+
+Used by `manage.py vds_due_digest`. A document is due on its `next_due`
+and on its `required_by` date, until it is issued on or after that date.
+`send_due_digest`:
+- finds every due entry (document, field, date) that is overdue or due
+  within `days`, and was not reported in that state before, with one
+  query over the due-date indexes; reported entries are excluded in SQL,
+  so a rerun fetches nothing;
+- groups the entries per project and discipline;
+- sends one message per subscribed address (DigestSubscription) covering
+  all its groups, through a single email backend connection;
+- records the reported entries as DueNotice rows.
+Entries no subscription covers are not recorded and come up again once
+someone subscribes.
+"""
+import datetime
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.template.loader import render_to_string
+
+from .models import DigestSubscription, Document, DueNotice
+
+DUE_FIELDS = ('next_due', 'required_by')
+ROW_FIELDS = ('id', 'project_id', 'project__wa_number', 'project__title', 'discipline',
+              'document_number', 'title') + DUE_FIELDS
+NOTICE_BATCH = 1000
+CHUNK_SIZE = 2000
+
+
+@dataclass(frozen=True)
+class DueEntry:
+    document_id: int
+    document_number: str
+    title: str
+    field: str
+    due_date: datetime.date
+    overdue: bool
+
+
+@dataclass
+class DigestResult:
+    entries: int = 0
+    messages: list = field(default_factory=list)
+    dry_run: bool = False
+
+
+def due_queryset(today: datetime.date, days: int, project_ids=None):
+    """Return the values() queryset of documents with a due entry to report.
+
+    A document is returned when one of its due dates is before `today`
+    (overdue) or within `days` after it, it was not issued on or after that
+    date, and that date was not reported in the same state yet.
+    """
+    horizon = today + datetime.timedelta(days=days)
+    documents = Document.objects.all()
+    if project_ids is not None:
+        documents = documents.filter(project_id__in=project_ids)
+    pending = Q()
+    for name in DUE_FIELDS:
+        notices = DueNotice.objects.filter(document=OuterRef('pk'), field=name,
+                                           due_date=OuterRef(name))
+        not_issued = Q(latest_issue__isnull=True) | Q(latest_issue__lt=F(name))
+        pending |= (Q(**{f'{name}__lt': today}) & not_issued
+                    & ~Exists(notices.filter(overdue=True)))
+        pending |= (Q(**{f'{name}__gte': today, f'{name}__lte': horizon}) & not_issued
+                    & ~Exists(notices.filter(overdue=False)))
+    return documents.filter(pending).values(*ROW_FIELDS, 'latest_issue').order_by()
+
+
+def due_entries(today: datetime.date, days: int, project_ids=None):
+    """Yield ((project_id, wa_number, title, discipline), DueEntry) pairs.
+
+    Rows come from `due_queryset`; a row may carry a second due date that
+    needs no report, which is filtered out here with one more query for
+    the notices of the fetched documents (per chunk).
+    """
+    horizon = today + datetime.timedelta(days=days)
+    rows = due_queryset(today, days, project_ids).iterator(chunk_size=CHUNK_SIZE)
+    while chunk := list(islice(rows, CHUNK_SIZE)):
+        sent = set(DueNotice.objects.filter(document_id__in=[row['id'] for row in chunk])
+                   .values_list('document_id', 'field', 'due_date', 'overdue'))
+        for row in chunk:
+            group = (row['project_id'], row['project__wa_number'], row['project__title'],
+                     row['discipline'])
+            for name in DUE_FIELDS:
+                date = row[name]
+                if date is None or date > horizon:
+                    continue
+                if row['latest_issue'] is not None and row['latest_issue'] >= date:
+                    continue
+                overdue = date < today
+                if (row['id'], name, date, overdue) in sent:
+                    continue
+                yield group, DueEntry(row['id'], row['document_number'], row['title'],
+                                      name, date, overdue)
+
+
+def _recipients(subscriptions, group) -> list[str]:
+    project_id, _, _, discipline = group
+    return [s.email for s in subscriptions
+            if s.project_id in (None, project_id) and s.discipline in ('', discipline)]
+
+
+def build_digests(today: datetime.date, days: int):
+    """Return ({email: {group: [DueEntry]}}, number of entries covered)."""
+    subscriptions = list(DigestSubscription.objects.all())
+    if not subscriptions:
+        return {}, 0
+    project_ids = None
+    if all(s.project_id for s in subscriptions):
+        project_ids = {s.project_id for s in subscriptions}
+
+    digests = {}
+    covered = 0
+    recipients = {}
+    for group, entry in due_entries(today, days, project_ids):
+        if group not in recipients:
+            recipients[group] = _recipients(subscriptions, group)
+        if not recipients[group]:
+            continue
+        covered += 1
+        for email in recipients[group]:
+            digests.setdefault(email, {}).setdefault(group, []).append(entry)
+    return digests, covered
+
+
+def render_digest(email: str, groups: dict, today: datetime.date, days: int) -> EmailMessage:
+    entries = [entry for group_entries in groups.values() for entry in group_entries]
+    overdue = sum(entry.overdue for entry in entries)
+    subject = (f"VDS due digest {today.isoformat()}: {overdue} overdue, "
+               f"{len(entries) - overdue} due within {days} days")
+    body = render_to_string('vds/due_digest.txt', {
+        'today': today,
+        'days': days,
+        'groups': [
+            {'wa_number': wa_number, 'project_title': title, 'discipline': discipline,
+             'entries': sorted(group_entries, key=lambda e: (e.document_number, e.field))}
+            for (_, wa_number, title, discipline), group_entries in sorted(
+                groups.items(), key=lambda item: (item[0][1], item[0][3]))
+        ],
+    })
+    return EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [email])
+
+
+def send_due_digest(today: datetime.date | None = None, days: int | None = None,
+                    dry_run: bool = False) -> DigestResult:
+    """Send the digests and record what they reported; see the module docstring.
+
+    The notices are only recorded once every message was handed to the
+    backend, so a failed run is repeated in full. With `dry_run` the
+    messages are built and returned without sending or recording them.
+    """
+    today = today or datetime.date.today()
+    if days is None:
+        days = getattr(settings, 'VDS_DUE_DIGEST_DAYS', 14)
+    digests, covered = build_digests(today, days)
+    result = DigestResult(entries=covered, dry_run=dry_run, messages=[
+        render_digest(email, groups, today, days) for email, groups in sorted(digests.items())
+    ])
+    if dry_run or not result.messages:
+        return result
+
+    get_connection(fail_silently=False).send_messages(result.messages)
+    notices = {
+        (entry.document_id, entry.field, entry.due_date, entry.overdue)
+        for groups in digests.values() for entries in groups.values() for entry in entries
+    }
+    with transaction.atomic():
+        DueNotice.objects.bulk_create(
+            [DueNotice(document_id=d, field=f, due_date=date, overdue=o)
+             for d, f, date, o in notices],
+            batch_size=NOTICE_BATCH, ignore_conflicts=True,
+        )
+    return result
@@ -0,0 +1,219 @@
+"""Streaming export of a project's VDS register.
+
+Rows are read with a chunked `.iterator()` query and written out one at a
+time, so memory use stays flat however large the register is. Two formats
+are supported:
+
+- CSV, through the standard `csv` module;
+- XLSX, through a small dependency-free writer that streams a single
+  worksheet with inline strings into a zip archive.
+"""
+import csv
+import zipfile
+from xml.sax.saxutils import escape
+
+
+# (queryset field, column header) of the exported Document columns
+DOCUMENT_COLUMNS = (
+    ('document_number', 'Document number'),
+    ('title', 'Document Title'),
+    ('stub', 'Stub'),
+    ('discipline', 'Discipline'),
+    ('vds_status', 'VDS status'),
+    ('client_number', 'Client number'),
+    ('supplier_number', 'Supplier number'),
+    ('revision_number', 'Revision number'),
+    ('required_by', 'Required by'),
+    ('first_issue', 'First issue'),
+    ('latest_issue', 'Latest issue'),
+    ('next_due', 'Next due'),
+    ('penalty', 'Penalty'),
+    ('milestone', 'Milestone'),
+    ('priority', 'Priority'),
+    ('notes', 'Notes'),
+)
+
+# (Revision field, column header) added when latest revisions are included
+REVISION_COLUMNS = (
+    ('date', 'Revision date'),
+    ('purpose', 'Purpose'),
+    ('prepared_by', 'Prepared by'),
+    ('reviewed_by', 'Reviewed by'),
+    ('approved_by', 'Approved by'),
+    ('transmittal__number', 'Transmittal'),
+)
+
+CHUNK_SIZE = 2000
+# number of worksheet rows serialised before they are compressed and sent
+XLSX_ROWS_PER_WRITE = 500
+
+
+def register_header(include_revisions: bool = False) -> list[str]:
+    columns = DOCUMENT_COLUMNS + (REVISION_COLUMNS if include_revisions else ())
+    return [header for _, header in columns]
+
+
+def iter_register_rows(project, include_revisions: bool = False):
+    """Yield one tuple per document of `project`, ordered by number.
+
+    With `include_revisions`, the metadata of each document's latest
+    revision is appended, joined through Document.latest_revision in the
+    same single query rather than one query per document.
+    """
+    documents = project.documents.order_by('document_number', 'id')
+    names = [name for name, _ in DOCUMENT_COLUMNS]
+    if include_revisions:
+        names += [f"latest_revision__{name}" for name, _ in REVISION_COLUMNS]
+    return documents.values_list(*names).iterator(chunk_size=CHUNK_SIZE)
+
+
+class _Echo:
+    """File-like object whose write() returns the value instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    """Yield CSV-encoded lines for `header` followed by `rows`."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(['' if value is None else value for value in row])
+
+
+class _ChunkBuffer:
+    """Unseekable write-only buffer that hands out what was written so far."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+XLSX_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetData>'
+)
+XLSX_SHEET_END = '</sheetData></worksheet>'
+
+# control characters that are not allowed in XML 1.0
+_XML_ILLEGAL = dict.fromkeys(c for c in range(32) if c not in (9, 10, 13))
+# characters a worksheet name may not contain
+_SHEET_NAME_ILLEGAL = dict.fromkeys(map(ord, '[]:*?/\\'))
+
+
+def _column_letter(index: int) -> str:
+    """Return the spreadsheet column name for a 0-based index (0 -> 'A')."""
+    letters = ''
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _sheet_name(name: str) -> str:
+    """Return `name` as a valid worksheet name, escaped for an XML attribute.
+
+    Spreadsheet applications reject names with []:*?/\\, longer than 31
+    characters, or starting or ending with an apostrophe.
+    """
+    name = str(name).translate(_XML_ILLEGAL).translate(_SHEET_NAME_ILLEGAL)
+    name = name.strip().strip("'")[:31].strip().strip("'") or 'VDS'
+    return escape(name, {'"': '&quot;'})
+
+
+def _xlsx_cell(ref: str, value) -> str:
+    if value is None or value == '':
+        return ''
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    text = escape(str(value).translate(_XML_ILLEGAL))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(number: int, values, columns) -> str:
+    cells = ''.join(_xlsx_cell(f"{col}{number}", value) for col, value in zip(columns, values))
+    return f'<row r="{number}">{cells}</row>'
+
+
+def stream_xlsx(header, rows, sheet_name: str = 'VDS'):
+    """Yield the bytes of an XLSX workbook holding `header` and `rows`.
+
+    The archive is written to an unseekable buffer (zip data descriptors
+    instead of rewritten headers) and drained every XLSX_ROWS_PER_WRITE
+    rows, so only the deflate window and a few hundred rows are held in
+    memory.
+    """
+    columns = [_column_letter(i) for i in range(len(header))]
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', XLSX_CONTENT_TYPES)
+        archive.writestr('_rels/.rels', XLSX_ROOT_RELS)
+        archive.writestr('xl/workbook.xml', XLSX_WORKBOOK.format(name=_sheet_name(sheet_name)))
+        archive.writestr('xl/_rels/workbook.xml.rels', XLSX_WORKBOOK_RELS)
+        yield buffer.drain()
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(XLSX_SHEET_START.encode())
+            pending = [_xlsx_row(1, header, columns)]
+            for number, row in enumerate(rows, start=2):
+                pending.append(_xlsx_row(number, row, columns))
+                if len(pending) >= XLSX_ROWS_PER_WRITE:
+                    sheet.write(''.join(pending).encode())
+                    pending.clear()
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            pending.append(XLSX_SHEET_END)
+            sheet.write(''.join(pending).encode())
+    yield buffer.drain()
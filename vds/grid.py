@@ -0,0 +1,137 @@
+"""Grid editing of the revisions of a transmittal (transmittal_details).
+
+The details page of a transmittal that is not finalised renders the
+revisions as a grid of inputs; the browser posts only the cells that were
+changed, each as `cell-<revision id>-<field>`. Saving them:
+- reads the edited revisions of the transmittal with one query;
+- validates every cell with the model field (`max_length`, required
+  fields); a blank cell of a nullable field stores NULL;
+- saves nothing if any cell is invalid, and reports every error found;
+- otherwise groups the revisions by the set of columns that actually
+  changed and writes each group with one `bulk_update`, all in one
+  transaction.
+The number of queries depends on the combinations of columns changed,
+never on the number of rows (beyond the backend's own bulk update
+batching). `attach_cells` gives each revision the inputs the page renders,
+with the posted values and their errors when a save was refused.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import versions
+from .models import Revision
+
+GRID_FIELDS = ('purpose', 'prepared_by', 'reviewed_by', 'approved_by', 'notes')
+CELL_PREFIX = 'cell-'
+
+
+@dataclass
+class CellIssue:
+    revision_id: int
+    document_number: str
+    column: str
+    value: str
+    message: str
+
+
+@dataclass
+class GridCell:
+    name: str
+    value: str
+    # the stored value: the page posts a cell only when it differs
+    original: str
+    max_length: int
+    required: bool
+    error: str = ''
+
+
+@dataclass
+class GridResult:
+    cells: int = 0
+    updated: int = 0
+    # (sorted column names, revisions written) per bulk_update
+    groups: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+
+
+def parse_cells(data) -> dict:
+    """Return {revision id: {field: value}} from the posted `data` (a QueryDict)."""
+    cells = defaultdict(dict)
+    for key, value in data.items():
+        if not key.startswith(CELL_PREFIX):
+            continue
+        revision_id, _, name = key[len(CELL_PREFIX):].partition('-')
+        if revision_id.isdigit() and name in GRID_FIELDS:
+            cells[int(revision_id)][name] = value
+    return dict(cells)
+
+
+def attach_cells(revisions, cells: dict | None = None, errors=()) -> list:
+    """Set `grid_cells` on each of `revisions`, showing the posted `cells` if given."""
+    messages = {(issue.revision_id, issue.column): issue.message for issue in errors}
+    model_fields = [Revision._meta.get_field(name) for name in GRID_FIELDS]
+    for revision in revisions:
+        posted = (cells or {}).get(revision.pk, {})
+        revision.grid_cells = []
+        for model_field in model_fields:
+            stored = getattr(revision, model_field.name)
+            original = '' if stored is None else stored
+            revision.grid_cells.append(GridCell(
+                model_field.name, posted.get(model_field.name, original), original,
+                model_field.max_length, not model_field.blank,
+                messages.get((revision.pk, model_field.name), '')))
+    return revisions
+
+
+def _clean(name: str, raw: str):
+    model_field = Revision._meta.get_field(name)
+    value = raw.strip()
+    if not value and model_field.null:
+        return None
+    return model_field.clean(value, None)
+
+
+def apply_grid_edits(transmittal, cells: dict) -> GridResult:
+    """Validate and save `cells` ({revision id: {field: value}}) of `transmittal`."""
+    result = GridResult(cells=sum(len(values) for values in cells.values()))
+    if not cells:
+        return result
+    revisions = {
+        revision.pk: revision
+        for revision in (Revision.objects.filter(transmittal=transmittal, pk__in=list(cells))
+                         .select_related('document')
+                         .only('id', 'document__document_number', *GRID_FIELDS).order_by())
+    }
+    groups = defaultdict(list)
+    for revision_id, values in sorted(cells.items()):
+        revision = revisions.get(revision_id)
+        if revision is None:
+            result.errors.append(CellIssue(revision_id, '', '', '',
+                                           "is not a revision of this transmittal"))
+            continue
+        changed = []
+        for name, raw in values.items():
+            try:
+                value = _clean(name, raw)
+            except ValidationError as exc:
+                result.errors.append(CellIssue(revision_id, revision.document.document_number,
+                                               name, raw, ' '.join(exc.messages)))
+                continue
+            if getattr(revision, name) != value:
+                setattr(revision, name, value)
+                changed.append(name)
+        if changed:
+            groups[tuple(sorted(changed))].append(revision)
+    if result.errors:
+        return result
+    with transaction.atomic():
+        for columns, changed in groups.items():
+            Revision.objects.bulk_update(changed, columns)
+            result.groups.append((columns, len(changed)))
+            result.updated += len(changed)
+        if groups:
+            versions.touch(transmittal.project_id)
+    return result
@@ -0,0 +1,232 @@
+"""Bulk import of a VDS register from CSV.
+
+The file is read as a stream and handled in batches. For every batch:
+- each row is parsed and validated against the Document fields;
+- `document_number`, `client_number` and `supplier_number` are checked for
+  duplicates inside the file (first occurrence wins) and against the
+  database with one `__in` query per column;
+- the remaining rows are inserted with `bulk_create` and their project
+  statistics (vds.stats) written once at the end.
+Everything runs in one transaction, so either all valid rows are imported
+or, with `dry_run`, nothing is written at all.
+
+Column headers may be the Document field names or the headers written by
+`vds.export`, so an exported register can be imported back.
+"""
+import csv
+import datetime
+from dataclasses import dataclass, field
+
+from django.db import transaction
+
+from . import stats, versions
+from .export import DOCUMENT_COLUMNS
+from .models import Document
+
+REQUIRED_FIELDS = ('document_number', 'title', 'stub', 'discipline')
+UNIQUE_FIELDS = ('document_number', 'client_number', 'supplier_number')
+DATE_FIELDS = ('required_by', 'first_issue', 'latest_issue', 'next_due')
+BOOLEAN_FIELDS = ('penalty', 'milestone', 'priority')
+NULLABLE_FIELDS = ('client_number', 'supplier_number', 'revision_number')
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'x'}
+FALSE_VALUES = {'', '0', 'false', 'no', 'n'}
+
+BATCH_SIZE = 2000
+
+
+@dataclass
+class RowIssue:
+    line: int
+    column: str
+    value: str
+    message: str
+
+    def __str__(self):
+        return f"line {self.line}: {self.column} '{self.value}' {self.message}"
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    rows: int = 0
+    conflicts: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+    dry_run: bool = False
+
+    @property
+    def skipped(self) -> int:
+        return self.rows - self.created
+
+
+class NotUtf8(Exception):
+    """Raised by `read_rows` for a stream that is not UTF-8."""
+
+    def __init__(self, line: int):
+        super().__init__(f"line {line} is not UTF-8")
+        self.line = line
+
+    def issue(self, consequence: str) -> RowIssue:
+        # the stream is decoded in blocks, so the bad bytes are at or after `line`
+        return RowIssue(self.line, 'encoding', '',
+                        f"is not UTF-8 (save the file as CSV UTF-8); {consequence}")
+
+
+def read_rows(stream):
+    """Yield (line, cells) of the header and of each non-blank row of CSV text `stream`.
+
+    The header is line 1. A decoding error raises NotUtf8 with the line
+    the reader had reached.
+    """
+    line = 0
+    try:
+        for line, row in enumerate(csv.reader(stream), start=1):
+            if line == 1 or any(cell.strip() for cell in row):
+                yield line, row
+    except UnicodeDecodeError:
+        raise NotUtf8(line + 1) from None
+
+
+def _header_map(header) -> dict:
+    """Map each CSV column index to a Document field name."""
+    known = {}
+    for name, label in DOCUMENT_COLUMNS:
+        known[name.lower()] = name
+        known[label.lower()] = name
+    mapping = {}
+    for index, column in enumerate(header):
+        name = known.get((column or '').strip().lower())
+        if name is not None:
+            mapping[index] = name
+    return mapping
+
+
+def _parse_row(line: int, values: dict) -> tuple[dict, list]:
+    """Convert raw CSV strings into Document field values.
+
+    Returns (field values, list of RowIssue).
+    """
+    data = {}
+    errors = []
+    for name, raw in values.items():
+        raw = (raw or '').strip()
+        model_field = Document._meta.get_field(name)
+        if name in DATE_FIELDS:
+            try:
+                data[name] = datetime.date.fromisoformat(raw) if raw else None
+            except ValueError:
+                errors.append(RowIssue(line, name, raw, "is not an ISO date (YYYY-MM-DD)"))
+        elif name in BOOLEAN_FIELDS:
+            if raw.lower() in TRUE_VALUES:
+                data[name] = True
+            elif raw.lower() in FALSE_VALUES:
+                data[name] = False
+            else:
+                errors.append(RowIssue(line, name, raw, "is not a yes/no value"))
+        else:
+            if model_field.max_length and len(raw) > model_field.max_length:
+                errors.append(RowIssue(line, name, raw,
+                                       f"is longer than {model_field.max_length} characters"))
+            data[name] = raw or (None if name in NULLABLE_FIELDS else '')
+    for name in REQUIRED_FIELDS:
+        if not data.get(name):
+            errors.append(RowIssue(line, name, '', "is required"))
+    if not data.get('vds_status'):
+        data.pop('vds_status', None)
+    return data, errors
+
+
+def _existing_values(name: str, values) -> set:
+    """Return which of `values` are already used by a Document's `name`."""
+    if not values:
+        return set()
+    return set(Document.objects.filter(**{f"{name}__in": values}).values_list(name, flat=True))
+
+
+def _import_batch(project, batch, seen, result):
+    """Check a batch of (line, data) pairs for conflicts and insert the rest."""
+    taken = {
+        name: _existing_values(name, [data[name] for _, data in batch if data.get(name)])
+        for name in UNIQUE_FIELDS
+    }
+    documents = []
+    for line, data in batch:
+        clashes = []
+        for name in UNIQUE_FIELDS:
+            value = data.get(name)
+            if not value:
+                continue
+            # a line of the file imported by an earlier batch is in the
+            # database by now: cite the line
+            if value in seen[name]:
+                clashes.append(RowIssue(line, name, value,
+                                        f"duplicates line {seen[name][value]} of the file"))
+            elif value in taken[name]:
+                clashes.append(RowIssue(line, name, value, "already exists in the database"))
+        if clashes:
+            result.conflicts.extend(clashes)
+            continue
+        for name in UNIQUE_FIELDS:
+            if data.get(name):
+                seen[name][data[name]] = line
+        documents.append(Document(project=project, **data))
+    Document.objects.bulk_create(documents)
+    delta = stats.Counter()
+    for document in documents:
+        delta.update(stats.document_contributions(document))
+    stats.apply(delta)
+    versions.touch(project.pk)
+    result.created += len(documents)
+
+
+def import_register(project, stream, batch_size: int = BATCH_SIZE,
+                    dry_run: bool = False) -> ImportResult:
+    """Import the CSV register read from text `stream` into `project`.
+
+    Rows with invalid values or unique-number conflicts are reported in the
+    returned ImportResult and skipped; all other rows are created. With
+    `dry_run`, the transaction is rolled back after the checks.
+    """
+    result = ImportResult(dry_run=dry_run)
+    rows = read_rows(stream)
+    try:
+        _, header = next(rows, (1, None))
+    except NotUtf8 as exc:
+        result.errors.append(exc.issue("nothing was imported"))
+        return result
+    if header is None:
+        return result
+    mapping = _header_map(header)
+    missing = [name for name in REQUIRED_FIELDS if name not in mapping.values()]
+    if missing:
+        result.errors.append(RowIssue(1, ', '.join(missing), '', "column is missing"))
+        return result
+
+    # value -> line of first occurrence, per unique column
+    seen = {name: {} for name in UNIQUE_FIELDS}
+    with transaction.atomic(), stats.batch(), versions.batch():
+        batch = []
+        try:
+            for line, row in rows:
+                result.rows += 1
+                data, errors = _parse_row(line, {
+                    name: row[index] for index, name in mapping.items() if index < len(row)
+                })
+                if errors:
+                    result.errors.extend(errors)
+                    continue
+                batch.append((line, data))
+                if len(batch) >= batch_size:
+                    _import_batch(project, batch, seen, result)
+                    batch = []
+        except NotUtf8 as exc:
+            # a half-read register is not imported at all
+            result.errors.append(exc.issue("nothing was imported"))
+            result.created = 0
+            transaction.set_rollback(True)
+            return result
+        if batch:
+            _import_batch(project, batch, seen, result)
+        if dry_run:
+            transaction.set_rollback(True)
+    return result
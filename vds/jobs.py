@@ -0,0 +1,350 @@
+"""Background jobs kept in the database, run by `manage.py vds_worker`.
+
+No broker is involved:
+- `enqueue(kind, **params)` inserts a Job row; `kind` names a handler
+  registered with `@handler(kind)`, called as `handler(progress, **params)`
+  and returning a JSON-serialisable result. `progress(done, total)`
+  records how far it got, visible to pollers as soon as the handler's
+  own transaction (if any) commits;
+- workers `claim` the oldest due queued job. Where the database supports
+  it this is `SELECT ... FOR UPDATE SKIP LOCKED`, so concurrent workers
+  never wait on each other. SQLite has no row locks but serialises
+  writes, so there a compare-and-set UPDATE of the job state decides
+  which worker gets it;
+- while a job runs, its worker refreshes the job's `locked_at` every
+  VDS_JOB_HEARTBEAT seconds from a thread of its own, and with every
+  `progress` call;
+- a failing job is queued again after VDS_JOB_RETRY_DELAY seconds,
+  doubled for every attempt, until it has used its `max_attempts`; then
+  it is marked failed with the error. Running jobs without a heartbeat
+  for VDS_JOB_TIMEOUT seconds (their worker died) are handled the same
+  way.
+Handlers must therefore be safe to run again after a partial failure. A
+handler whose work commits in one transaction saves its result with
+`progress.save(result)` inside that transaction; a rerun finds it in
+`progress.saved` and returns it instead of doing the work twice (see
+`issue` and `import_register`). Files produced or consumed by jobs live in
+VDS_JOB_FILES_DIR; an uploaded file (`file` parameter) is removed when its
+job finally fails.
+"""
+import datetime
+import logging
+import os
+import socket
+import threading
+import traceback
+import uuid
+from dataclasses import asdict
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import deletion, export, importer, versions
+from .models import Job, Project, Transmittal
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+
+def handler(kind: str):
+    """Register the decorated function as the handler of jobs of `kind`."""
+    def register(func):
+        _handlers[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind: str, max_attempts: int | None = None, **params) -> Job:
+    """Queue a job of `kind` with keyword arguments `params`; return it."""
+    if kind not in _handlers:
+        raise ValueError(f"unknown job kind '{kind}'")
+    if max_attempts is None:
+        max_attempts = getattr(settings, 'VDS_JOB_MAX_ATTEMPTS', 3)
+    return Job.objects.create(kind=kind, params=params, max_attempts=max_attempts)
+
+
+def files_dir() -> Path:
+    path = Path(getattr(settings, 'VDS_JOB_FILES_DIR', Path(settings.BASE_DIR) / 'jobfiles'))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+# Claiming and running -------------------------------------------------------
+
+def _due():
+    return (Job.objects.filter(state=Job.QUEUED, run_after__lte=timezone.now())
+            .order_by('run_after', 'id'))
+
+
+def claim(worker: str) -> Job | None:
+    """Mark the oldest due queued job as running for `worker`; return it."""
+    claimed = {'state': Job.RUNNING, 'locked_by': worker, 'locked_at': timezone.now()}
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = _due().select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            Job.objects.filter(pk=job.pk).update(attempts=F('attempts') + 1, **claimed)
+    else:
+        # another worker may take a candidate first: try the next one
+        for pk in _due().values_list('pk', flat=True)[:10]:
+            if Job.objects.filter(pk=pk, state=Job.QUEUED).update(
+                    attempts=F('attempts') + 1, **claimed):
+                break
+        else:
+            return None
+        job = Job(pk=pk)
+    job.refresh_from_db()
+    return job
+
+
+class Progress:
+    """The `progress` argument of handlers; call it with (done, total)."""
+
+    def __init__(self, job: Job):
+        self.job_id = job.pk
+        # the result an earlier attempt saved, if any
+        self.saved = job.result
+
+    def __call__(self, done: int, total: int):
+        # progress is a heartbeat too
+        Job.objects.filter(pk=self.job_id).update(progress_done=done, progress_total=total,
+                                                  locked_at=timezone.now())
+
+    def save(self, result):
+        """Keep `result` on the job, committed with the caller's transaction."""
+        Job.objects.filter(pk=self.job_id).update(result=result)
+        self.saved = result
+
+
+class Heartbeat:
+    """Refresh `locked_at` of a running job from a thread, while in a `with` block.
+
+    The thread has its own database connection, so the beats are committed
+    whatever the handler's transaction holds (on SQLite they wait for its
+    write lock and may be skipped).
+    """
+
+    def __init__(self, job: Job):
+        self.job_id = job.pk
+        self.worker = job.locked_by
+        self.interval = getattr(settings, 'VDS_JOB_HEARTBEAT', 60)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def beat(self) -> bool:
+        """Refresh the job's `locked_at`; return False once it is no longer ours."""
+        return bool(Job.objects.filter(pk=self.job_id, state=Job.RUNNING, locked_by=self.worker)
+                    .update(locked_at=timezone.now()))
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    self.beat()
+                except DatabaseError:
+                    logger.warning("heartbeat of job %s failed", self.job_id, exc_info=True)
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def _discard_upload(job):
+    if job.params.get('file'):
+        (files_dir() / job.params['file']).unlink(missing_ok=True)
+
+
+def _retry_or_fail(job, error: str, jobs=None) -> bool:
+    """Queue `job` again or fail it; return False if it was not in `jobs` (a filter)."""
+    now = timezone.now()
+    jobs = (jobs if jobs is not None else Job.objects).filter(pk=job.pk)
+    if job.attempts < job.max_attempts:
+        delay = getattr(settings, 'VDS_JOB_RETRY_DELAY', 30) * 2 ** (job.attempts - 1)
+        return bool(jobs.update(state=Job.QUEUED, error=error, locked_by='',
+                                run_after=now + datetime.timedelta(seconds=delay)))
+    if not jobs.update(state=Job.FAILED, error=error, finished_at=now):
+        return False
+    _discard_upload(job)
+    return True
+
+
+def run(job: Job) -> Job:
+    """Run a claimed job with its handler and record the outcome."""
+    try:
+        with Heartbeat(job):
+            result = _handlers[job.kind](Progress(job), **job.params)
+    except Exception:
+        logger.exception("job %s failed (attempt %s of %s)", job, job.attempts, job.max_attempts)
+        _retry_or_fail(job, traceback.format_exc(limit=5))
+    else:
+        Job.objects.filter(pk=job.pk).update(state=Job.DONE, result=result, error='',
+                                             finished_at=timezone.now())
+    job.refresh_from_db()
+    return job
+
+
+def requeue_stale() -> int:
+    """Retry or fail running jobs whose worker stopped; return how many."""
+    timeout = getattr(settings, 'VDS_JOB_TIMEOUT', 3600)
+    stale = Job.objects.filter(
+        state=Job.RUNNING, locked_at__lt=timezone.now() - datetime.timedelta(seconds=timeout))
+    # a heartbeat between the read and the update keeps the job running
+    return sum(_retry_or_fail(job, f"worker {job.locked_by} sent no heartbeat for {timeout}s",
+                              jobs=stale.filter(locked_by=job.locked_by))
+               for job in list(stale))
+
+
+def work(worker: str | None = None, once: bool = False, sleep: float = 1.0,
+         stop: threading.Event | None = None) -> int:
+    """Claim and run jobs until `stop` is set; return the number run.
+
+    With `once`, return as soon as no job is due instead of polling.
+    """
+    worker = worker or worker_name()
+    stop = stop or threading.Event()
+    processed = 0
+    while not stop.is_set():
+        job = claim(worker)
+        if job is None:
+            if once:
+                break
+            requeue_stale()
+            stop.wait(sleep)
+            continue
+        run(job)
+        processed += 1
+    return processed
+
+
+def status(job: Job) -> dict:
+    """Return the poll endpoint view of `job`."""
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'state': job.state,
+        'done': job.progress_done,
+        'total': job.progress_total,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'result': job.result,
+        'error': job.error.strip().splitlines()[-1] if job.error else '',
+    }
+
+
+# Handlers -------------------------------------------------------------------
+
+@handler('delete_documents')
+def delete_documents(progress, project_id, document_ids):
+    project = Project.objects.get(pk=project_id)
+    result = deletion.DeletionResult()
+    for done, total, result in deletion.iter_delete_documents(project, document_ids):
+        progress(done, total)
+    return asdict(result)
+
+
+@handler('delete_transmittal')
+def delete_transmittal(progress, transmittal_id):
+    transmittal = Transmittal.objects.filter(pk=transmittal_id).first()
+    result = deletion.DeletionResult()
+    if transmittal is not None:
+        for done, total, result in deletion.iter_delete_transmittal(transmittal):
+            progress(done, total)
+    return asdict(result)
+
+
+@handler('issue')
+def issue(progress, project_id, document_ids, source=None):
+    if progress.saved:
+        # issued by an earlier attempt whose worker stopped before finishing
+        return progress.saved
+    project = Project.objects.get(pk=project_id)
+    progress(0, len(document_ids))
+    with transaction.atomic(), versions.batch():
+        transmittal = project.create_transmittal(source)
+        revisions = transmittal.issue_documents(document_ids)
+        result = {'transmittal_id': transmittal.pk, 'number': transmittal.number,
+                  'revisions': len(revisions)}
+        progress.save(result)
+    progress(len(document_ids), len(document_ids))
+    return result
+
+
+# at most this many row problems are kept in an import job's result
+IMPORT_ISSUES_KEPT = 500
+
+
+@handler('import_register')
+def import_register(progress, project_id, file, dry_run=False):
+    path = files_dir() / file
+    if progress.saved:
+        # imported by an earlier attempt whose worker stopped before finishing
+        path.unlink(missing_ok=True)
+        return progress.saved
+    project = Project.objects.get(pk=project_id)
+    # the import runs in a savepoint of this transaction, so its rows and
+    # the saved result commit together
+    with transaction.atomic():
+        with open(path, encoding='utf-8-sig', newline='') as stream:
+            result = importer.import_register(project, stream, dry_run=dry_run)
+        summary = {
+            'created': result.created,
+            'rows': result.rows,
+            'dry_run': result.dry_run,
+            'errors': [asdict(issue) for issue in result.errors[:IMPORT_ISSUES_KEPT]],
+            'conflicts': [asdict(issue) for issue in result.conflicts[:IMPORT_ISSUES_KEPT]],
+            'error_count': len(result.errors),
+            'conflict_count': len(result.conflicts),
+        }
+        progress.save(summary)
+    progress(result.rows, result.rows)
+    path.unlink(missing_ok=True)
+    return summary
+
+
+@handler('export_register')
+def export_register(progress, project_id, format='csv', revisions=False):
+    project = Project.objects.get(pk=project_id)
+    total = project.documents.count()
+    header = export.register_header(revisions)
+
+    def rows():
+        for done, row in enumerate(export.iter_register_rows(project, revisions), start=1):
+            if done % export.CHUNK_SIZE == 0:
+                progress(done, total)
+            yield row
+
+    if format == 'xlsx':
+        chunks = export.stream_xlsx(header, rows(), sheet_name=project.wa_number)
+    else:
+        format = 'csv'
+        chunks = (line.encode() for line in export.stream_csv(header, rows()))
+    name = f"export-{uuid.uuid4().hex}.{format}"
+    with open(files_dir() / name, 'wb') as out:
+        for chunk in chunks:
+            out.write(chunk)
+    progress(total, total)
+    return {'file': name, 'filename': f"{project.wa_number}-vds.{format}"}
+
+
+def save_upload(upload) -> str:
+    """Store an uploaded file for a job; return its name in VDS_JOB_FILES_DIR."""
+    name = f"upload-{uuid.uuid4().hex}.csv"
+    with open(files_dir() / name, 'wb') as out:
+        for chunk in upload.chunks():
+            out.write(chunk)
+    return name
@@ -0,0 +1,47 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from vds.importer import BATCH_SIZE, import_register
+from vds.models import Project
+
+
+class Command(BaseCommand):
+    help = "Import a VDS register from a CSV file into a project."
+
+    def add_arguments(self, parser):
+        parser.add_argument('project', help="WA number of the target project")
+        parser.add_argument('path', help="CSV file to import ('-' for stdin)")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help="rows checked and inserted per batch")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="check the file and report, without writing anything")
+        parser.add_argument('--encoding', default='utf-8-sig')
+
+    def handle(self, *args, **options):
+        try:
+            project = Project.objects.get(wa_number=options['project'])
+        except Project.DoesNotExist:
+            raise CommandError(f"Project '{options['project']}' does not exist.")
+
+        if options['path'] == '-':
+            result = import_register(project, sys.stdin, options['batch_size'],
+                                     dry_run=options['dry_run'])
+        else:
+            try:
+                stream = open(options['path'], newline='', encoding=options['encoding'])
+            except OSError as exc:
+                raise CommandError(str(exc))
+            with stream:
+                result = import_register(project, stream, options['batch_size'],
+                                         dry_run=options['dry_run'])
+
+        for issue in result.errors:
+            self.stderr.write(f"error: {issue}")
+        for issue in result.conflicts:
+            self.stderr.write(f"conflict: {issue}")
+        verb = "would be imported" if result.dry_run else "imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"{result.created} of {result.rows} rows {verb} into {project.wa_number}; "
+            f"{len(result.errors)} errors, {len(result.conflicts)} conflicts."
+        ))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from vds import stats
+from vds.models import Project
+
+
+class Command(BaseCommand):
+    help = ("Recompute the per-project statistics from documents and revisions, "
+            "or with --check only report where the stored counters drifted.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('projects', nargs='*', help="WA numbers of the projects (default: all)")
+        parser.add_argument('--check', action='store_true',
+                            help="report drift without writing; exit with an error if any")
+
+    def handle(self, *args, **options):
+        project_ids = None
+        if options['projects']:
+            found = dict(Project.objects.filter(wa_number__in=options['projects'])
+                         .values_list('wa_number', 'id'))
+            missing = sorted(set(options['projects']) - set(found))
+            if missing:
+                raise CommandError(f"Unknown project(s): {', '.join(missing)}")
+            project_ids = list(found.values())
+
+        drift = stats.drift(project_ids)
+        for (project_id, kind, key), (current, actual) in sorted(drift.items()):
+            self.stdout.write(f"project {project_id} {kind}/{key}: stored {current}, actual {actual}")
+        if options['check']:
+            if drift:
+                raise CommandError(f"{len(drift)} counters drifted; run rebuild_stats to fix them.")
+            self.stdout.write(self.style.SUCCESS("Statistics are up to date."))
+            return
+
+        written = stats.rebuild(project_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {written} counters ({len(drift)} had drifted)."))
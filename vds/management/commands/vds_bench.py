@@ -0,0 +1,110 @@
+import datetime
+import json
+import platform
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.db import connection
+from django.test.utils import override_settings
+
+from vds import bench
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the vds hot paths on synthetic data and print the results "
+            "as JSON. Runs against a throwaway test database unless --in-place; "
+            "in place, the synthetic projects are deleted again afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=2)
+        parser.add_argument('--documents', type=int, default=2000,
+                            help="documents per project")
+        parser.add_argument('--revisions', type=int, default=3,
+                            help="revisions per document")
+        parser.add_argument('--repeat', type=int, default=5,
+                            help="timed runs per scenario (the median is reported)")
+        parser.add_argument('--issue-size', type=int, default=500,
+                            help="documents selected for the issue action")
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help="only run this scenario (repeatable)")
+        parser.add_argument('--output', help="also write the JSON result to this file")
+        parser.add_argument('--compare', metavar='BASELINE',
+                            help="JSON result of an earlier run to compare against")
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help="allowed relative slow-down before flagging (default 0.2)")
+        parser.add_argument('--throughput', action='store_true',
+                            help="also compare WSGI and ASGI throughput of the read-only pages")
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help="concurrent clients for --throughput")
+        parser.add_argument('--requests', type=int, default=200,
+                            help="requests per page and handler for --throughput")
+        parser.add_argument('--in-place', action='store_true',
+                            help="use the configured database instead of a throwaway one "
+                                 "(the synthetic data is removed afterwards)")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)['scenarios']
+            except (OSError, ValueError, KeyError) as exc:
+                raise CommandError(f"Cannot read baseline {options['compare']}: {exc}")
+
+        old_name = None
+        if not options['in_place']:
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        projects = []
+        try:
+            projects = bench.build_dataset(options['projects'], options['documents'],
+                                           options['revisions'])
+            # time against the first project; the others make the tables realistic
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                scenarios = bench.run_scenarios(projects[0], options['repeat'],
+                                                options['issue_size'], options['scenarios'])
+                throughput = None
+                if options['throughput']:
+                    throughput = bench.run_throughput(projects[0], options['concurrency'],
+                                                      options['requests'], options['scenarios'])
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            elif projects:
+                bench.drop_dataset(projects)
+
+        result = {
+            'meta': {
+                'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'vendor': connection.vendor,
+                'projects': options['projects'],
+                'documents': options['documents'],
+                'revisions': options['revisions'],
+                'repeat': options['repeat'],
+                'issue_size': options['issue_size'],
+            },
+            'scenarios': scenarios,
+        }
+        overhead = bench.instrumentation_overhead(scenarios)
+        if overhead is not None:
+            result['instrumentation_overhead_pct'] = overhead
+        if throughput is not None:
+            result['meta'].update(concurrency=options['concurrency'],
+                                  requests=options['requests'])
+            result['throughput'] = throughput
+        output = json.dumps(result, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+
+        if baseline is not None:
+            regressions = bench.compare(scenarios, baseline, options['threshold'])
+            for line in regressions:
+                self.stderr.write(f"REGRESSION {line}")
+            if regressions:
+                raise CommandError(f"{len(regressions)} regression(s) against {options['compare']}")
+            self.stderr.write(self.style.SUCCESS("No regressions against the baseline."))
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from vds import consistency
+
+
+class Command(BaseCommand):
+    help = ("Check the whole register for documents out of step with their newest revision, "
+            "transmittals without revisions and duplicate or non-incrementing revision labels; "
+            "with --fix, repair the documents and delete the orphaned transmittals.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help="repair what can be repaired, then print a summary")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="documents repaired per bulk update (default 1000)")
+        parser.add_argument('--limit', type=int, default=20,
+                            help="problems listed per kind (default 20; counts are always given)")
+
+    def _list(self, title, lines, limit):
+        if not lines:
+            return
+        self.stdout.write(f"{title}: {len(lines)}")
+        for line in lines[:limit]:
+            self.stdout.write(f"  {line}")
+        if len(lines) > limit:
+            self.stdout.write(f"  ... and {len(lines) - limit} more")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        result = consistency.check()
+        limit = options['limit']
+        self._list("Documents out of step with their newest revision", [
+            f"{d.document_number}: stored {d.stored}, newest {d.expected}"
+            for d in result.stale_documents], limit)
+        self._list("Transmittals without revisions", [
+            f"{number} (sent {date_sent}{', finalised' if finalised else ''})"
+            for _, number, date_sent, finalised in result.orphan_transmittals], limit)
+        self._list("Revision label problems", [
+            f"{p.document_number} rev {p.label}: {p.problem}" for p in result.label_problems],
+            limit)
+        if not result.problems:
+            self.stdout.write(self.style.SUCCESS("The register is consistent."))
+            return
+        if not options['fix']:
+            raise CommandError(f"{result.problems} problems found; run with --fix to repair.")
+
+        documents = consistency.fix_documents(result.stale_documents, options['batch_size'])
+        transmittals = consistency.fix_orphans(result.orphan_transmittals)
+        self.stdout.write(self.style.SUCCESS(
+            f"Repaired {documents} documents and deleted {transmittals} orphaned transmittals."))
+        left = (len(result.orphan_transmittals) - transmittals) + len(result.label_problems)
+        if left:
+            self.stdout.write(self.style.WARNING(
+                f"{left} problems need a manual fix (recent or finalised transmittals without "
+                "revisions, revision labels)."))
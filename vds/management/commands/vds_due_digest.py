@@ -0,0 +1,36 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from vds.digest import send_due_digest
+
+
+class Command(BaseCommand):
+    help = ("Email one digest per subscribed address listing the overdue documents and "
+            "those due soon that were not reported before. Meant to run daily.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help="report documents due within this many days "
+                                 "(default: VDS_DUE_DIGEST_DAYS, 14)")
+        parser.add_argument('--date', default=None,
+                            help="run as of this date (YYYY-MM-DD) instead of today")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="print the digests without sending or recording them")
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = datetime.date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f"Invalid date '{options['date']}', expected YYYY-MM-DD.")
+
+        result = send_due_digest(today, options['days'], dry_run=options['dry_run'])
+        if result.dry_run:
+            for message in result.messages:
+                self.stdout.write(f"To: {', '.join(message.to)}\nSubject: {message.subject}\n")
+                self.stdout.write(message.body)
+        verb = "would be sent" if result.dry_run else "sent"
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(result.messages)} digests {verb}, covering {result.entries} due dates."))
@@ -0,0 +1,57 @@
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from vds import jobs
+
+
+class Command(BaseCommand):
+    help = ("Run queued background jobs (vds.jobs): bulk issues, imports, exports and "
+            "large deletions. Runs until interrupted unless --once is given.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help="number of worker threads (default 1)")
+        parser.add_argument('--once', action='store_true',
+                            help="run the jobs that are due, then exit")
+        parser.add_argument('--sleep', type=float, default=1.0,
+                            help="seconds between polls of an empty queue (default 1)")
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        if concurrency < 1:
+            raise CommandError("--concurrency must be at least 1.")
+        stop = threading.Event()
+        if concurrency == 1:
+            # no pool needed: work in this thread, on its connection
+            try:
+                count = jobs.work(once=options['once'], sleep=options['sleep'], stop=stop)
+            except KeyboardInterrupt:
+                # the interrupted job is retried once VDS_JOB_TIMEOUT has passed
+                self.stdout.write("Interrupted.")
+                return
+            self.stdout.write(self.style.SUCCESS(f"{count} jobs run."))
+            return
+        counts = []
+
+        def worker():
+            try:
+                counts.append(jobs.work(once=options['once'], sleep=options['sleep'], stop=stop))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, name=f'vds-worker-{i}')
+                   for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping after the running jobs finish...")
+            stop.set()
+            for thread in threads:
+                thread.join()
+        self.stdout.write(self.style.SUCCESS(f"{sum(counts)} jobs run."))
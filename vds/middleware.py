@@ -0,0 +1,138 @@
+"""Opt-in per-request SQL and latency instrumentation.
+
+Enable it with `VDS_INSTRUMENTATION = True` in the settings (the middleware
+is listed in MIDDLEWARE but disables itself otherwise). For each request it
+records the resolved view name, wall time, number of SQL queries, total SQL
+time and the slowest statement, then:
+- logs the record as JSON on the 'vds.requests' logger;
+- adds the wall time to an in-process rolling window per view, from which
+  p50/p95/p99 are computed on demand (see `request_stats`).
+For streaming responses only the time to build the response is measured.
+The middleware is synchronous, so while it is enabled Django runs the
+async views through its sync adapter; keep it off when measuring ASGI.
+"""
+import json
+import logging
+import math
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('vds.requests')
+
+# number of most recent requests kept per view
+WINDOW_SIZE = 1000
+
+
+class QueryRecorder:
+    """`connection.execute_wrapper` callable collecting SQL timings."""
+
+    __slots__ = ('count', 'total', 'slowest_time', 'slowest_sql')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.slowest_time = 0.0
+        self.slowest_sql = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.total += elapsed
+            if elapsed > self.slowest_time:
+                self.slowest_time = elapsed
+                self.slowest_sql = sql
+
+
+def _percentile(ordered: list, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    rank = math.ceil(fraction * len(ordered))
+    return ordered[max(rank, 1) - 1]
+
+
+class RequestStats:
+    """Thread-safe rolling window of request durations per view."""
+
+    def __init__(self, window_size: int = WINDOW_SIZE):
+        self.window_size = window_size
+        self._lock = threading.Lock()
+        self._durations = {}
+        self._totals = {}
+
+    def add(self, view: str, duration: float, queries: int):
+        with self._lock:
+            window = self._durations.get(view)
+            if window is None:
+                window = self._durations[view] = deque(maxlen=self.window_size)
+            window.append(duration)
+            count, total_queries = self._totals.get(view, (0, 0))
+            self._totals[view] = (count + 1, total_queries + queries)
+
+    def clear(self):
+        with self._lock:
+            self._durations.clear()
+            self._totals.clear()
+
+    def snapshot(self) -> dict:
+        """Return {view: {count, window, p50_ms, p95_ms, p99_ms, mean_queries}}."""
+        with self._lock:
+            windows = {view: sorted(window) for view, window in self._durations.items()}
+            totals = dict(self._totals)
+        result = {}
+        for view, ordered in windows.items():
+            count, total_queries = totals[view]
+            result[view] = {
+                'count': count,
+                'window': len(ordered),
+                'p50_ms': round(_percentile(ordered, 0.50) * 1000, 3),
+                'p95_ms': round(_percentile(ordered, 0.95) * 1000, 3),
+                'p99_ms': round(_percentile(ordered, 0.99) * 1000, 3),
+                'mean_queries': round(total_queries / count, 2),
+            }
+        return result
+
+
+request_stats = RequestStats()
+
+
+class QueryInstrumentationMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'VDS_INSTRUMENTATION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else '<unresolved>'
+        request_stats.add(view, duration, recorder.count)
+        if logger.isEnabledFor(logging.INFO):
+            record = {
+                'view': view,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 3),
+                'queries': recorder.count,
+                'sql_ms': round(recorder.total * 1000, 3),
+                'slowest_sql_ms': round(recorder.slowest_time * 1000, 3),
+                'slowest_sql': recorder.slowest_sql,
+            }
+            logger.info(json.dumps(record), extra={'vds_request': record})
+        return response
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vds', '0007_alter_transmittal_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransmittalSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=30, verbose_name='Source')),
+                ('prefix', models.CharField(blank=True, default='', max_length=50, verbose_name='Prefix')),
+                ('suffix', models.CharField(blank=True, default='', max_length=50, verbose_name='Suffix')),
+                ('width', models.PositiveSmallIntegerField(default=3, verbose_name='Width')),
+                ('value', models.PositiveIntegerField(default=0, verbose_name='Last value')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transmittal_sequences', to='vds.project')),
+            ],
+            options={
+                'verbose_name': 'Transmittal sequence',
+                'verbose_name_plural': 'Transmittal sequences',
+                'constraints': [models.UniqueConstraint(fields=('project', 'source'), name='unique_sequence_per_project_source')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def install(apps, schema_editor):
+    from vds.search import install_search_index
+    install_search_index(schema_editor.connection, rebuild=True)
+
+
+def remove(apps, schema_editor):
+    from vds.search import remove_search_index
+    remove_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    """Backend-specific search index over the document numbers and title.
+
+    SQLite gets an FTS5 trigram table kept in sync by triggers, PostgreSQL
+    a pg_trgm GIN expression index; see vds.search.
+    """
+
+    dependencies = [
+        ('vds', '0008_transmittalsequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, remove),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vds', '0009_document_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['project', 'document_number', 'id'], name='vds_doc_project_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='revision',
+            index=models.Index(fields=['document', 'date', 'id'], name='vds_rev_document_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transmittal',
+            index=models.Index(fields=['project', 'source', 'date_sent', 'id'], name='vds_tr_project_source_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transmittal',
+            index=models.Index(fields=['project', 'date_sent', 'id'], name='vds_tr_project_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transmittal',
+            index=models.Index(fields=['date_sent', 'id'], name='vds_tr_date_sent_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vds', '0010_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20, verbose_name='Kind')),
+                ('key', models.CharField(max_length=30, verbose_name='Key')),
+                ('count', models.IntegerField(default=0, verbose_name='Count')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='vds.project')),
+            ],
+            options={
+                'verbose_name': 'Project statistic',
+                'verbose_name_plural': 'Project statistics',
+                'constraints': [models.UniqueConstraint(fields=('project', 'kind', 'key'), name='unique_stat_per_project')],
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vds', '0011_projectstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DigestSubscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254, verbose_name='Email')),
+                ('discipline', models.CharField(blank=True, default='', max_length=100, verbose_name='Discipline')),
+            ],
+            options={
+                'verbose_name': 'Digest subscription',
+                'verbose_name_plural': 'Digest subscriptions',
+            },
+        ),
+        migrations.CreateModel(
+            name='DueNotice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(max_length=20, verbose_name='Field')),
+                ('due_date', models.DateField(verbose_name='Due date')),
+                ('overdue', models.BooleanField(verbose_name='Overdue')),
+                ('sent_at', models.DateTimeField(auto_now_add=True, verbose_name='Sent at')),
+            ],
+            options={
+                'verbose_name': 'Due notice',
+                'verbose_name_plural': 'Due notices',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['next_due'], name='vds_doc_next_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['required_by'], name='vds_doc_required_by_idx'),
+        ),
+        migrations.AddField(
+            model_name='digestsubscription',
+            name='project',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='digest_subscriptions', to='vds.project'),
+        ),
+        migrations.AddField(
+            model_name='duenotice',
+            name='document',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='due_notices', to='vds.document'),
+        ),
+        migrations.AddConstraint(
+            model_name='duenotice',
+            constraint=models.UniqueConstraint(fields=('document', 'field', 'due_date', 'overdue'), name='unique_due_notice'),
+        ),
+    ]
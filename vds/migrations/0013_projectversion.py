@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def create_versions(apps, schema_editor):
+    Project = apps.get_model('vds', 'Project')
+    ProjectVersion = apps.get_model('vds', 'ProjectVersion')
+    now = timezone.now()
+    ProjectVersion.objects.bulk_create(
+        [ProjectVersion(project_id=pk, changed_at=now)
+         for pk in Project.objects.values_list('pk', flat=True)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vds', '0012_due_digest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectVersion',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='version', serialize=False, to='vds.project')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Version')),
+                ('changed_at', models.DateTimeField(auto_now_add=True, verbose_name='Changed at')),
+            ],
+            options={
+                'verbose_name': 'Project version',
+                'verbose_name_plural': 'Project versions',
+            },
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
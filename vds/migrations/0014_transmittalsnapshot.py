@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 00:08
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vds', '0013_projectversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransmittalSnapshot',
+            fields=[
+                ('transmittal', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='vds.transmittal')),
+                ('finalised_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Finalised at')),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Data')),
+                ('html', models.TextField(blank=True, default='', verbose_name='Rendered page')),
+            ],
+            options={
+                'verbose_name': 'Transmittal snapshot',
+                'verbose_name_plural': 'Transmittal snapshots',
+            },
+        ),
+    ]
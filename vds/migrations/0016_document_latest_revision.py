@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 00:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vds', '0015_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='latest_revision',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='vds.revision'),
+        ),
+    ]
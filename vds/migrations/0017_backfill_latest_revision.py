@@ -0,0 +1,38 @@
+from django.db import migrations, transaction
+from django.db.models import OuterRef, Subquery
+
+# documents updated per UPDATE statement (and transaction)
+BATCH_SIZE = 5000
+
+
+def backfill(apps, schema_editor):
+    """Point every document at its latest revision, a range of ids at a time.
+
+    One UPDATE per batch of document ids, each in its own transaction, so
+    large registers are not locked for the whole backfill and an
+    interrupted run can simply be repeated.
+    """
+    Document = apps.get_model('vds', 'Document')
+    Revision = apps.get_model('vds', 'Revision')
+    latest = Revision.objects.filter(document=OuterRef('pk')).order_by('-date', '-id')
+    documents = Document.objects.using(schema_editor.connection.alias)
+    start = documents.order_by('pk').values_list('pk', flat=True).first()
+    end = documents.order_by('-pk').values_list('pk', flat=True).first()
+    if start is None:
+        return
+    for low in range(start, end + 1, BATCH_SIZE):
+        with transaction.atomic(using=schema_editor.connection.alias):
+            documents.filter(pk__gte=low, pk__lt=low + BATCH_SIZE).update(
+                latest_revision=Subquery(latest.values('pk')[:1]))
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('vds', '0016_document_latest_revision'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop, elidable=True),
+    ]
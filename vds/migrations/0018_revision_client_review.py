@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 00:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vds', '0017_backfill_latest_revision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='revision',
+            name='client_reviewer',
+            field=models.CharField(blank=True, default='', max_length=50, verbose_name='Client reviewer'),
+        ),
+        migrations.AddField(
+            model_name='revision',
+            name='review_code',
+            field=models.CharField(blank=True, default='', max_length=10, verbose_name='Client review code'),
+        ),
+    ]
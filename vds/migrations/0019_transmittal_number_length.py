@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 00:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vds', '0018_revision_client_review'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transmittal',
+            name='number',
+            field=models.CharField(max_length=100, unique=True, verbose_name='Number'),
+        ),
+        migrations.AlterField(
+            model_name='transmittalsequence',
+            name='prefix',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='Prefix'),
+        ),
+    ]
@@ -1,10 +1,12 @@
-from django.db import models
-from django.db.models import Q, UniqueConstraint
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, OuterRef, Q, Subquery, UniqueConstraint
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 import re
 import datetime
 
-from vds.utils import _increment_numeric, _increment_alpha
+from vds.utils import next_revision_label, next_revision_labels
 
 
 class Project(models.Model):
@@ -24,6 +26,11 @@ class Project(models.Model):
     def __str__(self):
         return f"{self.wa_number} - {self.title}"
 
+    def default_transmittal_source(self) -> str:
+        """Source of the project's first transmittal, or 'HOUSE' without one."""
+        first = self.transmittals.order_by('date_sent', 'id').values_list('source', flat=True).first()
+        return first if first is not None else 'HOUSE'
+
     def create_transmittal(self, source: str | None = None):
         """Create and return a new Transmittal for this Project.
 
@@ -31,42 +38,121 @@ class Project(models.Model):
           first (earliest) existing transmittal for this project is used.
           If there are no existing transmittals and no source provided,
           the source defaults to the string 'HOUSE'.
-        - The new transmittal's `number` is computed by taking the most
-          recent transmittal for this project with the chosen source and
-          incrementing any trailing digits (preserving zero-padding). If
-          no matching transmittal exists, numbering starts at '001'. If the
-          most recent number has no trailing digits, '001' is appended.
+        - The new transmittal's `number` is handed out by the project's
+          TransmittalSequence for the chosen source: the trailing digits of
+          the previous number are incremented (preserving zero-padding). If
+          no matching transmittal exists, numbering starts at
+          '<wa_number>-<source>-001', which no other project or source
+          uses. If the most recent number has no trailing digits, '-001'
+          is appended.
 
         Returns the created Transmittal instance (saved to the database).
         """
 
         # determine source if not provided
         if source is None:
-            first = self.transmittals.order_by('date_sent', 'id').first()
-            if first is not None:
-                source = first.source
-            else:
-                source = 'HOUSE'
-
-        # find the most recent transmittal with this source
-        latest = self.transmittals.filter(source=source).order_by('-date_sent', '-id').first()
-        if latest is not None:
-            num = latest.number or ''
-            # find the last numeric group and any trailing non-digit suffix
-            m = re.search(r'^(.*?)(\d+)(\D*)$', num)
-            if m:
-                prefix, digits, suffix = m.group(1), m.group(2), m.group(3)
-                new_digits = _increment_numeric(digits)
-                new_number = f"{prefix}{new_digits}{suffix}"
-            else:
-                # no numeric group -> append '-001'
-                new_number = f"{num}-001" if num else 'TR-001'
-        else:
-            new_number = 'TR-001'
-
-        # create and return the new Transmittal; date_sent set to today
+            source = self.default_transmittal_source()
+
+        # allocate the number and create the transmittal together, so the
+        # sequence never moves past a number that was not used
         today = datetime.date.today()
-        return self.transmittals.create(number=new_number, source=source, date_sent=today)
+        with transaction.atomic():
+            new_number = TransmittalSequence.allocate(self, source)
+            return self.transmittals.create(number=new_number, source=source, date_sent=today)
+
+
+class TransmittalSequence(models.Model):
+    """Per-project, per-source counter used to number new transmittals.
+
+    A number is split into `prefix`, zero-padded digits and `suffix`, so
+    'DOC-009A' is stored as prefix 'DOC-', value 9, width 3, suffix 'A'.
+    `value` holds the last number handed out; allocating the next one is a
+    single atomic UPDATE, so concurrent writers never see the same value.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='transmittal_sequences')
+    source = models.CharField("Source", max_length=30)
+    prefix = models.CharField("Prefix", max_length=100, blank=True, default='')
+    suffix = models.CharField("Suffix", max_length=50, blank=True, default='')
+    width = models.PositiveSmallIntegerField("Width", default=3)
+    value = models.PositiveIntegerField("Last value", default=0)
+
+    class Meta:
+        verbose_name = "Transmittal sequence"
+        verbose_name_plural = "Transmittal sequences"
+        constraints = [
+            UniqueConstraint(fields=['project', 'source'], name='unique_sequence_per_project_source'),
+        ]
+
+    def __str__(self):
+        return f"{self.project_id} {self.source}: {self.format(self.value)}"
+
+    def format(self, value: int) -> str:
+        return f"{self.prefix}{str(value).zfill(self.width)}{self.suffix}"
+
+    @classmethod
+    def seed_defaults(cls, project: Project, source: str) -> dict:
+        """Return the initial field values for a new sequence.
+
+        The sequence continues from the most recent existing transmittal of
+        the project with this source (transmittals created before sequences
+        existed), using the same rules `_increment_numeric` applies: the last
+        numeric group is incremented keeping its zero-padding and any
+        non-digit suffix. A number without digits gets '-001' appended and
+        a source without transmittals starts at '<wa_number>-<source>-001':
+        transmittal numbers are unique across all projects, so the prefix
+        names both.
+        """
+        latest = project.transmittals.filter(source=source).order_by('-date_sent', '-id').first()
+        if latest is None:
+            return {'prefix': f"{project.wa_number}-{source}-", 'suffix': '', 'width': 3,
+                    'value': 0}
+
+        num = latest.number or ''
+        # find the last numeric group and any trailing non-digit suffix
+        m = re.search(r'^(.*?)(\d+)(\D*)$', num)
+        if m:
+            prefix, digits, suffix = m.group(1), m.group(2), m.group(3)
+            return {'prefix': prefix, 'suffix': suffix, 'width': len(digits), 'value': int(digits)}
+        # no numeric group -> append '-001'
+        return {'prefix': f"{num}-" if num else 'TR-', 'suffix': '', 'width': 3, 'value': 0}
+
+    @classmethod
+    def peek(cls, project: Project, source: str) -> str:
+        """Return the number `allocate` would hand out next, reserving nothing.
+
+        Concurrent issues may take the number first, so this is only a
+        preview.
+        """
+        seq = cls.objects.filter(project=project, source=source).first()
+        if seq is None:
+            seq = cls(project=project, source=source, **cls.seed_defaults(project, source))
+        return seq.format(seq.value + 1)
+
+    @classmethod
+    def allocate(cls, project: Project, source: str) -> str:
+        """Reserve and return the next transmittal number for project/source.
+
+        The counter is bumped with `UPDATE ... SET value = value + 1` before
+        it is read, so the row lock (the database write lock on SQLite) is
+        held from the first statement and two concurrent callers always
+        receive different numbers. The row is created on first use; a
+        creation race is resolved by the unique constraint and the loser
+        simply increments the winner's row. Numbers taken by rolled back
+        transactions are reused, numbers of deleted transmittals are not.
+        """
+        sequences = cls.objects.filter(project=project, source=source)
+        with transaction.atomic():
+            if not sequences.update(value=models.F('value') + 1):
+                defaults = cls.seed_defaults(project, source)
+                defaults['value'] += 1
+                try:
+                    with transaction.atomic():
+                        seq = cls.objects.create(project=project, source=source, **defaults)
+                    return seq.format(seq.value)
+                except IntegrityError:
+                    sequences.update(value=models.F('value') + 1)
+            seq = sequences.get()
+        return seq.format(seq.value)
 
 
 class Document(models.Model):
@@ -87,10 +173,21 @@ class Document(models.Model):
     penalty = models.BooleanField("Penalty", default=False)
     milestone = models.BooleanField("Milestone", default=False)
     priority = models.BooleanField("Priority", default=False)
+    # the latest revision (by date, then id), kept up to date wherever
+    # revisions are written: see `refresh_latest_revision`
+    latest_revision = models.ForeignKey('Revision', on_delete=models.SET_NULL, null=True,
+                                        blank=True, editable=False, related_name='+')
 
     class Meta:
         verbose_name = "Document"
         verbose_name_plural = "Documents"
+        indexes = [
+            # register pages and exports: a project's documents by number
+            models.Index(fields=['project', 'document_number', 'id'], name='vds_doc_project_number_idx'),
+            # due digest: range scans over the two due dates
+            models.Index(fields=['next_due'], name='vds_doc_next_due_idx'),
+            models.Index(fields=['required_by'], name='vds_doc_required_by_idx'),
+        ]
         constraints = [
             # enforce uniqueness only when client_number is not null
             UniqueConstraint(fields=['client_number'], condition=~Q(client_number=None), name='unique_client_number_not_null'),
@@ -101,6 +198,30 @@ class Document(models.Model):
     def __str__(self):
         return f"{self.document_number} - {self.title}"
 
+    # latest_revision is kept by the revision writers: a save of an instance
+    # loaded before the latest revision changed must not put the old pointer
+    # back, so an UPDATE only writes it when named in update_fields. Inserts,
+    # and the insert after an UPDATE that matched no row, are left alone.
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')
+                and kwargs.get('using', self._state.db) == self._state.db):
+            deferred = self.get_deferred_fields()
+            if deferred and 'latest_revision_id' not in deferred:
+                # Django saves only the loaded fields of a deferred instance
+                kwargs['update_fields'] = [
+                    field.attname for field in self._meta.concrete_fields
+                    if not field.primary_key and field.attname not in deferred
+                    and field.name != 'latest_revision'
+                ]
+        super().save(*args, **kwargs)
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        if update_fields is None and not self._state.adding:
+            values = [value for value in values if value[0].name != 'latest_revision']
+        return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+
     def revision_next(self) -> str:
         """Return the next revision label for this Document.
 
@@ -110,24 +231,27 @@ class Document(models.Model):
         zero-padding, alphabetic uses per-character increment with Z/z
         preserved.
         """
-        s = getattr(self, 'revision_number', None)
-        if not s:
-            # Return '0' as the default starting label when missing.
-            return '0'
+        return next_revision_label(getattr(self, 'revision_number', None))
 
-        m = re.match(r'^([0-9]+|[A-Za-z]+)', s)
-        if not m:
-            return s
+    @classmethod
+    def refresh_latest_revision(cls, documents, **latest) -> int:
+        """Point `latest_revision` of the `documents` queryset at their latest revision.
 
-        rev = m.group(1)
-        if rev.isdigit():
-            return _increment_numeric(rev)
-        return _increment_alpha(rev)
+        One UPDATE, in the caller's transaction. `latest` maps further
+        Document fields to the Revision field to copy from that revision,
+        e.g. `revision_number='revision_number', latest_issue='date'`.
+        Documents without revisions get None. Returns the number updated.
+        """
+        revisions = Revision.latest_of_document()
+        return documents.update(
+            latest_revision=Subquery(revisions.values('pk')[:1]),
+            **{field: Subquery(revisions.values(source)[:1]) for field, source in latest.items()},
+        )
 
 
 class Transmittal(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='transmittals')
-    number = models.CharField("Number", max_length=50, unique=True)
+    number = models.CharField("Number", max_length=100, unique=True)
     source = models.CharField("Source", max_length=30)
     date_sent = models.DateField("Date sent")
     notes = models.CharField("Notes", max_length=100, blank=True, default='')
@@ -135,10 +259,83 @@ class Transmittal(models.Model):
     class Meta:
         verbose_name = "Transmittal"
         verbose_name_plural = "Transmittals"
+        indexes = [
+            # latest transmittal of a project per source (sequence seeding)
+            models.Index(fields=['project', 'source', 'date_sent', 'id'], name='vds_tr_project_source_idx'),
+            # first transmittal of a project (default source)
+            models.Index(fields=['project', 'date_sent', 'id'], name='vds_tr_project_date_idx'),
+            # most recent transmittals across projects (index page)
+            models.Index(fields=['date_sent', 'id'], name='vds_tr_date_sent_idx'),
+        ]
 
     def __str__(self):
         return f"Transmittal {self.number} (sent: {self.date_sent})"
 
+    def issue_documents(self, document_ids) -> list:
+        """Issue a new Revision in this Transmittal for each given document.
+
+        Bulk counterpart of `Revision.revision_new`, with the same rules:
+        - the new label follows the rules of Document.revision_next(),
+          computed for all documents at once (vds.utils.next_revision_labels);
+        - date is today, purpose 'IFR - Issued for Review', notes empty;
+        - prepared_by/reviewed_by/approved_by are copied from the latest
+          existing revision of each document (None when there is none);
+        - Document.revision_number, latest_issue and latest_revision are
+          updated;
+        - the project statistics (vds.stats) and change version
+          (vds.versions) are updated in the same transaction, since
+          neither bulk write sends signals.
+
+        Documents are fetched together with their latest signatories in a
+        single query, the revisions are inserted with `bulk_create` and the
+        documents are brought up to date with one UPDATE, all in one
+        transaction, so the number of queries does not grow with the
+        selection size (beyond the backend's own bulk insert batching).
+        IDs that do not belong to this transmittal's project are ignored.
+
+        Returns the list of created Revision instances.
+        """
+        from vds import stats, versions
+
+        documents = list(
+            Document.objects
+            .filter(pk__in=document_ids, project_id=self.project_id)
+            .only('id', 'project_id', 'revision_number', 'latest_issue',
+                  'penalty', 'milestone', 'priority')
+            .annotate(**Revision.latest_signatories())
+        )
+        if not documents:
+            return []
+
+        today = datetime.date.today()
+        new_revisions = []
+        labels = next_revision_labels(document.revision_number for document in documents)
+        for document, new_label in zip(documents, labels):
+            new_revisions.append(Revision(
+                transmittal=self,
+                document=document,
+                revision_number=new_label,
+                date=today,
+                purpose='IFR - Issued for Review',
+                prepared_by=document.latest_prepared_by,
+                reviewed_by=document.latest_reviewed_by,
+                approved_by=document.latest_approved_by,
+                notes='',
+            ))
+
+        with transaction.atomic():
+            created = Revision.objects.bulk_create(new_revisions)
+            # copy each new label back onto its Document in a single statement
+            issued = Revision.objects.filter(transmittal=self, document=OuterRef('pk'))
+            Document.objects.filter(pk__in=[d.pk for d in documents]).update(
+                revision_number=Subquery(issued.values('revision_number')[:1]),
+                latest_issue=today,
+                latest_revision=Subquery(issued.values('pk')[:1]),
+            )
+            stats.apply(stats.issue_delta(self.project_id, documents, today))
+            versions.touch(self.project_id)
+        return created
+
 
 class Revision(models.Model):
     transmittal = models.ForeignKey(Transmittal, on_delete=models.CASCADE,
@@ -152,11 +349,18 @@ class Revision(models.Model):
     reviewed_by = models.CharField("Reviewed by", max_length=10, null=True, blank=True)
     approved_by = models.CharField("Approved by", max_length=10, null=True, blank=True)
     notes = models.CharField("Notes", max_length=50, blank=True, default='')
+    # from the comment sheet the client returns (vds.comments)
+    review_code = models.CharField("Client review code", max_length=10, blank=True, default='')
+    client_reviewer = models.CharField("Client reviewer", max_length=50, blank=True, default='')
 
     class Meta:
         verbose_name = "Revision"
         verbose_name_plural = "Revisions"
         ordering = ['-date']
+        indexes = [
+            # latest revision of a document
+            models.Index(fields=['document', 'date', 'id'], name='vds_rev_document_date_idx'),
+        ]
         constraints = [
             UniqueConstraint(fields=['document', 'revision_number'], name='unique_revision_per_document'),
             UniqueConstraint(fields=['transmittal','document', ], name='unique_document_per_transmittal')
@@ -166,6 +370,27 @@ class Revision(models.Model):
         return f"{self.document.document_number} rev {self.revision_number}"
     
 
+    @classmethod
+    def latest_of_document(cls):
+        """Revisions of the outer Document (`OuterRef('pk')`), latest first.
+
+        The order that defines Document.latest_revision; ties on date go
+        to the revision created last.
+        """
+        return cls.objects.filter(document=OuterRef('pk')).order_by('-date', '-id')
+
+    @classmethod
+    def latest_signatories(cls) -> dict:
+        """Annotations copying the signatories of a document's latest revision.
+
+        Keyword arguments for `Document.objects.annotate()`, giving
+        `latest_prepared_by`, `latest_reviewed_by` and `latest_approved_by`
+        (None for documents without revisions), joined through
+        Document.latest_revision.
+        """
+        return {f'latest_{name}': F(f'latest_revision__{name}')
+                for name in ('prepared_by', 'reviewed_by', 'approved_by')}
+
     @classmethod
     def revision_new(cls, transmittal_id: int, document_id: int):
         """Create a new Revision for the given transmittal and document IDs.
@@ -174,8 +399,8 @@ class Revision(models.Model):
         - Sets date to today, purpose to 'IFR - Issued for Review', notes empty.
         - Copies prepared_by/reviewed_by/approved_by from the latest existing
           revision for the same document when present; otherwise uses '*'.
-        - Updates the Document.revision_number and latest_issue to reflect the
-          newly created revision.
+        - Updates the Document.revision_number, latest_issue and
+          latest_revision to reflect the newly created revision.
 
         Returns the created Revision instance.
 
@@ -184,38 +409,187 @@ class Revision(models.Model):
         """
         # Fetch related objects (let exceptions bubble as appropriate)
         transmittal = Transmittal.objects.get(pk=transmittal_id)
-        document = Document.objects.get(pk=document_id)
+        document = Document.objects.select_related('latest_revision').get(pk=document_id)
 
         # Determine new revision label from Document helper
         new_label = document.revision_next()
 
         today = datetime.date.today()
 
-        # Find latest existing revision for this document, if any
-        latest = cls.objects.filter(document=document).order_by('-date').first()
+        # Latest existing revision for this document, if any
+        latest = document.latest_revision
 
         prepared_by = getattr(latest, 'prepared_by', None)
         reviewed_by = getattr(latest, 'reviewed_by', None)
         approved_by = getattr(latest, 'approved_by', None)
 
-        # Create the new revision
-        new_rev = cls.objects.create(
-            transmittal=transmittal,
-            document=document,
-            revision_number=new_label,
-            date=today,
-            purpose='IFR - Issued for Review',
-            prepared_by=prepared_by,
-            reviewed_by=reviewed_by,
-            approved_by=approved_by,
-            notes=''
-        )
-
-        # Update the Document to reflect the new latest revision and issue date
-        document.revision_number = new_label
-        document.latest_issue = today
-        document.save(update_fields=['revision_number', 'latest_issue'])
+        # Create the new revision and point the document at it atomically
+        with transaction.atomic():
+            new_rev = cls.objects.create(
+                transmittal=transmittal,
+                document=document,
+                revision_number=new_label,
+                date=today,
+                purpose='IFR - Issued for Review',
+                prepared_by=prepared_by,
+                reviewed_by=reviewed_by,
+                approved_by=approved_by,
+                notes=''
+            )
+
+            # Update the Document to reflect the new latest revision and issue date
+            document.revision_number = new_label
+            document.latest_issue = today
+            document.latest_revision = new_rev
+            document.save(update_fields=['revision_number', 'latest_issue', 'latest_revision'])
 
         return new_rev
 
 
+
+
+class ProjectStats(models.Model):
+    """Incrementally maintained counters behind the project dashboard.
+
+    One row per (project, kind, key), for example ('status', 'Active'),
+    ('due', '2025-06-30') or ('issued', '2025-06'); see vds.stats for the
+    kinds and how the rows are kept up to date.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='stats')
+    kind = models.CharField("Kind", max_length=20)
+    key = models.CharField("Key", max_length=30)
+    count = models.IntegerField("Count", default=0)
+
+    class Meta:
+        verbose_name = "Project statistic"
+        verbose_name_plural = "Project statistics"
+        constraints = [
+            UniqueConstraint(fields=['project', 'kind', 'key'], name='unique_stat_per_project'),
+        ]
+
+    def __str__(self):
+        return f"{self.project_id} {self.kind}:{self.key} = {self.count}"
+
+
+class DigestSubscription(models.Model):
+    """An email address receiving the due-date digest (see vds.digest).
+
+    A subscription without a project covers every project, one with an
+    empty discipline covers every discipline of its project(s).
+    """
+    email = models.EmailField("Email")
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, null=True, blank=True,
+                                related_name='digest_subscriptions')
+    discipline = models.CharField("Discipline", max_length=100, blank=True, default='')
+
+    class Meta:
+        verbose_name = "Digest subscription"
+        verbose_name_plural = "Digest subscriptions"
+
+    def __str__(self):
+        scope = self.project.wa_number if self.project_id else 'all projects'
+        return f"{self.email} ({scope}{', ' + self.discipline if self.discipline else ''})"
+
+
+class DueNotice(models.Model):
+    """A due date of a document that was already reported in a digest.
+
+    A document is reported once while due soon and once more when it
+    becomes overdue; a new due date starts over.
+    """
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='due_notices')
+    field = models.CharField("Field", max_length=20)
+    due_date = models.DateField("Due date")
+    overdue = models.BooleanField("Overdue")
+    sent_at = models.DateTimeField("Sent at", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Due notice"
+        verbose_name_plural = "Due notices"
+        constraints = [
+            UniqueConstraint(fields=['document', 'field', 'due_date', 'overdue'],
+                             name='unique_due_notice'),
+        ]
+
+    def __str__(self):
+        state = 'overdue' if self.overdue else 'due'
+        return f"{self.document_id} {self.field} {self.due_date} {state}"
+
+
+class ProjectVersion(models.Model):
+    """Change counter of a project's register, driving conditional GETs.
+
+    Bumped (see vds.versions) on every write to the project or to its
+    documents, transmittals and revisions. Kept out of the Project row so
+    that saving a stale Project instance can never move it backwards.
+    """
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='version')
+    version = models.PositiveBigIntegerField("Version", default=0)
+    changed_at = models.DateTimeField("Changed at", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Project version"
+        verbose_name_plural = "Project versions"
+
+    def __str__(self):
+        return f"{self.project_id} v{self.version} ({self.changed_at})"
+
+
+class TransmittalSnapshot(models.Model):
+    """Frozen content of a finalised transmittal (see vds.snapshots).
+
+    `data` holds the transmittal, its project and its revision rows as
+    they were when finalised; `html` optionally holds the rendered details
+    page. Details pages and downloads of a finalised transmittal are served
+    from here, and the row is only removed when an admin reopens it.
+    """
+    transmittal = models.OneToOneField(Transmittal, on_delete=models.CASCADE, primary_key=True,
+                                       related_name='snapshot')
+    finalised_at = models.DateTimeField("Finalised at", default=timezone.now)
+    data = models.JSONField("Data", encoder=DjangoJSONEncoder)
+    html = models.TextField("Rendered page", blank=True, default='')
+
+    class Meta:
+        verbose_name = "Transmittal snapshot"
+        verbose_name_plural = "Transmittal snapshots"
+
+    def __str__(self):
+        return f"{self.transmittal_id} finalised {self.finalised_at}"
+
+
+class Job(models.Model):
+    """A unit of background work, run by `manage.py vds_worker` (see vds.jobs).
+
+    `kind` names a registered handler and `params` its keyword arguments.
+    Workers claim queued jobs whose `run_after` has passed; a failed job is
+    queued again with a back-off until it has used `max_attempts`.
+    """
+    QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+    STATES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    kind = models.CharField("Kind", max_length=50)
+    params = models.JSONField("Parameters", default=dict, encoder=DjangoJSONEncoder)
+    state = models.CharField("State", max_length=10, choices=STATES, default=QUEUED)
+    run_after = models.DateTimeField("Run after", default=timezone.now)
+    attempts = models.PositiveSmallIntegerField("Attempts", default=0)
+    max_attempts = models.PositiveSmallIntegerField("Max attempts", default=3)
+    progress_done = models.PositiveIntegerField("Done", default=0)
+    progress_total = models.PositiveIntegerField("Total", default=0)
+    result = models.JSONField("Result", null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField("Error", blank=True, default='')
+    locked_by = models.CharField("Worker", max_length=100, blank=True, default='')
+    locked_at = models.DateTimeField("Claimed at", null=True, blank=True)
+    created_at = models.DateTimeField("Created at", auto_now_add=True)
+    finished_at = models.DateTimeField("Finished at", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Job"
+        verbose_name_plural = "Jobs"
+        indexes = [
+            # workers: the oldest due job in a state
+            models.Index(fields=['state', 'run_after', 'id'], name='vds_job_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.state})"
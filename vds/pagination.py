@@ -0,0 +1,133 @@
+"""Keyset (seek) pagination helpers for vds querysets.
+
+Instead of OFFSET, each page continues from the ordering values of the last
+row of the previous page, so fetching page 500 costs the same as page 1 as
+long as an index covers the ordering. Cursors are opaque URL-safe tokens
+holding those ordering values.
+"""
+import base64
+import json
+from dataclasses import dataclass, field
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(values) -> str:
+    """Encode a sequence of ordering values as an opaque cursor token."""
+    raw = json.dumps(list(values), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token: str, size: int) -> list:
+    """Decode a cursor token produced by `encode_cursor`.
+
+    `size` is the number of ordering fields the cursor must carry.
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor(token) from exc
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor(token)
+    return values
+
+
+def _seek(ordering, values, lookup: str) -> Q:
+    """Return the filter selecting rows strictly after/before `values`.
+
+    For ordering (a, b) and values (x, y) this is
+    `a > x OR (a = x AND b > y)` with `lookup='gt'`.
+    """
+    condition = Q()
+    for i, name in enumerate(ordering):
+        term = Q(**{f"{name}__{lookup}": values[i]})
+        for prev_name, prev_value in zip(ordering[:i], values[:i]):
+            term &= Q(**{prev_name: prev_value})
+        condition |= term
+    return condition
+
+
+def _values_of(item, ordering) -> list:
+    if isinstance(item, dict):
+        return [item[name] for name in ordering]
+    return [getattr(item, name) for name in ordering]
+
+
+@dataclass
+class KeysetPage:
+    items: list = field(default_factory=list)
+    next_cursor: str | None = None
+    previous_cursor: str | None = None
+    page_size: int = 0
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+
+def _page_query(queryset, ordering, page_size: int, after, before):
+    """Return the queryset fetching one page (plus one row) in seek order."""
+    if before is not None:
+        values = decode_cursor(before, len(ordering))
+        return (queryset.filter(_seek(ordering, values, 'lt'))
+                .order_by(*[f"-{name}" for name in ordering])[:page_size + 1])
+    if after is not None:
+        values = decode_cursor(after, len(ordering))
+        queryset = queryset.filter(_seek(ordering, values, 'gt'))
+    return queryset.order_by(*ordering)[:page_size + 1]
+
+
+def _make_page(rows, ordering, page_size: int, after, before) -> KeysetPage:
+    """Build the KeysetPage from the rows fetched by `_page_query`."""
+    has_more = len(rows) > page_size
+    if before is not None:
+        items = rows[:page_size][::-1]
+        return KeysetPage(
+            items=items,
+            next_cursor=encode_cursor(_values_of(items[-1], ordering)) if items else None,
+            previous_cursor=encode_cursor(_values_of(items[0], ordering)) if has_more else None,
+            page_size=page_size,
+        )
+    items = rows[:page_size]
+    return KeysetPage(
+        items=items,
+        next_cursor=encode_cursor(_values_of(items[-1], ordering)) if has_more else None,
+        previous_cursor=(encode_cursor(_values_of(items[0], ordering))
+                         if after is not None and items else None),
+        page_size=page_size,
+    )
+
+
+def keyset_paginate(queryset, ordering, page_size: int, after: str | None = None,
+                    before: str | None = None) -> KeysetPage:
+    """Return one page of `queryset` ordered ascending by `ordering`.
+
+    - `ordering`: field names forming a unique key, e.g.
+      ('document_number', 'id'). Rows may be model instances or dicts from
+      `.values()`, but must carry every ordering field.
+    - `after`: cursor of the row the page starts after (next page).
+    - `before`: cursor of the row the page ends before (previous page).
+    Only one extra row is fetched to know whether more pages exist.
+
+    Raises InvalidCursor for malformed cursors.
+    """
+    ordering = tuple(ordering)
+    rows = list(_page_query(queryset, ordering, page_size, after, before))
+    return _make_page(rows, ordering, page_size, after, before)
+
+
+async def akeyset_paginate(queryset, ordering, page_size: int, after: str | None = None,
+                           before: str | None = None) -> KeysetPage:
+    """Async version of `keyset_paginate`, for async views."""
+    ordering = tuple(ordering)
+    rows = [row async for row in _page_query(queryset, ordering, page_size, after, before)]
+    return _make_page(rows, ordering, page_size, after, before)
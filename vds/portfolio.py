@@ -0,0 +1,150 @@
+"""Cross-project portfolio report.
+
+One page over every active project (a project with at least one 'Active'
+document), built from three grouped aggregate queries whatever the
+number of projects:
+- documents grouped by (project, vds_status, discipline), with the
+  outstanding penalty/milestone/priority items (flagged, never issued)
+  as conditional counts of the same pass;
+- transmittals sent over the last VDS_PORTFOLIO_MONTHS months, grouped
+  by (project, month, source);
+- the number and title of the active projects.
+The rows are pivoted in Python. The report is kept in the vds cache
+(vds.caching) for VDS_PORTFOLIO_TIMEOUT seconds: unlike the index
+fragments it is not invalidated on writes, so it may be that much out of
+date. `csv_rows` flattens it to one row per project plus a totals row.
+"""
+import datetime
+from collections import Counter
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .caching import get_cache
+from .models import Document, Project, Transmittal
+
+PORTFOLIO_KEY = 'vds:portfolio'
+ACTIVE_STATUS = 'Active'
+FLAGS = ('penalty', 'milestone', 'priority')
+
+
+@dataclass
+class PortfolioRow:
+    """Figures of one project, or the totals over all of them."""
+    id: int | None
+    wa_number: str
+    title: str
+    documents: int = 0
+    by_status: Counter = field(default_factory=Counter)
+    by_discipline: Counter = field(default_factory=Counter)
+    outstanding: Counter = field(default_factory=Counter)
+    # (month as YYYY-MM, source) -> transmittals sent
+    transmittals: Counter = field(default_factory=Counter)
+
+    def add(self, other: 'PortfolioRow'):
+        self.documents += other.documents
+        for name in ('by_status', 'by_discipline', 'outstanding', 'transmittals'):
+            getattr(self, name).update(getattr(other, name))
+
+
+@dataclass
+class Portfolio:
+    generated_at: datetime.datetime
+    statuses: list
+    disciplines: list
+    months: list
+    sources: list
+    projects: list
+    totals: PortfolioRow
+
+
+def months() -> int:
+    return getattr(settings, 'VDS_PORTFOLIO_MONTHS', 12)
+
+
+def _first_month(today: datetime.date, count: int) -> datetime.date:
+    index = today.year * 12 + today.month - 1 - (count - 1)
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def build(today: datetime.date | None = None) -> Portfolio:
+    """Compute the report from the database (three queries)."""
+    today = today or datetime.date.today()
+    rows = {}
+    outstanding = {flag: Count('id', filter=Q(**{flag: True}, latest_issue__isnull=True))
+                   for flag in FLAGS}
+    document_groups = (Document.objects.values('project_id', 'vds_status', 'discipline')
+                       .annotate(n=Count('id'), **outstanding).order_by())
+    for group in document_groups:
+        row = rows.setdefault(group['project_id'], PortfolioRow(group['project_id'], '', ''))
+        row.documents += group['n']
+        row.by_status[group['vds_status']] += group['n']
+        row.by_discipline[group['discipline']] += group['n']
+        for flag in FLAGS:
+            row.outstanding[flag] += group[flag]
+    rows = {pk: row for pk, row in rows.items() if row.by_status[ACTIVE_STATUS]}
+
+    start = _first_month(today, months())
+    transmittal_groups = (Transmittal.objects.filter(date_sent__gte=start)
+                          .annotate(month=TruncMonth('date_sent'))
+                          .values('project_id', 'month', 'source')
+                          .annotate(n=Count('id')).order_by())
+    for group in transmittal_groups:
+        if group['project_id'] in rows:
+            rows[group['project_id']].transmittals[
+                (group['month'].strftime('%Y-%m'), group['source'])] += group['n']
+
+    for pk, wa_number, title in (Project.objects.filter(pk__in=list(rows))
+                                 .values_list('id', 'wa_number', 'title')):
+        rows[pk].wa_number, rows[pk].title = wa_number, title
+
+    totals = PortfolioRow(None, 'Total', '')
+    for row in rows.values():
+        totals.add(row)
+    month_labels = []
+    month = start
+    while month <= today:
+        month_labels.append(month.strftime('%Y-%m'))
+        month = (month + datetime.timedelta(days=32)).replace(day=1)
+    return Portfolio(
+        generated_at=timezone.now(),
+        statuses=sorted(totals.by_status),
+        disciplines=sorted(totals.by_discipline),
+        months=month_labels,
+        sources=sorted({source for _, source in totals.transmittals}),
+        projects=sorted(rows.values(), key=lambda row: row.wa_number),
+        totals=totals,
+    )
+
+
+def report(refresh: bool = False) -> Portfolio:
+    """Return the cached report, building it on a miss or when `refresh`."""
+    cache = get_cache()
+    portfolio = None if refresh else cache.get(PORTFOLIO_KEY)
+    if portfolio is None:
+        portfolio = build()
+        cache.set(PORTFOLIO_KEY, portfolio, getattr(settings, 'VDS_PORTFOLIO_TIMEOUT', 60))
+    return portfolio
+
+
+def csv_header(portfolio: Portfolio) -> list:
+    return (['WA number', 'Title', 'Documents']
+            + [f'Status: {status}' for status in portfolio.statuses]
+            + [f'Discipline: {discipline}' for discipline in portfolio.disciplines]
+            + [f'Outstanding {flag}' for flag in FLAGS]
+            + [f'Transmittals {month} {source}'
+               for month in portfolio.months for source in portfolio.sources])
+
+
+def csv_rows(portfolio: Portfolio):
+    """Yield one list of values per project, then the totals, for `csv_header`."""
+    for row in portfolio.projects + [portfolio.totals]:
+        yield ([row.wa_number, row.title, row.documents]
+               + [row.by_status[status] for status in portfolio.statuses]
+               + [row.by_discipline[discipline] for discipline in portfolio.disciplines]
+               + [row.outstanding[flag] for flag in FLAGS]
+               + [row.transmittals[(month, source)]
+                  for month in portfolio.months for source in portfolio.sources])
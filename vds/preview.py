@@ -0,0 +1,85 @@
+"""Dry-run preview of issuing documents into a new transmittal.
+
+`preview_issue` shows what `Project.create_transmittal` followed by
+`Transmittal.issue_documents` would do, without writing anything:
+- the transmittal source and the number its sequence would hand out;
+- per document, the current and new revision label (computed for the
+  whole selection at once with `next_revision_labels`) and the inherited
+  prepared/reviewed/approved-by;
+- which new labels clash with an existing Revision of the same document
+  (the unique_revision_per_document constraint, which would make the
+  issue fail), found with one query for the whole selection.
+The number of queries does not grow with the selection size.
+"""
+from dataclasses import dataclass, field
+
+from .models import Document, Project, Revision, TransmittalSequence
+from .utils import next_revision_labels
+
+
+@dataclass(frozen=True)
+class PreviewRow:
+    document_id: int
+    document_number: str
+    stub: str
+    current_revision: str | None
+    new_revision: str
+    prepared_by: str | None
+    reviewed_by: str | None
+    approved_by: str | None
+    clash: bool = False
+
+
+@dataclass
+class IssuePreview:
+    source: str
+    transmittal_number: str
+    rows: list = field(default_factory=list)
+    # selected IDs that are not documents of the project (ignored by the issue)
+    missing: list = field(default_factory=list)
+
+    @property
+    def clashes(self) -> list:
+        return [row for row in self.rows if row.clash]
+
+
+def preview_issue(project: Project, document_ids, source: str | None = None) -> IssuePreview:
+    """Return the IssuePreview for issuing `document_ids` of `project`."""
+    document_ids = list(dict.fromkeys(document_ids))
+    documents = list(
+        Document.objects
+        .filter(pk__in=document_ids, project=project)
+        .order_by('document_number')
+        .values('id', 'document_number', 'stub', 'revision_number')
+        .annotate(**Revision.latest_signatories())
+    )
+    labels = next_revision_labels(d['revision_number'] for d in documents)
+
+    clashes = set()
+    if documents:
+        # one query over both columns; the exact (document, label) pairs
+        # are matched here
+        clashes = set(
+            Revision.objects
+            .filter(document_id__in=[d['id'] for d in documents], revision_number__in=set(labels))
+            .values_list('document_id', 'revision_number')
+            .order_by()
+        )
+
+    if source is None:
+        source = project.default_transmittal_source()
+    found = {d['id'] for d in documents}
+    return IssuePreview(
+        source=source,
+        transmittal_number=TransmittalSequence.peek(project, source),
+        rows=[
+            PreviewRow(
+                document_id=d['id'], document_number=d['document_number'], stub=d['stub'],
+                current_revision=d['revision_number'], new_revision=label,
+                prepared_by=d['latest_prepared_by'], reviewed_by=d['latest_reviewed_by'],
+                approved_by=d['latest_approved_by'], clash=(d['id'], label) in clashes,
+            )
+            for d, label in zip(documents, labels)
+        ],
+        missing=[pk for pk in document_ids if pk not in found],
+    )
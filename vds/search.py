@@ -0,0 +1,167 @@
+"""Indexed search of documents by number fragments and title.
+
+`search_documents` matches partial `document_number`, `client_number`,
+`supplier_number` and `title`, optionally within one project, and returns
+ranked results. The index depends on the database backend:
+
+- SQLite: an FTS5 virtual table with the trigram tokenizer
+  (`vds_document_search`), an external-content index over `vds_document`
+  kept in sync by triggers and ranked with bm25();
+- PostgreSQL: a pg_trgm GIN expression index over the same columns,
+  ranked with word_similarity();
+- anything else: `icontains` lookups, without an index.
+
+Trigram indexes need fragments of at least MIN_TERM_LENGTH characters.
+"""
+from django.db import connection
+from django.db.models import Q
+
+from .models import Document
+
+MIN_TERM_LENGTH = 3
+
+FTS_TABLE = 'vds_document_search'
+SEARCH_COLUMNS = ('document_number', 'client_number', 'supplier_number', 'title')
+# bm25 weights of SEARCH_COLUMNS: number hits rank above title hits
+FTS_WEIGHTS = (10.0, 5.0, 5.0, 1.0)
+
+# Postgres expression covered by the GIN trigram index (see migration 0009)
+PG_SEARCH_EXPRESSION = (
+    "lower(coalesce(document_number, '') || ' ' || coalesce(client_number, '') || ' ' || "
+    "coalesce(supplier_number, '') || ' ' || title)"
+)
+PG_INDEX = 'vds_document_search_trgm'
+
+SQLITE_TRIGGERS = {
+    f'{FTS_TABLE}_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON vds_document BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, {', '.join(SEARCH_COLUMNS)})
+            VALUES (new.id, {', '.join(f'new.{c}' for c in SEARCH_COLUMNS)});
+        END""",
+    f'{FTS_TABLE}_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON vds_document BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {', '.join(SEARCH_COLUMNS)})
+            VALUES ('delete', old.id, {', '.join(f'old.{c}' for c in SEARCH_COLUMNS)});
+        END""",
+    f'{FTS_TABLE}_au': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+        AFTER UPDATE OF {', '.join(SEARCH_COLUMNS)} ON vds_document BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {', '.join(SEARCH_COLUMNS)})
+            VALUES ('delete', old.id, {', '.join(f'old.{c}' for c in SEARCH_COLUMNS)});
+            INSERT INTO {FTS_TABLE}(rowid, {', '.join(SEARCH_COLUMNS)})
+            VALUES (new.id, {', '.join(f'new.{c}' for c in SEARCH_COLUMNS)});
+        END""",
+}
+
+
+def install_search_index(conn, rebuild: bool = False):
+    """Create the search index for the backend of `conn` if it is missing.
+
+    Idempotent, so it is run after every migrate: SQLite drops triggers
+    whenever Django rebuilds the vds_document table, and the FTS index is
+    rebuilt from vds_document when that happened (or with `rebuild`).
+    Backends without a supported index are left alone.
+    """
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') "
+                           "AND name LIKE %s", [f'{FTS_TABLE}%'])
+            existing = {row[0] for row in cursor.fetchall()}
+            if FTS_TABLE not in existing:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                    f"{', '.join(SEARCH_COLUMNS)}, content='vds_document', "
+                    f"content_rowid='id', tokenize='trigram')"
+                )
+            missing = [name for name in SQLITE_TRIGGERS if name not in existing]
+            for name in missing:
+                cursor.execute(SQLITE_TRIGGERS[name])
+            if rebuild or missing:
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        elif conn.vendor == 'postgresql':
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON vds_document "
+                           f"USING gin (({PG_SEARCH_EXPRESSION}) gin_trgm_ops)")
+
+
+def remove_search_index(conn):
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif conn.vendor == 'postgresql':
+            cursor.execute(f"DROP INDEX IF EXISTS {PG_INDEX}")
+
+
+def search_terms(query: str) -> list[str]:
+    """Split a query into the fragments the trigram index can match."""
+    return [term for term in (query or '').split() if len(term) >= MIN_TERM_LENGTH]
+
+
+def _fts_match(terms) -> str:
+    # every fragment is a quoted phrase; FTS5 ANDs space separated phrases
+    return ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def _ranked_ids(terms, project_id, limit: int, offset: int) -> list[int]:
+    project_filter = "AND d.project_id = %s" if project_id is not None else ""
+    project_params = [project_id] if project_id is not None else []
+    if connection.vendor == 'sqlite':
+        sql = (
+            f"SELECT d.id FROM {FTS_TABLE} s JOIN vds_document d ON d.id = s.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s {project_filter} "
+            f"ORDER BY bm25({FTS_TABLE}, {', '.join(map(str, FTS_WEIGHTS))}), d.id "
+            f"LIMIT %s OFFSET %s"
+        )
+        params = [_fts_match(terms), *project_params, limit, offset]
+    else:
+        conditions = ' AND '.join([f"{PG_SEARCH_EXPRESSION} LIKE %s"] * len(terms))
+        sql = (
+            f"SELECT d.id FROM vds_document d WHERE {conditions} {project_filter} "
+            f"ORDER BY word_similarity(%s, {PG_SEARCH_EXPRESSION}) DESC, d.id "
+            f"LIMIT %s OFFSET %s"
+        )
+        like = [f"%{connection.ops.prep_for_like_query(t.lower())}%" for t in terms]
+        params = [*like, *project_params, ' '.join(terms).lower(), limit, offset]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _fallback_ids(terms, project_id, limit: int, offset: int) -> list[int]:
+    documents = Document.objects.all()
+    if project_id is not None:
+        documents = documents.filter(project_id=project_id)
+    for term in terms:
+        match = Q()
+        for column in SEARCH_COLUMNS:
+            match |= Q(**{f"{column}__icontains": term})
+        documents = documents.filter(match)
+    return list(documents.order_by('document_number', 'id')
+                .values_list('id', flat=True)[offset:offset + limit])
+
+
+def search_documents(query: str, project_id: int | None = None, limit: int = 50,
+                     offset: int = 0) -> list:
+    """Return up to `limit` Documents matching `query`, best matches first.
+
+    Every whitespace separated fragment of `query` (at least MIN_TERM_LENGTH
+    characters) must occur in one of the searched columns. Results carry
+    their project (select_related) and are fetched in two queries: ranked
+    IDs from the index, then the rows themselves.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    if connection.vendor in ('sqlite', 'postgresql'):
+        ids = _ranked_ids(terms, project_id, limit, offset)
+    else:
+        ids = _fallback_ids(terms, project_id, limit, offset)
+    if not ids:
+        return []
+    rows = Document.objects.select_related('project').only(
+        'id', 'title', 'stub', 'document_number', 'client_number', 'supplier_number',
+        'revision_number', 'project__id', 'project__wa_number', 'project__title',
+    ).in_bulk(ids)
+    return [rows[pk] for pk in ids if pk in rows]
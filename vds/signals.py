@@ -0,0 +1,197 @@
+"""Signal handlers keeping caches, statistics, change versions, latest revision
+pointers and search index in step with the data."""
+import threading
+
+from django.db import connections
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import stats, versions
+from .caching import LATEST_PROJECTS_KEY, RECENT_TRANSMITTALS_KEY, invalidate
+from .models import Document, Project, ProjectVersion, Revision, Transmittal
+from .search import install_search_index
+
+
+@receiver([post_save, post_delete], sender=Project, dispatch_uid='vds_project_cache')
+def project_changed(sender, **kwargs):
+    invalidate(LATEST_PROJECTS_KEY)
+
+
+@receiver([post_save, post_delete], sender=Transmittal, dispatch_uid='vds_transmittal_cache')
+def transmittal_changed(sender, **kwargs):
+    invalidate(RECENT_TRANSMITTALS_KEY)
+
+
+def ensure_search_index(sender, using, **kwargs):
+    """Restore the search index triggers after every migrate.
+
+    Connected in VdsConfig.ready(); SQLite loses them whenever a migration
+    rebuilds the vds_document table.
+    """
+    connection = connections[using]
+    if Document._meta.db_table in connection.introspection.table_names():
+        install_search_index(connection)
+
+
+# Project statistics (vds.stats) and change versions (vds.versions) --------
+
+@receiver(post_save, sender=Project, dispatch_uid='vds_project_version')
+def project_saved(sender, instance, created=False, **kwargs):
+    if created:
+        ProjectVersion.objects.get_or_create(project=instance)
+    else:
+        versions.touch(instance.pk)
+
+
+def _deleting_project(origin) -> bool:
+    """True when a delete cascades from a Project, whose stats go with it."""
+    return isinstance(origin, Project) or (
+        isinstance(origin, QuerySet) and origin.model is Project)
+
+
+def _document_state(pk):
+    row = Document.objects.filter(pk=pk).values(*stats.DOCUMENT_FIELDS).first()
+    return stats.document_contributions(row) if row else stats.Counter()
+
+
+@receiver(pre_save, sender=Document, dispatch_uid='vds_document_stats_pre')
+def document_stats_before(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not set(update_fields) & {
+            f.removesuffix('_id') for f in stats.DOCUMENT_FIELDS}):
+        instance._stats_before = None
+        return
+    instance._stats_before = _document_state(instance.pk) if instance.pk else stats.Counter()
+
+
+@receiver(post_save, sender=Document, dispatch_uid='vds_document_stats_post')
+def document_stats_after(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    before = getattr(instance, '_stats_before', None)
+    # a document moved to another project changes the old one too
+    versions.touch(instance.project_id, *{project_id for project_id, _, _ in before or ()})
+    if before is None:
+        return
+    if set(stats.DOCUMENT_FIELDS) & instance.get_deferred_fields():
+        after = _document_state(instance.pk)
+    else:
+        after = stats.document_contributions(instance)
+    stats.apply(stats.difference(before, after))
+    instance._stats_before = None
+
+
+# document/transmittal id -> project id of rows being deleted, so the
+# revisions deleted with them can be counted without a query per revision
+_deleting = threading.local()
+
+
+def _deleting_map(name) -> dict:
+    if not hasattr(_deleting, name):
+        setattr(_deleting, name, {})
+    return getattr(_deleting, name)
+
+
+@receiver(pre_delete, sender=Document, dispatch_uid='vds_document_stats_pre_delete')
+def document_stats_deleting(sender, instance, **kwargs):
+    _deleting_map('documents')[instance.pk] = instance.project_id
+
+
+@receiver(pre_delete, sender=Transmittal, dispatch_uid='vds_transmittal_stats_pre_delete')
+def transmittal_stats_deleting(sender, instance, **kwargs):
+    _deleting_map('transmittals')[instance.pk] = instance.project_id
+
+
+@receiver(post_delete, sender=Document, dispatch_uid='vds_document_stats_delete')
+def document_stats_deleted(sender, instance, origin=None, **kwargs):
+    _deleting_map('documents').pop(instance.pk, None)
+    if not _deleting_project(origin):
+        versions.touch(instance.project_id)
+        stats.apply(stats.difference(stats.document_contributions(instance), stats.Counter()))
+
+
+@receiver(post_delete, sender=Transmittal, dispatch_uid='vds_transmittal_stats_delete')
+def transmittal_stats_deleted(sender, instance, origin=None, **kwargs):
+    _deleting_map('transmittals').pop(instance.pk, None)
+    if not _deleting_project(origin):
+        versions.touch(instance.project_id)
+
+
+@receiver(post_save, sender=Transmittal, dispatch_uid='vds_transmittal_version')
+def transmittal_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        versions.touch(instance.project_id)
+
+
+def _revision_project_id(revision):
+    document = Revision._meta.get_field('document').get_cached_value(revision, None)
+    if document is not None:
+        return document.project_id
+    project_id = _deleting_map('documents').get(revision.document_id)
+    if project_id is None:
+        project_id = _deleting_map('transmittals').get(revision.transmittal_id)
+    if project_id is None:
+        project_id = (Transmittal.objects.filter(pk=revision.transmittal_id)
+                      .values_list('project_id', flat=True).first())
+    return project_id
+
+
+@receiver(pre_save, sender=Revision, dispatch_uid='vds_revision_stats_pre')
+def revision_stats_before(sender, instance, raw=False, **kwargs):
+    instance._stats_before = None
+    if raw:
+        return
+    if instance.pk:
+        old = (Revision.objects.filter(pk=instance.pk)
+               .values('date', 'document_id', 'document__project_id').first())
+        if old:
+            instance._document_before = old['document_id']
+            instance._stats_before = stats.revision_contributions(old['document__project_id'],
+                                                                  old['date'])
+            return
+    instance._stats_before = stats.Counter()
+
+
+@receiver(post_save, sender=Revision, dispatch_uid='vds_revision_stats_post')
+def revision_stats_after(sender, instance, raw=False, **kwargs):
+    before = getattr(instance, '_stats_before', None)
+    if raw or before is None:
+        return
+    project_id = _revision_project_id(instance)
+    versions.touch(project_id, *{old_project for old_project, _, _ in before})
+    after = stats.revision_contributions(project_id, instance.date)
+    stats.apply(stats.difference(before, after))
+    instance._stats_before = None
+
+
+@receiver(post_delete, sender=Revision, dispatch_uid='vds_revision_stats_delete')
+def revision_stats_deleted(sender, instance, origin=None, **kwargs):
+    if _deleting_project(origin):
+        return
+    project_id = _revision_project_id(instance)
+    if project_id is not None:
+        versions.touch(project_id)
+        stats.apply(stats.difference(
+            stats.revision_contributions(project_id, instance.date), stats.Counter()))
+
+
+# Document.latest_revision ---------------------------------------------------
+# Bulk writers (Transmittal.issue_documents, vds.deletion) keep the pointer
+# themselves; these cover revisions saved or deleted one at a time.
+
+@receiver(post_save, sender=Revision, dispatch_uid='vds_revision_latest')
+def revision_saved_latest(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # a revision moved to another document changes the old one too
+    documents = {instance.document_id, getattr(instance, '_document_before', None) or instance.document_id}
+    instance._document_before = None
+    Document.refresh_latest_revision(Document.objects.filter(pk__in=documents))
+
+
+@receiver(post_delete, sender=Revision, dispatch_uid='vds_revision_latest_delete')
+def revision_deleted_latest(sender, instance, origin=None, **kwargs):
+    # nothing to point at when the document goes too
+    if _deleting_project(origin) or instance.document_id in _deleting_map('documents'):
+        return
+    Document.refresh_latest_revision(Document.objects.filter(pk=instance.document_id))
@@ -0,0 +1,114 @@
+"""Finalised transmittals, served from an immutable snapshot.
+
+`finalise` freezes a transmittal once it has been sent:
+- its header, project and revision rows are read once (two queries) and
+  stored compactly in a TransmittalSnapshot: one list of values per row,
+  in the order of TRANSMITTAL_COLUMNS;
+- with VDS_SNAPSHOT_HTML (the default) the details page is rendered once
+  and stored as well.
+From then on the details page and the CSV download read that single row
+and never join revisions, documents or the project again, whatever the
+size of those tables. Later edits of the live rows do not change what
+was sent; only `reopen` (an admin action) drops the snapshot. Both bump
+the project version (vds.versions), so cached pages are revalidated.
+"""
+import datetime
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from . import versions
+from .models import Revision, Transmittal, TransmittalSnapshot
+
+# (Revision field, column header) of the snapshot rows and the download
+TRANSMITTAL_COLUMNS = (
+    ('document__document_number', 'Document number'),
+    ('document__stub', 'Stub'),
+    ('revision_number', 'Revision'),
+    ('date', 'Date'),
+    ('purpose', 'Purpose'),
+    ('prepared_by', 'Prepared by'),
+    ('reviewed_by', 'Reviewed by'),
+    ('approved_by', 'Approved by'),
+    ('notes', 'Notes'),
+)
+TRANSMITTAL_HEADER = [header for _, header in TRANSMITTAL_COLUMNS]
+
+
+def live_rows(transmittal_id: int):
+    """Return the revision rows of a transmittal as value tuples."""
+    return (Revision.objects
+            .filter(transmittal_id=transmittal_id)
+            .order_by('document')
+            .values_list(*[name for name, _ in TRANSMITTAL_COLUMNS]))
+
+
+def build(transmittal: Transmittal) -> dict:
+    """Return the snapshot data of `transmittal` (its project must be loaded)."""
+    project = transmittal.project
+    return {
+        'transmittal': {'id': transmittal.pk, 'number': transmittal.number,
+                        'source': transmittal.source, 'date_sent': transmittal.date_sent,
+                        'notes': transmittal.notes},
+        'project': {'id': project.pk, 'wa_number': project.wa_number, 'title': project.title},
+        'rows': [list(row) for row in live_rows(transmittal.pk)],
+    }
+
+
+def context(snapshot: TransmittalSnapshot) -> dict:
+    """Template context of vds/transmittal_details.html built from `snapshot`."""
+    data = snapshot.data
+    transmittal = dict(data['transmittal'], project=data['project'])
+    transmittal['date_sent'] = datetime.date.fromisoformat(transmittal['date_sent'])
+    revisions = []
+    for row in data['rows']:
+        values = dict(zip((name for name, _ in TRANSMITTAL_COLUMNS), row))
+        revisions.append({
+            'document': {'document_number': values.pop('document__document_number'),
+                         'stub': values.pop('document__stub')},
+            **values,
+            'date': datetime.date.fromisoformat(values['date']),
+        })
+    return {'transmittal': transmittal, 'revisions': revisions, 'snapshot': snapshot}
+
+
+def rows(snapshot: TransmittalSnapshot) -> list:
+    return snapshot.data['rows']
+
+
+def finalise(transmittal: Transmittal, render_html: bool | None = None) -> TransmittalSnapshot:
+    """Snapshot `transmittal` and return the snapshot; see the module docstring.
+
+    A transmittal that is already finalised keeps its existing snapshot.
+    """
+    if render_html is None:
+        render_html = getattr(settings, 'VDS_SNAPSHOT_HTML', True)
+    with transaction.atomic():
+        transmittal = (Transmittal.objects.select_related('project').select_for_update(of=('self',))
+                       .get(pk=transmittal.pk))
+        existing = TransmittalSnapshot.objects.filter(pk=transmittal.pk).first()
+        if existing is not None:
+            return existing
+        # the data goes through JSON first, so the stored page is rendered
+        # from exactly what later requests will read
+        data = json.loads(json.dumps(build(transmittal), cls=DjangoJSONEncoder))
+        snapshot = TransmittalSnapshot(transmittal=transmittal, finalised_at=timezone.now(),
+                                       data=data)
+        if render_html:
+            snapshot.html = render_to_string('vds/transmittal_details.html', context(snapshot))
+        snapshot.save(force_insert=True)
+        versions.touch(transmittal.project_id)
+    return snapshot
+
+
+def reopen(transmittal: Transmittal) -> bool:
+    """Drop the snapshot of `transmittal`; return whether it was finalised."""
+    with transaction.atomic():
+        deleted, _ = TransmittalSnapshot.objects.filter(pk=transmittal.pk).delete()
+        if deleted:
+            versions.touch(transmittal.project_id)
+    return bool(deleted)
@@ -0,0 +1,270 @@
+"""Per-project statistics kept in the ProjectStats table.
+
+Each document and revision contributes to a few (kind, key) counters of
+its project:
+
+- ('documents', 'total') for every document;
+- ('status', <vds_status>) for every document;
+- ('due', <next_due as YYYY-MM-DD>) for documents with a next_due date;
+- ('outstanding', 'penalty' | 'milestone' | 'priority') for flagged
+  documents that have never been issued (no latest_issue);
+- ('issued', <YYYY-MM>) for every revision, by revision date.
+
+Time-dependent figures such as "overdue" are derived when reading, by
+summing the small per-date 'due' rows, so the counters never go stale as
+days pass. Writes apply the difference between a row's old and new
+contributions (see the handlers in vds.signals). Bulk paths wrap their work
+in `batch()`, which collects the deltas and applies them in a handful of
+queries on exit. `compute` recomputes everything set-based for the
+rebuild_stats command.
+"""
+import datetime
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncMonth
+
+from .models import Document, ProjectStats, Revision
+
+FLAGS = ('penalty', 'milestone', 'priority')
+# Document fields the counters depend on
+DOCUMENT_FIELDS = ('project_id', 'vds_status', 'next_due', 'latest_issue') + FLAGS
+REVISION_FIELDS = ('document_id', 'date')
+
+
+def _get(obj, name):
+    return obj[name] if isinstance(obj, dict) else getattr(obj, name)
+
+
+def document_contributions(doc) -> Counter:
+    """Return {(project_id, kind, key): 1} for a Document (or values dict)."""
+    project_id = _get(doc, 'project_id')
+    result = Counter()
+    result[(project_id, 'documents', 'total')] += 1
+    result[(project_id, 'status', _get(doc, 'vds_status'))] += 1
+    next_due = _get(doc, 'next_due')
+    if next_due:
+        result[(project_id, 'due', next_due.isoformat())] += 1
+    if not _get(doc, 'latest_issue'):
+        for flag in FLAGS:
+            if _get(doc, flag):
+                result[(project_id, 'outstanding', flag)] += 1
+    return result
+
+
+def revision_contributions(project_id, date) -> Counter:
+    return Counter({(project_id, 'issued', date.strftime('%Y-%m')): 1})
+
+
+def issue_delta(project_id, documents, date) -> Counter:
+    """Delta for issuing one revision dated `date` to each of `documents`.
+
+    `documents` are in their state before the issue: flagged ones that had
+    never been issued stop being outstanding.
+    """
+    delta = Counter({(project_id, 'issued', date.strftime('%Y-%m')): len(documents)})
+    for document in documents:
+        if not document.latest_issue:
+            for flag in FLAGS:
+                if getattr(document, flag):
+                    delta[(project_id, 'outstanding', flag)] -= 1
+    return delta
+
+
+def difference(before: Counter, after: Counter) -> Counter:
+    """Return after - before, keeping negative entries."""
+    delta = Counter(after)
+    delta.subtract(before)
+    return delta
+
+
+_local = threading.local()
+
+
+@contextmanager
+def batch():
+    """Collect the deltas applied inside the block and write them on exit.
+
+    Nested batches join the outermost one. Nothing is written when the
+    block raises or the surrounding transaction is marked for rollback
+    (as dry runs do), since the counted changes are rolled back anyway.
+    """
+    if getattr(_local, 'pending', None) is not None:
+        yield
+        return
+    _local.pending = Counter()
+    try:
+        yield
+        pending = _local.pending
+    finally:
+        _local.pending = None
+    if not (transaction.get_connection().in_atomic_block and transaction.get_rollback()):
+        _write(pending)
+
+
+def apply(delta: Counter):
+    """Add `delta` to the counters, now or at the end of the current batch."""
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        pending.update(delta)
+    else:
+        _write(delta)
+
+
+def _write(delta: Counter):
+    """Atomically add each non-zero entry of `delta` to its counter row.
+
+    Missing rows are created at zero first (ignoring conflicts with
+    concurrent writers; decrements of a missing row are dropped, leaving
+    the drift to rebuild_stats), then incremented with one UPDATE per distinct
+    delta value, so concurrent updates are never lost.
+    """
+    delta = {key: value for key, value in delta.items() if value}
+    if not delta:
+        return
+    with transaction.atomic(savepoint=False):
+        # counters only go down after a row contributed to them, so only
+        # increments may need a new row
+        new_rows = [ProjectStats(project_id=p, kind=kind, key=key, count=0)
+                    for (p, kind, key), value in delta.items() if value > 0]
+        if new_rows:
+            ProjectStats.objects.bulk_create(new_rows, ignore_conflicts=True)
+        project_ids = {p for p, _, _ in delta}
+        ids = {
+            (row['project_id'], row['kind'], row['key']): row['id']
+            for row in ProjectStats.objects.filter(project_id__in=project_ids)
+            .values('id', 'project_id', 'kind', 'key')
+        }
+        by_value = {}
+        for key, value in delta.items():
+            if key in ids:
+                by_value.setdefault(value, []).append(ids[key])
+        for value, row_ids in by_value.items():
+            ProjectStats.objects.filter(pk__in=row_ids).update(count=F('count') + value)
+
+
+def document_counters(documents) -> Counter:
+    """Return the counters contributed by a Document queryset, set-based."""
+    result = Counter()
+    outstanding = {flag: Count('id', filter=Q(**{flag: True}, latest_issue__isnull=True))
+                   for flag in FLAGS}
+    for row in documents.values('project_id').annotate(n=Count('id'), **outstanding).order_by():
+        result[(row['project_id'], 'documents', 'total')] = row['n']
+        for flag in FLAGS:
+            if row[flag]:
+                result[(row['project_id'], 'outstanding', flag)] = row[flag]
+    for row in documents.values('project_id', 'vds_status').annotate(n=Count('id')).order_by():
+        result[(row['project_id'], 'status', row['vds_status'])] = row['n']
+    for row in (documents.filter(next_due__isnull=False)
+                .values('project_id', 'next_due').annotate(n=Count('id')).order_by()):
+        result[(row['project_id'], 'due', row['next_due'].isoformat())] = row['n']
+    return result
+
+
+def revision_counters(revisions) -> Counter:
+    """Return the counters contributed by a Revision queryset, set-based."""
+    result = Counter()
+    for row in (revisions.annotate(month=TruncMonth('date'))
+                .values('document__project_id', 'month').annotate(n=Count('id')).order_by()):
+        result[(row['document__project_id'], 'issued', row['month'].strftime('%Y-%m'))] = row['n']
+    return result
+
+
+def compute(project_ids=None) -> Counter:
+    """Recompute every counter from Document and Revision, set-based.
+
+    Returns {(project_id, kind, key): count} for the given projects (all
+    when None), using a few grouped aggregate queries.
+    """
+    documents = Document.objects.all()
+    revisions = Revision.objects.all()
+    if project_ids is not None:
+        documents = documents.filter(project_id__in=project_ids)
+        revisions = revisions.filter(document__project_id__in=project_ids)
+    result = document_counters(documents)
+    result.update(revision_counters(revisions))
+    return result
+
+
+def stored(project_ids=None) -> Counter:
+    rows = ProjectStats.objects.all()
+    if project_ids is not None:
+        rows = rows.filter(project_id__in=project_ids)
+    return Counter({
+        (row['project_id'], row['kind'], row['key']): row['count']
+        for row in rows.values('project_id', 'kind', 'key', 'count') if row['count']
+    })
+
+
+def drift(project_ids=None) -> dict:
+    """Return {(project_id, kind, key): (stored, actual)} where they differ."""
+    actual = compute(project_ids)
+    current = stored(project_ids)
+    return {
+        key: (current.get(key, 0), actual.get(key, 0))
+        for key in set(actual) | set(current)
+        if current.get(key, 0) != actual.get(key, 0)
+    }
+
+
+def rebuild(project_ids=None) -> int:
+    """Replace the stored counters with freshly computed ones.
+
+    Returns the number of rows written.
+    """
+    actual = compute(project_ids)
+    with transaction.atomic():
+        rows = ProjectStats.objects.all()
+        if project_ids is not None:
+            rows = rows.filter(project_id__in=project_ids)
+        rows.delete()
+        ProjectStats.objects.bulk_create(
+            [ProjectStats(project_id=p, kind=kind, key=key, count=n)
+             for (p, kind, key), n in actual.items() if n],
+            batch_size=1000,
+        )
+    return sum(1 for n in actual.values() if n)
+
+
+def _summarise(rows, today: datetime.date | None, due_days: int) -> dict:
+    today = today or datetime.date.today()
+    soon = (today + datetime.timedelta(days=due_days)).isoformat()
+    month = today.strftime('%Y-%m')
+    summary = {
+        'documents': 0, 'by_status': {}, 'overdue': 0, 'due_soon': 0, 'due_days': due_days,
+        'issued_this_month': 0, 'outstanding': dict.fromkeys(FLAGS, 0),
+    }
+    for kind, key, count in rows:
+        if kind == 'documents':
+            summary['documents'] = count
+        elif kind == 'status':
+            summary['by_status'][key] = count
+        elif kind == 'due':
+            if key < today.isoformat():
+                summary['overdue'] += count
+            elif key <= soon:
+                summary['due_soon'] += count
+        elif kind == 'issued' and key == month:
+            summary['issued_this_month'] = count
+        elif kind == 'outstanding':
+            summary['outstanding'][key] = count
+    summary['by_status'] = dict(sorted(summary['by_status'].items()))
+    return summary
+
+
+def _dashboard_rows(project):
+    return project.stats.filter(count__gt=0).values_list('kind', 'key', 'count')
+
+
+def dashboard(project, today: datetime.date | None = None, due_days: int = 14) -> dict:
+    """Summarise a project's counters for display; one query on ProjectStats."""
+    return _summarise(_dashboard_rows(project), today, due_days)
+
+
+async def adashboard(project, today: datetime.date | None = None, due_days: int = 14) -> dict:
+    """Async version of `dashboard`."""
+    rows = [row async for row in _dashboard_rows(project)]
+    return _summarise(rows, today, due_days)
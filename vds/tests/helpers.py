@@ -0,0 +1,51 @@
+"""Shared helpers for the vds tests."""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from vds.models import Project, Document
+
+
+def create_project(wa_number='WA-T', **fields):
+    values = dict(client_number='C-T', drm_ref_number='DRMT', title='P T', stub='PT',
+                  client_title='PTT', country='Nowhere')
+    values.update(fields)
+    return Project.objects.create(wa_number=wa_number, **values)
+
+
+def create_documents(project, count, start=0, **fields):
+    return Document.objects.bulk_create([
+        Document(project=project, title=f'Doc {i}', stub='ST', discipline='MECH',
+                 document_number=f'{project.wa_number}-{i:06d}', **fields)
+        for i in range(start, start + count)
+    ])
+
+
+class QueryBudgetTestCase(TestCase):
+    """TestCase with assertions that cap the number of SQL queries.
+
+    Unlike assertNumQueries, a budget is an upper bound, so views can get
+    cheaper without touching the tests, while any N+1 regression fails
+    with the list of executed queries.
+    """
+
+    @contextmanager
+    def assertMaxQueries(self, budget, using=DEFAULT_DB_ALIAS):
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        executed = len(context.captured_queries)
+        if executed > budget:
+            queries = '\n'.join(
+                f"{i}. {q['sql']}" for i, q in enumerate(context.captured_queries, start=1)
+            )
+            self.fail(f"{executed} queries executed, budget is {budget}\n{queries}")
+
+    def assertQueryBudget(self, budget, url, method='get', data=None, status=None):
+        """Request `url` and assert it stays within `budget` queries."""
+        with self.assertMaxQueries(budget):
+            response = getattr(self.client, method)(url, data or {})
+        if status is not None:
+            self.assertEqual(response.status_code, status)
+        return response
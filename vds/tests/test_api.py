@@ -0,0 +1,259 @@
+import datetime
+import json
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from vds import stats
+from vds.models import Document, Revision, Transmittal
+
+from .helpers import create_documents, create_project
+
+
+class ApiTestCase(TestCase):
+    def setUp(self):
+        self.project = create_project('WA-API')
+        self.documents = create_documents(self.project, 5)
+        stats.rebuild()
+        self.staff = User.objects.create_user('staff', password='pw', is_staff=True)
+        self.client.force_login(self.staff)
+
+    def post_json(self, name, args, body):
+        return self.client.post(reverse(f'vds:{name}', args=args), json.dumps(body),
+                                content_type='application/json')
+
+    def count_queries(self, name, args, body):
+        with CaptureQueriesContext(connection) as context:
+            response = self.post_json(name, args, body)
+        return response, len(context.captured_queries)
+
+
+class ApiReadTests(ApiTestCase):
+    def test_keyset_pagination(self):
+        url = reverse('vds:api_document_list', args=(self.project.id,))
+        first = self.client.get(url, {'page_size': 2}).json()
+        self.assertEqual([d['document_number'] for d in first['results']],
+                         ['WA-API-000000', 'WA-API-000001'])
+        self.assertIsNone(first['previous_cursor'])
+
+        second = self.client.get(url, {'page_size': 2, 'after': first['next_cursor']}).json()
+        self.assertEqual([d['document_number'] for d in second['results']],
+                         ['WA-API-000002', 'WA-API-000003'])
+        back = self.client.get(url, {'page_size': 2, 'before': second['previous_cursor']}).json()
+        self.assertEqual(back['results'], first['results'])
+
+        self.assertEqual(self.client.get(url, {'after': 'garbage'}).status_code, 400)
+
+    def test_field_selection(self):
+        url = reverse('vds:api_document_list', args=(self.project.id,))
+        # the ordering fields are used for the cursor but not returned
+        with self.assertNumQueries(2):
+            data = self.client.get(url, {'fields': 'title', 'page_size': 2}).json()
+        self.assertEqual(data['results'], [{'title': 'Doc 0'}, {'title': 'Doc 1'}])
+        self.assertIsNotNone(data['next_cursor'])
+
+        response = self.client.get(url, {'fields': 'title,secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.json()['error'])
+
+        detail = self.client.get(reverse('vds:api_document_detail', args=(self.documents[0].id,)),
+                                 {'fields': 'id,vds_status'}).json()
+        self.assertEqual(detail, {'id': self.documents[0].id, 'vds_status': 'Active'})
+
+    def test_projects_transmittals_and_revisions(self):
+        transmittal = self.project.create_transmittal()
+        transmittal.issue_documents([self.documents[0].id])
+        projects = self.client.get(reverse('vds:api_project_list')).json()['results']
+        self.assertEqual([p['wa_number'] for p in projects], ['WA-API'])
+        transmittals = self.client.get(
+            reverse('vds:api_transmittal_list', args=(self.project.id,))).json()['results']
+        self.assertEqual([t['number'] for t in transmittals], [transmittal.number])
+        revisions = self.client.get(
+            reverse('vds:api_transmittal_revisions', args=(transmittal.id,))).json()['results']
+        self.assertEqual([(r['document_id'], r['revision_number']) for r in revisions],
+                         [(self.documents[0].id, '0')])
+        revisions = self.client.get(
+            reverse('vds:api_document_revisions', args=(self.documents[0].id,))).json()['results']
+        self.assertEqual(len(revisions), 1)
+
+    def test_not_found_and_method(self):
+        self.assertEqual(self.client.get(reverse('vds:api_project_detail', args=(0,))).status_code,
+                         404)
+        self.assertEqual(self.client.get(reverse('vds:api_document_list', args=(0,))).status_code,
+                         404)
+        response = self.client.get(reverse('vds:api_document_batch', args=(self.project.id,)))
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response['Allow'], 'POST')
+
+
+class ApiBatchTests(ApiTestCase):
+    def _creates(self, prefix, count):
+        return [{'document_number': f'{prefix}-{i}', 'title': f'New {i}', 'stub': 'ST',
+                 'discipline': 'ELEC', 'next_due': '2025-02-01'} for i in range(count)]
+
+    def test_create_and_update(self):
+        response = self.post_json('api_document_batch', (self.project.id,), {
+            'create': self._creates('NEW', 2),
+            'update': [{'id': self.documents[0].id, 'vds_status': 'Hold', 'penalty': True}],
+        })
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual([d['document_number'] for d in body['created']], ['NEW-0', 'NEW-1'])
+        self.assertEqual(body['updated'], [self.documents[0].id])
+        created = Document.objects.get(document_number='NEW-1')
+        self.assertEqual(created.next_due, datetime.date(2025, 2, 1))
+        updated = Document.objects.get(pk=self.documents[0].id)
+        self.assertEqual((updated.vds_status, updated.penalty), ('Hold', True))
+        self.assertEqual(stats.drift(), {})
+
+    def test_batch_query_count_is_constant(self):
+        small, small_queries = self.count_queries('api_document_batch', (self.project.id,), {
+            'create': self._creates('S', 1),
+            'update': [{'id': self.documents[0].id, 'notes': 'n'}],
+        })
+        large, large_queries = self.count_queries('api_document_batch', (self.project.id,), {
+            'create': self._creates('L', 50),
+            'update': [{'id': d.id, 'notes': 'm'} for d in self.documents],
+        })
+        self.assertEqual((small.status_code, large.status_code), (201, 201))
+        # (the statistics writes depend on which counters change, not on
+        # how many documents change them)
+        self.assertEqual(small_queries, large_queries)
+
+    def test_invalid_batch_writes_nothing(self):
+        response = self.post_json('api_document_batch', (self.project.id,), {
+            'create': [
+                {'document_number': self.documents[1].document_number, 'title': 'Dup',
+                 'stub': 'ST', 'discipline': 'MECH'},
+                {'document_number': 'X-1', 'title': 'No stub', 'discipline': 'MECH'},
+                {'document_number': 'X-2', 'title': 'Bad', 'stub': 'ST', 'discipline': 'MECH',
+                 'next_due': 'soon', 'colour': 'red'},
+            ],
+            'update': [{'id': self.documents[0].id, 'vds_status': 'Hold'}, {'id': 0}],
+        })
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']
+        self.assertEqual(len(errors), 5, errors)
+        self.assertEqual(Document.objects.count(), 5)
+        self.assertFalse(Document.objects.filter(vds_status='Hold').exists())
+
+    def test_derived_fields_and_boolean_ids_are_rejected(self):
+        first = self.documents[0]
+        response = self.post_json('api_document_batch', (self.project.id,), {
+            'create': [dict(self._creates('R', 1)[0], revision_number='C')],
+            'update': [{'id': first.id, 'latest_issue': '2025-01-01'}, {'id': True, 'notes': 'n'}],
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'], [
+            "create[0].revision_number: is read-only, set by issuing revisions",
+            "update[0].latest_issue: is read-only, set by issuing revisions",
+            "update[1].id: is required",
+        ])
+        response = self.post_json('api_issue', (self.project.id,), {'documents': [True]})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Revision.objects.exists())
+
+    def test_duplicates_within_batch(self):
+        response = self.post_json('api_document_batch', (self.project.id,), {
+            'create': self._creates('D', 1) + self._creates('D', 1),
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('also used by create[0]', response.json()['errors'][0])
+
+    def test_blank_numbers_are_stored_as_null(self):
+        creates = self._creates('B', 2)
+        creates[0].update(client_number='', supplier_number='')
+        creates[1].update(client_number=' ', supplier_number=None)
+        response = self.post_json('api_document_batch', (self.project.id,), {
+            'create': creates,
+            'update': [{'id': self.documents[0].id, 'client_number': ''}],
+        })
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(Document.objects.filter(client_number='').count(), 0)
+        self.assertEqual(Document.objects.filter(client_number=None).count(), 7)
+
+    def test_requires_json(self):
+        response = self.client.post(reverse('vds:api_document_batch', args=(self.project.id,)),
+                                    {'create': ''})
+        self.assertEqual(response.status_code, 415)
+        response = self.client.post(reverse('vds:api_document_batch', args=(self.project.id,)),
+                                    '{broken', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_issue_into_new_transmittal(self):
+        ids = [d.id for d in self.documents[:3]]
+        response = self.post_json('api_issue', (self.project.id,), {'documents': ids})
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        transmittal = Transmittal.objects.get()
+        self.assertEqual(body['transmittal']['number'], transmittal.number)
+        self.assertEqual(sorted(r['document_id'] for r in body['revisions']), ids)
+        self.assertEqual(Revision.objects.filter(transmittal=transmittal).count(), 3)
+
+        # once the transmittal sequence exists, the count is the same for
+        # one document or all of them
+        _, queries = self.count_queries('api_issue', (self.project.id,),
+                                        {'documents': [self.documents[0].id]})
+        _, more_queries = self.count_queries(
+            'api_issue', (self.project.id,), {'documents': [d.id for d in self.documents]})
+        self.assertEqual(queries, more_queries)
+
+    def test_issue_rejects_foreign_documents(self):
+        other = create_documents(create_project('WA-OTHER'), 1)
+        response = self.post_json('api_issue', (self.project.id,),
+                                  {'documents': [self.documents[0].id, other[0].id]})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Transmittal.objects.exists())
+
+
+class ApiAuthenticationTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.logout()
+
+    def batch(self, client, **headers):
+        return client.post(reverse('vds:api_document_batch', args=(self.project.id,)),
+                           json.dumps({'update': [{'id': self.documents[0].id, 'notes': 'w'}]}),
+                           content_type='application/json', headers=headers)
+
+    def assertNotWritten(self):
+        self.assertEqual(Document.objects.get(pk=self.documents[0].id).notes, '')
+
+    def test_anonymous_writes_are_rejected(self):
+        self.assertEqual(self.batch(self.client).status_code, 401)
+        response = self.post_json('api_issue', (self.project.id,),
+                                  {'documents': [self.documents[0].id]})
+        self.assertEqual(response.status_code, 401)
+        self.assertNotWritten()
+        self.assertFalse(Transmittal.objects.exists())
+        # reading needs no login
+        self.assertEqual(self.client.get(reverse('vds:api_project_list')).status_code, 200)
+
+    def test_only_staff_may_write(self):
+        self.client.force_login(User.objects.create_user('reader', password='pw'))
+        self.assertEqual(self.batch(self.client).status_code, 403)
+        self.assertNotWritten()
+
+    def test_session_writes_need_the_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.staff)
+        response = self.batch(client)
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('CSRF', response.json()['error'])
+        self.assertNotWritten()
+
+        client.get(reverse('vds:document_list', args=(self.project.id,)))
+        token = client.cookies['csrftoken'].value
+        self.assertEqual(self.batch(client, X_CSRFToken=token).status_code, 200)
+
+    @override_settings(VDS_API_TOKENS={'s3cret': 'staff', 'other': 'nobody'})
+    def test_bearer_tokens(self):
+        client = Client(enforce_csrf_checks=True)
+        for token in ('wrong', 'other', ''):
+            self.assertEqual(self.batch(client, Authorization=f'Bearer {token}').status_code, 401)
+        self.assertNotWritten()
+        self.assertEqual(self.batch(client, Authorization='Bearer s3cret').status_code, 200)
+        self.assertEqual(Document.objects.get(pk=self.documents[0].id).notes, 'w')
@@ -0,0 +1,63 @@
+import asyncio
+
+from django.test import TestCase
+from django.urls import reverse
+
+from vds import stats, views
+from vds.models import Document
+
+from .helpers import create_documents, create_project
+
+
+class AsyncReadViewTests(TestCase):
+    """The read-only pages are async views and work through the ASGI handler."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = create_project('WA-ASYNC')
+        cls.docs = create_documents(cls.project, 5)
+        cls.transmittal = cls.project.create_transmittal()
+        cls.transmittal.issue_documents([d.id for d in cls.docs])
+        stats.rebuild()
+
+    def test_read_views_are_coroutines(self):
+        for view in (views.index, views.project_details, views.document_list,
+                     views.transmittal_list, views.transmittal_details):
+            self.assertTrue(asyncio.iscoroutinefunction(view), view.__name__)
+        for view in (views.transmittal_new, views.transmittal_delete, views.document_import):
+            self.assertFalse(asyncio.iscoroutinefunction(view), view.__name__)
+
+    async def test_pages_render_through_async_client(self):
+        pages = {
+            reverse('vds:index'): self.transmittal.number,
+            reverse('vds:project_details', args=(self.project.id,)): 'Documents: 5',
+            reverse('vds:document_list', args=(self.project.id,)): 'WA-ASYNC-000004',
+            reverse('vds:transmittal_list', args=(self.project.id,)): self.transmittal.number,
+            reverse('vds:transmittal_details', args=(self.transmittal.id,)): 'WA-ASYNC-000000',
+        }
+        for url, text in pages.items():
+            response = await self.async_client.get(url)
+            self.assertContains(response, text, msg_prefix=url)
+
+    async def test_missing_objects_are_404(self):
+        for name in ('project_details', 'document_list', 'transmittal_list',
+                     'transmittal_details'):
+            response = await self.async_client.get(reverse(f'vds:{name}', args=(999999,)))
+            self.assertEqual(response.status_code, 404, name)
+
+    async def test_document_list_pages_with_cursor(self):
+        url = reverse('vds:document_list', args=(self.project.id,))
+        first = await self.async_client.get(url, {'page_size': 2})
+        self.assertEqual([d['document_number'] for d in first.context['documents']],
+                         ['WA-ASYNC-000000', 'WA-ASYNC-000001'])
+        second = await self.async_client.get(url, {'page_size': 2,
+                                                   'after': first.context['page'].next_cursor})
+        self.assertEqual([d['document_number'] for d in second.context['documents']],
+                         ['WA-ASYNC-000002', 'WA-ASYNC-000003'])
+
+    async def test_document_list_actions_stay_synchronous(self):
+        url = reverse('vds:document_list', args=(self.project.id,))
+        response = await self.async_client.post(url, {'action': 'delete',
+                                                      'selected': [self.docs[0].id]})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(await Document.objects.filter(pk=self.docs[0].id).aexists())
@@ -0,0 +1,71 @@
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+import io
+
+from vds import bench, stats
+from vds.models import Document, Project, Revision, Transmittal
+from vds.tests.helpers import create_project
+
+
+class BenchTests(TestCase):
+    def test_build_dataset(self):
+        projects = bench.build_dataset(2, 15, 3, prefix='BT')
+        self.assertEqual(len(projects), 2)
+        self.assertEqual(Document.objects.count(), 30)
+        self.assertEqual(Revision.objects.count(), 90)
+        self.assertEqual(set(Document.objects.values_list('revision_number', flat=True)), {'2'})
+
+    def test_run_scenarios_reports_every_scenario(self):
+        project, = bench.build_dataset(1, 20, 2, prefix='BT')
+        results = bench.run_scenarios(project, repeat=2, issue_size=5)
+        self.assertEqual(set(results), {'create_transmittal', 'revision_new', 'issue',
+                                        'document_list', 'document_list_instrumented', 'index',
+                                        'portfolio', 'search', 'transmittal_details'})
+        for figures in results.values():
+            self.assertEqual(set(figures), {'time_ms', 'min_ms', 'queries', 'peak_kb'})
+        self.assertLessEqual(results['index']['queries'], 2)
+        self.assertEqual(results['portfolio']['queries'], 3)
+        # the instrumented page is the same page, measured
+        self.assertEqual(results['document_list_instrumented']['queries'],
+                         results['document_list']['queries'])
+        self.assertIsInstance(bench.instrumentation_overhead(results), float)
+
+    def test_in_place_run_removes_its_data(self):
+        project = create_project('WA-KEEP')
+        call_command('vds_bench', '--in-place', '--projects', '1', '--documents', '5',
+                     '--revisions', '2', '--repeat', '1', '--scenario', 'index',
+                     stdout=io.StringIO())
+        self.assertEqual(list(Project.objects.all()), [project])
+        self.assertFalse(Document.objects.exists() or Transmittal.objects.exists()
+                         or Revision.objects.exists())
+        self.assertEqual(stats.drift(), {})
+
+    def test_compare_flags_slower_and_chattier_scenarios(self):
+        baseline = {
+            'a': {'time_ms': 10.0, 'queries': 3},
+            'b': {'time_ms': 10.0, 'queries': 3},
+            'c': {'time_ms': 10.0, 'queries': 3},
+        }
+        current = {
+            'a': {'time_ms': 11.0, 'queries': 3},
+            'b': {'time_ms': 13.0, 'queries': 3},
+            'c': {'time_ms': 9.0, 'queries': 4},
+            'new': {'time_ms': 99.0, 'queries': 99},
+        }
+        self.assertEqual(bench.compare(current, baseline, threshold=0.2),
+                         ['b: time 10.0 ms -> 13.0 ms (+30%)', 'c: queries 3 -> 4'])
+
+
+class ThroughputTests(TransactionTestCase):
+    # the WSGI run uses worker threads with their own connections, so the
+    # data must be committed
+    def test_run_throughput_compares_both_handlers(self):
+        project, = bench.build_dataset(1, 10, 1, prefix='TP')
+        results = bench.run_throughput(project, concurrency=2, requests=4)
+        self.assertEqual(set(results), {'index', 'project_details', 'document_list',
+                                        'transmittal_list', 'transmittal_details'})
+        for figures in results.values():
+            self.assertEqual(set(figures), {'wsgi', 'asgi'})
+            for handler in figures.values():
+                self.assertEqual(handler['requests'], 4)
+                self.assertGreater(handler['rps'], 0)
@@ -0,0 +1,110 @@
+import io
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from vds.comments import apply_comment_sheet
+from vds.models import Revision
+
+from .helpers import create_documents, create_project
+
+HEADER = 'Document number,Revision,Review code,Reviewer,Comments\n'
+
+
+class CommentSheetTests(TestCase):
+    def setUp(self):
+        self.project = create_project('WA-CS')
+        self.docs = create_documents(self.project, 5)
+        self.transmittal = self.project.create_transmittal()
+        self.transmittal.issue_documents([d.id for d in self.docs])
+        self.other = self.project.create_transmittal()
+        self.other.issue_documents([self.docs[0].id])
+
+    def _revision(self, document, transmittal=None):
+        return Revision.objects.get(document=document, transmittal=transmittal or self.transmittal)
+
+    def test_matching_rows_are_updated(self):
+        data = HEADER + ('WA-CS-000000,0,A,J. Client,Fine\n'
+                         'WA-CS-000001,0,B,,Revise drawing 3\n'
+                         'WA-CS-000002,0,,,\n')
+        result = apply_comment_sheet(self.transmittal, io.StringIO(data))
+        self.assertEqual((result.rows, result.matched, result.updated), (3, 3, 2))
+        self.assertEqual((result.unmatched, result.errors), ([], []))
+        first = self._revision(self.docs[0])
+        self.assertEqual((first.review_code, first.client_reviewer, first.notes),
+                         ('A', 'J. Client', 'Fine'))
+        # blank cells leave the stored values alone
+        second = self._revision(self.docs[1])
+        self.assertEqual((second.review_code, second.client_reviewer, second.notes),
+                         ('B', '', 'Revise drawing 3'))
+        # the revision in the other transmittal is untouched
+        self.assertEqual(self._revision(self.docs[0], self.other).review_code, '')
+
+    def test_unmatched_and_invalid_rows_are_reported(self):
+        data = HEADER + ('WA-CS-000000,9,A,,\n'
+                         'UNKNOWN,0,A,,\n'
+                         'WA-CS-000001,0,TOO-LONG-CODE,,\n'
+                         ',0,A,,\n'
+                         'WA-CS-000002,0,A,,\n'
+                         'WA-CS-000002,0,C,,\n')
+        result = apply_comment_sheet(self.transmittal, io.StringIO(data))
+        self.assertEqual([issue.line for issue in result.unmatched], [2, 3])
+        self.assertEqual([(issue.line, issue.column) for issue in result.errors],
+                         [(4, 'review_code'), (5, 'document_number'), (7, 'document_number')])
+        self.assertEqual(result.updated, 1)
+        self.assertEqual(self._revision(self.docs[2]).review_code, 'A')
+
+    def test_missing_columns(self):
+        result = apply_comment_sheet(self.transmittal, io.StringIO('Document number,Revision\n'))
+        self.assertEqual(result.errors[0].column, 'review_code or client_reviewer or notes')
+
+    def test_dry_run_writes_nothing(self):
+        result = apply_comment_sheet(self.transmittal, io.StringIO(HEADER + 'WA-CS-000000,0,A,,\n'),
+                                     dry_run=True)
+        self.assertEqual(result.updated, 1)
+        self.assertEqual(self._revision(self.docs[0]).review_code, '')
+
+    def test_query_count_does_not_grow_with_the_sheet(self):
+        def run(count, code):
+            data = HEADER + ''.join(f'WA-CS-{i:06d},0,{code},,\n' for i in range(count))
+            with CaptureQueriesContext(connection) as queries:
+                apply_comment_sheet(self.transmittal, io.StringIO(data))
+            return len(queries.captured_queries)
+        self.assertEqual(run(1, 'A'), run(5, 'B'))
+
+    def test_upload_view(self):
+        url = reverse('vds:transmittal_comments', args=(self.transmittal.id,))
+        self.assertContains(self.client.get(reverse('vds:transmittal_details',
+                                                    args=(self.transmittal.id,))), url)
+        sheet = SimpleUploadedFile('sheet.csv', (HEADER + 'WA-CS-000003,0,C,,\nNOPE,0,A,,\n')
+                                   .encode(), content_type='text/csv')
+        response = self.client.post(url, {'sheet': sheet})
+        self.assertContains(response, '1 of 2 rows matched a revision')
+        self.assertContains(response, 'NOPE')
+        self.assertEqual(self._revision(self.docs[3]).review_code, 'C')
+
+    def test_review_is_shown(self):
+        apply_comment_sheet(self.transmittal,
+                            io.StringIO(HEADER + 'WA-CS-000001,0,B,J. Client,\n'))
+        details = self.client.get(reverse('vds:transmittal_details', args=(self.transmittal.id,)))
+        self.assertContains(details, '<td>B</td>')
+        self.assertContains(details, '<td>J. Client</td>')
+        # a finalised transmittal shows the content as sent; its comments
+        # page still lists the review
+        self.client.post(reverse('vds:transmittal_finalise', args=(self.transmittal.id,)))
+        url = reverse('vds:transmittal_comments', args=(self.transmittal.id,))
+        reviews = list(self.client.get(url).context['reviews'])
+        self.assertEqual(reviews[1], {'document__document_number': 'WA-CS-000001',
+                                      'revision_number': '0', 'review_code': 'B',
+                                      'client_reviewer': 'J. Client', 'notes': ''})
+
+    def test_non_utf8_sheet_is_reported(self):
+        url = reverse('vds:transmittal_comments', args=(self.transmittal.id,))
+        sheet = SimpleUploadedFile('sheet.csv', (HEADER + 'WA-CS-000000,0,A,,Réservé\n')
+                                   .encode('latin-1'), content_type='text/csv')
+        response = self.client.post(url, {'sheet': sheet})
+        self.assertContains(response, 'is not UTF-8')
+        self.assertEqual(self._revision(self.docs[0]).review_code, '')
@@ -0,0 +1,159 @@
+import datetime
+import io
+import re
+
+from django.conf import settings
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from vds.importer import import_register
+from vds.models import Document, ProjectVersion, Revision
+
+from .helpers import create_documents, create_project
+
+
+def csrf_token(response) -> str:
+    return re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', response.content.decode())[1]
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = create_project('WA-CG')
+        cls.other = create_project('WA-CO')
+        cls.docs = create_documents(cls.project, 5)
+        cls.transmittal = cls.project.create_transmittal()
+        cls.transmittal.issue_documents([d.id for d in cls.docs[:3]])
+
+    def version(self, project=None):
+        return ProjectVersion.objects.get(project=project or self.project).version
+
+    def assertBumps(self, write, *, project=None, times=1):
+        """Run `write` and check it bumped the project's version only."""
+        before, other_before = self.version(project), self.version(self.other)
+        write()
+        self.assertEqual(self.version(project), before + times)
+        if project is None:
+            self.assertEqual(self.version(self.other), other_before)
+
+    def urls(self):
+        return [
+            reverse('vds:document_list', args=(self.project.id,)),
+            reverse('vds:transmittal_list', args=(self.project.id,)),
+            reverse('vds:transmittal_details', args=(self.transmittal.id,)),
+        ]
+
+    def test_unchanged_pages_are_not_modified(self):
+        for url in self.urls():
+            # the first page hands out the CSRF cookie, which document_list's
+            # ETag follows
+            self.client.get(url)
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            etag = response.headers['ETag']
+            self.assertFalse(etag.startswith('W/'))
+            self.assertIn('Last-Modified', response.headers)
+            self.assertIn('no-cache', response.headers['Cache-Control'])
+            self.assertIn('private', response.headers['Cache-Control'])
+
+            # one query on the version table, none on the register
+            with self.assertNumQueries(1):
+                cached = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(cached.status_code, 304, url)
+            self.assertEqual(cached.headers['ETag'], etag)
+
+            cached = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response.headers['Last-Modified'])
+            self.assertEqual(cached.status_code, 304, url)
+
+    def test_writes_invalidate_the_etag(self):
+        self.client.get(self.urls()[0])
+        etags = [self.client.get(url).headers['ETag'] for url in self.urls()]
+        Document.objects.filter(pk=self.docs[4].pk).get().save()
+        for url, etag in zip(self.urls(), etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_document_list_etag_follows_csrf_cookie(self):
+        url = reverse('vds:document_list', args=(self.project.id,))
+        etag = self.client.get(url).headers['ETag']
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'x' * 32
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_transmittal_details_etag_follows_csrf_cookie(self):
+        client = Client(enforce_csrf_checks=True)
+        url = reverse('vds:transmittal_details', args=(self.transmittal.id,))
+        etag = client.get(url).headers['ETag']
+        client.cookies[settings.CSRF_COOKIE_NAME] = 'x' * 32
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        # the token on the fresh page matches the new cookie
+        token = csrf_token(response)
+        response = client.post(reverse('vds:transmittal_finalise', args=(self.transmittal.id,)),
+                               {'csrfmiddlewaretoken': token})
+        self.assertEqual(response.status_code, 302)
+
+    def test_unknown_objects_still_404(self):
+        self.assertEqual(self.client.get(
+            reverse('vds:transmittal_details', args=(999999,))).status_code, 404)
+
+    def test_new_projects_get_a_version(self):
+        project = create_project('WA-NEW')
+        self.assertEqual(self.version(project), 0)
+        self.assertBumps(project.save, project=project)
+
+    # every write path bumps the version
+
+    def test_document_writes(self):
+        doc = Document(project=self.project, title='N', stub='ST', discipline='MECH',
+                       document_number='CG-NEW')
+        self.assertBumps(doc.save)
+        doc.title = 'Renamed'
+        self.assertBumps(lambda: doc.save(update_fields=['title']))
+        self.assertBumps(doc.delete)
+
+    def test_document_moved_bumps_both_projects(self):
+        doc = self.docs[4]
+        doc.project = self.other
+        other_before = self.version(self.other)
+        self.assertBumps(lambda: doc.save(update_fields=['project']), project=self.project)
+        self.assertEqual(self.version(self.other), other_before + 1)
+
+    def test_transmittal_writes(self):
+        transmittal = self.project.transmittals.create(number='CG-T', source='X',
+                                                       date_sent=datetime.date(2025, 1, 1))
+        transmittal.notes = 'edited'
+        self.assertBumps(transmittal.save)
+        self.assertBumps(transmittal.delete)
+        self.assertBumps(self.project.create_transmittal)
+
+    def test_revision_writes(self):
+        self.assertBumps(lambda: Revision.revision_new(self.transmittal.id, self.docs[4].id),
+                         times=2)  # the revision, then its document
+        revision = Revision.objects.get(document=self.docs[0])
+        revision.notes = 'edited'
+        self.assertBumps(revision.save)
+        self.assertBumps(revision.delete)
+
+    def test_bulk_writes(self):
+        transmittal = self.project.transmittals.create(number='CG-B', source='X',
+                                                       date_sent=datetime.date(2025, 1, 1))
+        self.assertBumps(lambda: transmittal.issue_documents([self.docs[3].id]))
+        csv = "document_number,title,stub,discipline\nCG-I1,T,ST,MECH\nCG-I2,T,ST,MECH\n"
+        self.assertBumps(lambda: import_register(self.project, io.StringIO(csv)))
+        dry = csv.replace('CG-I', 'CG-D')
+        self.assertBumps(lambda: import_register(self.project, io.StringIO(dry), dry_run=True),
+                         times=0)
+
+    def test_view_actions_bump_once(self):
+        url = reverse('vds:document_list', args=(self.project.id,))
+        self.assertBumps(lambda: self.client.post(
+            url, {'action': 'issue', 'selected': [self.docs[3].id, self.docs[4].id]}))
+        self.assertBumps(lambda: self.client.post(
+            url, {'action': 'delete', 'selected': [self.docs[0].id, self.docs[1].id]}))
+        self.assertBumps(lambda: self.client.get(
+            reverse('vds:transmittal_new', args=(self.project.id,))))
+        self.assertBumps(lambda: self.client.post(
+            reverse('vds:transmittal_delete', args=(self.transmittal.id,))))
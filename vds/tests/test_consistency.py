@@ -0,0 +1,94 @@
+import datetime
+import io
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from vds import consistency, snapshots, stats
+from vds.models import Document, Revision, Transmittal
+
+from .helpers import create_documents, create_project
+
+
+class ConsistencyTests(TestCase):
+    def setUp(self):
+        self.project = create_project('WA-CK')
+        self.docs = create_documents(self.project, 4)
+        self.ids = [d.id for d in self.docs]
+        self.project.create_transmittal().issue_documents(self.ids)
+        self.second = self.project.create_transmittal()
+        self.second.issue_documents(self.ids[:2])
+        stats.rebuild()
+
+    def test_consistent_register(self):
+        with CaptureQueriesContext(connection) as queries:
+            result = consistency.check()
+        self.assertEqual(result.problems, 0)
+        # a fixed number of queries, however large the register
+        self.assertEqual(len(queries.captured_queries), 5)
+        out = io.StringIO()
+        call_command('vds_check', stdout=out)
+        self.assertIn('The register is consistent.', out.getvalue())
+
+    def test_stale_documents(self):
+        # the kind of drift admin edits leave behind
+        Document.objects.filter(pk=self.ids[0]).update(revision_number='7')
+        Document.objects.filter(pk=self.ids[1]).update(latest_issue=None)
+        Document.objects.filter(pk=self.ids[2]).update(latest_revision=None)
+        newest = Revision.objects.get(document_id=self.ids[1], transmittal=self.second)
+
+        stale = consistency.stale_documents()
+        self.assertEqual([d.id for d in stale], self.ids[:3])
+        self.assertEqual(stale[1].expected, ('1', datetime.date.today(), newest.pk))
+
+        self.assertEqual(consistency.fix_documents(stale, batch_size=2), 3)
+        self.assertEqual(consistency.stale_documents(), [])
+        self.assertEqual(Document.objects.get(pk=self.ids[0]).revision_number, '1')
+        self.assertEqual(stats.drift(), {})
+
+    def test_documents_without_revisions_keep_their_label(self):
+        imported, = create_documents(self.project, 1, start=10, revision_number='C')
+        self.assertEqual(consistency.stale_documents(), [])
+        # but a pointer at another document's revision is stale
+        Document.objects.filter(pk=imported.pk).update(
+            latest_revision=Revision.objects.filter(document_id=self.ids[0]).first())
+        stale, = consistency.stale_documents()
+        self.assertEqual((stale.id, stale.expected[0], stale.expected[2]), (imported.id, 'C', None))
+
+    def test_orphan_transmittals(self):
+        old = self.project.transmittals.create(number='OLD', source='HOUSE',
+                                               date_sent=datetime.date(2024, 1, 1))
+        finalised = self.project.transmittals.create(number='FIN', source='HOUSE',
+                                                     date_sent=datetime.date(2024, 1, 1))
+        snapshots.finalise(finalised)
+        today = self.project.create_transmittal()
+        orphans = consistency.orphan_transmittals()
+        self.assertEqual([o[0] for o in orphans], [old.id, finalised.id, today.id])
+        self.assertEqual(consistency.fix_orphans(orphans), 1)
+        self.assertFalse(Transmittal.objects.filter(pk=old.id).exists())
+
+    def test_label_problems(self):
+        # skipped from '1' straight to '3' for the first document
+        Revision.objects.filter(document_id=self.ids[0], transmittal=self.second).update(
+            revision_number='3')
+        problem, = consistency.label_problems()
+        self.assertEqual((problem.document_id, problem.label, problem.problem),
+                         (self.ids[0], '3', 'follows 0, expected 1'))
+
+    def test_command_reports_and_fixes(self):
+        Document.objects.filter(pk=self.ids[0]).update(revision_number='7')
+        self.project.transmittals.create(number='OLD', source='HOUSE',
+                                         date_sent=datetime.date(2024, 1, 1))
+        out = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command('vds_check', stdout=out)
+        self.assertIn('Documents out of step with their newest revision: 1', out.getvalue())
+        self.assertIn('Transmittals without revisions: 1', out.getvalue())
+
+        out = io.StringIO()
+        call_command('vds_check', '--fix', '--batch-size', '1', stdout=out)
+        self.assertIn('Repaired 1 documents and deleted 1 orphaned transmittals.', out.getvalue())
+        call_command('vds_check', stdout=io.StringIO())
@@ -0,0 +1,118 @@
+import datetime
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from vds import deletion, jobs, stats
+from vds.models import Document, DueNotice, Revision, Transmittal
+
+from .helpers import create_documents, create_project
+
+
+class DeletionServiceTests(TestCase):
+    def setUp(self):
+        self.project = create_project('WA-DEL')
+        self.docs = create_documents(self.project, 6, next_due=datetime.date(2025, 3, 1),
+                                     penalty=True)
+        stats.rebuild()
+
+    def _issue(self, documents, date):
+        transmittal = self.project.create_transmittal()
+        transmittal.issue_documents([d.id for d in documents])
+        transmittal.revisions.update(date=date)
+        Document.objects.filter(pk__in=[d.id for d in documents]).update(latest_issue=date)
+        stats.rebuild()
+        return transmittal
+
+    def test_delete_documents(self):
+        self._issue(self.docs, datetime.date(2025, 1, 1))
+        DueNotice.objects.create(document=self.docs[0], field='next_due',
+                                 due_date=datetime.date(2025, 3, 1), overdue=False)
+        result = deletion.delete_documents(self.project, [d.id for d in self.docs[:4]])
+        self.assertEqual((result.documents, result.revisions, result.due_notices), (4, 4, 1))
+        self.assertEqual(Document.objects.count(), 2)
+        self.assertEqual(Revision.objects.count(), 2)
+        self.assertEqual(stats.drift(), {})
+
+    def test_delete_documents_query_count_is_constant(self):
+        self._issue(self.docs, datetime.date(2025, 1, 1))
+        with CaptureQueriesContext(connection) as small:
+            deletion.delete_documents(self.project, [self.docs[0].id])
+        with CaptureQueriesContext(connection) as large:
+            deletion.delete_documents(self.project, [d.id for d in self.docs[1:]])
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_delete_transmittal_restores_latest_revision(self):
+        first = self._issue(self.docs[:3], datetime.date(2025, 1, 1))
+        second = self._issue(self.docs[:2], datetime.date(2025, 2, 1))
+        # a label set by hand is not taken from the deleted revision
+        Document.objects.filter(pk=self.docs[1].id).update(revision_number='X')
+        stats.rebuild()
+
+        result = deletion.delete_transmittal(second)
+        self.assertEqual((result.revisions, result.transmittals, result.documents_updated),
+                         (2, 1, 1))
+        self.assertFalse(Transmittal.objects.filter(pk=second.id).exists())
+        labels = dict(Document.objects.filter(pk__in=[d.id for d in self.docs[:2]])
+                      .values_list('id', 'revision_number'))
+        self.assertEqual(labels, {self.docs[0].id: '0', self.docs[1].id: 'X'})
+        self.assertEqual(Document.objects.get(pk=self.docs[0].id).latest_issue,
+                         datetime.date(2025, 1, 1))
+
+        deletion.delete_transmittal(first)
+        doc = Document.objects.get(pk=self.docs[2].id)
+        self.assertEqual((doc.revision_number, doc.latest_issue), (None, None))
+        # never issued again, so its penalty flag is outstanding again
+        self.assertEqual(stats.drift(), {})
+
+    def test_batches_report_progress(self):
+        steps = list(deletion.iter_delete_documents(self.project, [d.id for d in self.docs],
+                                                    size=4))
+        self.assertEqual([(done, total) for done, total, _ in steps], [(4, 6), (6, 6)])
+        self.assertEqual(steps[-1][2].documents, 6)
+        self.assertEqual(stats.drift(), {})
+
+        transmittal = self.project.create_transmittal()
+        steps = list(deletion.iter_delete_transmittal(transmittal, size=4))
+        self.assertEqual(steps[-1][2].transmittals, 1)
+
+    def test_views_use_the_service(self):
+        transmittal = self._issue(self.docs, datetime.date(2025, 1, 1))
+        response = self.client.post(reverse('vds:transmittal_delete', args=(transmittal.id,)))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Document.objects.filter(revision_number__isnull=True).count(), 6)
+        self.client.post(reverse('vds:document_list', args=(self.project.id,)),
+                         {'action': 'delete', 'selected': [self.docs[0].id]})
+        self.assertEqual(Document.objects.count(), 5)
+        self.assertEqual(stats.drift(), {})
+
+
+@override_settings(VDS_DELETE_BACKGROUND_THRESHOLD=3, VDS_DELETE_BATCH=2)
+class BackgroundDeletionTests(TestCase):
+    def test_large_selection_is_deleted_by_a_job(self):
+        project = create_project('WA-BG')
+        docs = create_documents(project, 5)
+        response = self.client.post(reverse('vds:document_list', args=(project.id,)),
+                                    {'action': 'delete', 'selected': [d.id for d in docs]})
+        self.assertEqual(response.status_code, 202)
+        job = response.context['job']
+        self.assertEqual(Document.objects.count(), 5)
+        self.assertEqual(jobs.work(once=True), 1)
+
+        progress = self.client.get(reverse('vds:job_status', args=(job.id,))).json()
+        self.assertEqual((progress['state'], progress['done'], progress['total']), ('done', 5, 5))
+        self.assertEqual(progress['result']['documents'], 5)
+        self.assertFalse(Document.objects.exists())
+
+    def test_large_transmittal_is_deleted_by_a_job(self):
+        project = create_project('WA-BGT')
+        docs = create_documents(project, 5)
+        transmittal = project.create_transmittal()
+        transmittal.issue_documents([d.id for d in docs])
+        response = self.client.post(reverse('vds:transmittal_delete', args=(transmittal.id,)))
+        self.assertEqual(response.status_code, 202)
+        jobs.work(once=True)
+        self.assertFalse(Transmittal.objects.exists())
+        self.assertFalse(Revision.objects.exists())
@@ -0,0 +1,86 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from vds.models import Project, Document
+from vds.pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_paginate
+
+
+class DocumentListPaginationTests(TestCase):
+    def setUp(self):
+        self.project = Project.objects.create(
+            wa_number='WA-L', client_number='C-L', drm_ref_number='DRML',
+            title='P L', stub='PL', client_title='PLT', country='Nowhere'
+        )
+        Document.objects.bulk_create([
+            Document(project=self.project, title=f'Doc {i}', stub='ST',
+                     discipline='MECH', document_number=f'DOC-{i:03d}')
+            for i in range(25)
+        ])
+        self.url = reverse('vds:document_list', args=(self.project.id,))
+
+    def _numbers(self, response):
+        return [d['document_number'] for d in response.context['documents']]
+
+    def test_pages_follow_document_number_order(self):
+        r1 = self.client.get(self.url, {'page_size': 10})
+        self.assertEqual(self._numbers(r1), [f'DOC-{i:03d}' for i in range(10)])
+        page = r1.context['page']
+        self.assertFalse(page.has_previous)
+
+        r2 = self.client.get(self.url, {'page_size': 10, 'after': page.next_cursor})
+        self.assertEqual(self._numbers(r2), [f'DOC-{i:03d}' for i in range(10, 20)])
+
+        r3 = self.client.get(self.url, {'page_size': 10, 'after': r2.context['page'].next_cursor})
+        self.assertEqual(self._numbers(r3), [f'DOC-{i:03d}' for i in range(20, 25)])
+        self.assertFalse(r3.context['page'].has_next)
+
+        back = self.client.get(self.url, {'page_size': 10,
+                                          'before': r3.context['page'].previous_cursor})
+        self.assertEqual(self._numbers(back), self._numbers(r2))
+
+    def test_only_displayed_columns_are_loaded(self):
+        response = self.client.get(self.url)
+        row = response.context['documents'][0]
+        self.assertEqual(set(row), {'id', 'revision_number', 'latest_issue', 'stub',
+                                    'document_number'})
+
+    @override_settings(VDS_PAGE_SIZE=5, VDS_MAX_PAGE_SIZE=8)
+    def test_page_size_default_and_maximum(self):
+        self.assertEqual(len(self.client.get(self.url).context['documents']), 5)
+        self.assertEqual(len(self.client.get(self.url, {'page_size': 50}).context['documents']), 8)
+
+    def test_invalid_cursor_shows_first_page(self):
+        response = self.client.get(self.url, {'after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._numbers(response)[0], 'DOC-000')
+
+    def test_query_count_independent_of_page(self):
+        first = self.client.get(self.url, {'page_size': 5})
+        # version + project + page + total count
+        with self.assertNumQueries(4):
+            self.client.get(self.url, {'page_size': 5, 'after': first.context['page'].next_cursor})
+
+    def test_select_all_matching_applies_to_every_document(self):
+        self.client.post(self.url, {'action': 'delete', 'select_all_matching': '1'})
+        self.assertFalse(self.project.documents.exists())
+
+    def test_selection_from_several_pages(self):
+        ids = list(self.project.documents.order_by('document_number')
+                   .values_list('id', flat=True))
+        chosen = [ids[0], ids[24]]
+        self.client.post(self.url, {'action': 'delete', 'selected': [str(i) for i in chosen]})
+        self.assertEqual(self.project.documents.count(), 23)
+
+
+class KeysetCursorTests(TestCase):
+    def test_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor(['DOC-1', 7]), 2), ['DOC-1', 7])
+
+    def test_wrong_arity_rejected(self):
+        with self.assertRaises(InvalidCursor):
+            decode_cursor(encode_cursor(['DOC-1']), 2)
+
+    def test_empty_queryset(self):
+        page = keyset_paginate(Document.objects.none(), ('document_number', 'id'), 10)
+        self.assertEqual(page.items, [])
+        self.assertFalse(page.has_next)
@@ -0,0 +1,88 @@
+import datetime
+import io
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase
+
+from vds.digest import send_due_digest
+from vds.models import DigestSubscription, Document, DueNotice
+
+from .helpers import create_project
+
+TODAY = datetime.date(2025, 6, 10)
+
+
+class DueDigestTests(TestCase):
+    def setUp(self):
+        self.project = create_project('WA-D')
+        self.other = create_project('WA-E')
+        self.overdue = self._document('D-1', 'MECH', next_due=datetime.date(2025, 6, 1))
+        self.soon = self._document('D-2', 'ELEC', required_by=datetime.date(2025, 6, 20))
+        self._document('D-3', 'MECH', next_due=datetime.date(2025, 9, 1))
+        # issued after its due date: nothing to report
+        self._document('D-4', 'MECH', next_due=datetime.date(2025, 6, 1),
+                       latest_issue=datetime.date(2025, 6, 2))
+        self._document('E-1', 'MECH', project=self.other, next_due=datetime.date(2025, 6, 5))
+        DigestSubscription.objects.create(email='all@example.com')
+        DigestSubscription.objects.create(email='mech@example.com', project=self.project,
+                                          discipline='MECH')
+
+    def _document(self, number, discipline, project=None, **fields):
+        return Document.objects.create(project=project or self.project, title=f'Title {number}',
+                                       stub='ST', discipline=discipline,
+                                       document_number=number, **fields)
+
+    def test_one_digest_per_recipient(self):
+        result = send_due_digest(TODAY, days=14)
+        self.assertEqual(result.entries, 3)
+        self.assertEqual(len(mail.outbox), 2)
+        by_recipient = {message.to[0]: message for message in mail.outbox}
+
+        everything = by_recipient['all@example.com']
+        self.assertIn('2 overdue, 1 due within 14 days', everything.subject)
+        for number in ('D-1', 'D-2', 'E-1'):
+            self.assertIn(number, everything.body)
+        self.assertNotIn('D-3', everything.body)
+        self.assertNotIn('D-4', everything.body)
+        self.assertIn('WA-D - P T / ELEC', everything.body)
+
+        mech = by_recipient['mech@example.com']
+        self.assertIn('D-1', mech.body)
+        self.assertNotIn('D-2', mech.body)
+        self.assertNotIn('E-1', mech.body)
+
+    def test_rerun_sends_nothing_until_state_changes(self):
+        send_due_digest(TODAY, days=14)
+        self.assertEqual(DueNotice.objects.count(), 3)
+        mail.outbox.clear()
+
+        # one query for the subscriptions, one that finds nothing
+        with self.assertNumQueries(2):
+            result = send_due_digest(TODAY, days=14)
+        self.assertEqual((result.entries, len(mail.outbox)), (0, 0))
+
+        # the due-soon document becomes overdue, another gets a new date
+        Document.objects.filter(pk=self.overdue.pk).update(next_due=datetime.date(2025, 6, 25))
+        send_due_digest(datetime.date(2025, 6, 21), days=7)
+        body, = [m.body for m in mail.outbox if m.to == ['all@example.com']]
+        self.assertIn('OVERDUE 2025-06-20 (required_by)  D-2', body)
+        self.assertIn('due     2025-06-25 (next_due)  D-1', body)
+
+    def test_dry_run_records_nothing(self):
+        out = io.StringIO()
+        call_command('vds_due_digest', '--date', TODAY.isoformat(), '--dry-run', stdout=out)
+        self.assertIn('To: all@example.com', out.getvalue())
+        self.assertIn('2 digests would be sent, covering 3 due dates', out.getvalue())
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertFalse(DueNotice.objects.exists())
+
+        call_command('vds_due_digest', '--date', TODAY.isoformat(), stdout=out)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_uncovered_entries_are_not_recorded(self):
+        DigestSubscription.objects.filter(email='all@example.com').delete()
+        send_due_digest(TODAY, days=14)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(set(DueNotice.objects.values_list('document__document_number', flat=True)),
+                         {'D-1'})
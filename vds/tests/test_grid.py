@@ -0,0 +1,118 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from vds import snapshots
+from vds.grid import apply_grid_edits
+from vds.models import Revision
+
+from .helpers import create_documents, create_project
+
+
+class RevisionGridTests(TestCase):
+    def setUp(self):
+        self.project = create_project('WA-GR')
+        self.docs = create_documents(self.project, 6)
+        self.transmittal = self.project.create_transmittal()
+        self.transmittal.issue_documents([d.id for d in self.docs])
+        self.revisions = list(self.transmittal.revisions.order_by('document'))
+        self.url = reverse('vds:transmittal_grid', args=(self.transmittal.id,))
+
+    def test_details_page_renders_the_grid(self):
+        response = self.client.get(reverse('vds:transmittal_details', args=(self.transmittal.id,)))
+        revision = self.revisions[0]
+        self.assertContains(response, f'id="revision-{revision.id}"')
+        self.assertContains(response, f'name="cell-{revision.id}-purpose"')
+        self.assertContains(response, self.url)
+
+    def test_changed_cells_are_saved(self):
+        first, second, third = self.revisions[:3]
+        response = self.client.post(self.url, {
+            f'cell-{first.id}-purpose': 'IFC',
+            f'cell-{first.id}-approved_by': 'XY',
+            f'cell-{second.id}-notes': 'Hold',
+            f'cell-{third.id}-notes': 'Hold',
+            # unchanged, and blank nullable cells store NULL
+            f'cell-{third.id}-purpose': third.purpose,
+            f'cell-{second.id}-prepared_by': '',
+        })
+        self.assertRedirects(response, reverse('vds:transmittal_details',
+                                               args=(self.transmittal.id,)))
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.purpose, first.approved_by), ('IFC', 'XY'))
+        self.assertEqual((second.notes, second.prepared_by), ('Hold', None))
+        self.assertEqual(Revision.objects.filter(notes='Hold').count(), 2)
+
+    def test_one_bulk_update_per_column_set(self):
+        ids = [r.id for r in self.revisions]
+        result = apply_grid_edits(self.transmittal, {
+            ids[0]: {'notes': 'A'}, ids[1]: {'notes': 'B'},
+            ids[2]: {'notes': 'C', 'purpose': 'IFC'}, ids[3]: {'purpose': 'IFC', 'notes': 'D'},
+        })
+        self.assertEqual(result.updated, 4)
+        self.assertEqual(sorted(result.groups), [(('notes',), 2), (('notes', 'purpose'), 2)])
+
+    def test_query_count_does_not_grow_with_the_rows(self):
+        def run(revisions, value):
+            with CaptureQueriesContext(connection) as queries:
+                apply_grid_edits(self.transmittal, {r.id: {'notes': value} for r in revisions})
+            return len(queries.captured_queries)
+        self.assertEqual(run(self.revisions[:1], 'one'), run(self.revisions, 'all'))
+
+    def test_invalid_cells_save_nothing(self):
+        first, second = self.revisions[:2]
+        other = self.project.create_transmittal()
+        other.issue_documents([self.docs[0].id])
+        stranger = other.revisions.get()
+        response = self.client.post(self.url, {
+            f'cell-{first.id}-notes': 'Saved only if all are valid',
+            f'cell-{first.id}-prepared_by': 'MUCH-TOO-LONG',
+            f'cell-{second.id}-purpose': ' ',
+            f'cell-{stranger.id}-notes': 'Not here',
+        })
+        self.assertEqual(response.status_code, 200)
+        errors = response.context['grid_errors']
+        self.assertEqual([(issue.revision_id, issue.column) for issue in errors],
+                         [(first.id, 'prepared_by'), (second.id, 'purpose'), (stranger.id, '')])
+        # the posted values are shown again
+        self.assertContains(response, 'value="MUCH-TOO-LONG"')
+        self.assertFalse(Revision.objects.filter(notes__in=['Saved only if all are valid',
+                                                            'Not here']).exists())
+
+    def test_grid_posts_after_the_csrf_cookie_changed(self):
+        client = Client(enforce_csrf_checks=True)
+        details = reverse('vds:transmittal_details', args=(self.transmittal.id,))
+        etag = client.get(details).headers['ETag']
+        client.cookies[settings.CSRF_COOKIE_NAME] = 'y' * 32
+        # the cached page holds a token for the old cookie: it must not be a 304
+        response = client.get(details, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"',
+                          response.content.decode())[1]
+        revision = self.revisions[0]
+        response = client.post(self.url, {'csrfmiddlewaretoken': token,
+                                          f'cell-{revision.id}-notes': 'Fresh token'})
+        self.assertEqual(response.status_code, 302)
+        revision.refresh_from_db()
+        self.assertEqual(revision.notes, 'Fresh token')
+
+    def test_finalised_transmittals_are_read_only(self):
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        snapshots.finalise(self.transmittal)
+        revision = self.revisions[0]
+        response = self.client.post(self.url, {f'cell-{revision.id}-notes': 'Late'})
+        self.assertEqual(response.status_code, 409)
+        revision.refresh_from_db()
+        self.assertNotEqual(revision.notes, 'Late')
+
+    def test_revision_edit_goes_to_the_row(self):
+        revision = self.revisions[2]
+        response = self.client.get(reverse('vds:revision_edit', args=(revision.id,)))
+        self.assertRedirects(response, reverse('vds:transmittal_details',
+                                               args=(self.transmittal.id,)) + f'#revision-{revision.id}',
+                             fetch_redirect_response=False)
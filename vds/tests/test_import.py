@@ -0,0 +1,131 @@
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+import datetime
+import io
+import os
+import tempfile
+
+from vds import export
+from vds.importer import import_register
+from vds.models import Project, Document
+
+HEADER = 'document_number,title,stub,discipline,client_number,supplier_number,required_by,penalty\n'
+
+
+class RegisterImportTests(TestCase):
+    def setUp(self):
+        self.project = Project.objects.create(
+            wa_number='WA-IM', client_number='C-IM', drm_ref_number='DRMIM',
+            title='P IM', stub='PIM', client_title='PIMT', country='Nowhere'
+        )
+        Document.objects.create(project=self.project, title='Existing', stub='ST',
+                                discipline='MECH', document_number='D-EXIST',
+                                client_number='C-EXIST')
+
+    def test_valid_rows_are_created(self):
+        data = HEADER + ('D-1,First,ST,MECH,C-1,,2025-05-01,yes\n'
+                         'D-2,Second,ST,ELEC,,S-2,,\n')
+        result = import_register(self.project, io.StringIO(data))
+        self.assertEqual((result.created, result.errors, result.conflicts), (2, [], []))
+        d1 = Document.objects.get(document_number='D-1')
+        self.assertEqual(d1.required_by, datetime.date(2025, 5, 1))
+        self.assertTrue(d1.penalty)
+        self.assertIsNone(d1.supplier_number)
+        self.assertEqual(d1.vds_status, 'Active')
+
+    def test_conflicts_in_file_and_database_are_reported(self):
+        data = HEADER + ('D-EXIST,Dup db,ST,MECH,,,,\n'
+                         'D-3,Clash client,ST,MECH,C-EXIST,,,\n'
+                         'D-4,Ok,ST,MECH,,S-4,,\n'
+                         'D-4,Dup file,ST,MECH,,,,\n'
+                         'D-5,Dup supplier,ST,MECH,,S-4,,\n')
+        result = import_register(self.project, io.StringIO(data), batch_size=2)
+        self.assertEqual(result.created, 1)
+        self.assertEqual(sorted((c.line, c.column) for c in result.conflicts),
+                         [(2, 'document_number'), (3, 'client_number'),
+                          (5, 'document_number'), (6, 'supplier_number')])
+        self.assertEqual(self.project.documents.count(), 2)
+
+    def test_duplicates_of_an_earlier_batch_cite_the_line(self):
+        data = HEADER + ('D-7,First,ST,MECH,C-7,,,\n'
+                         'D-8,Other,ST,MECH,,,,\n'
+                         'D-9,Other,ST,MECH,,,,\n'
+                         'D-7,Again,ST,MECH,C-7,,,\n')
+        # line 2 is imported by the first batch, before line 5 is checked
+        result = import_register(self.project, io.StringIO(data), batch_size=1)
+        self.assertEqual(result.created, 3)
+        self.assertEqual([(c.line, c.column, c.message) for c in result.conflicts], [
+            (5, 'document_number', 'duplicates line 2 of the file'),
+            (5, 'client_number', 'duplicates line 2 of the file'),
+        ])
+
+    def test_invalid_values_are_reported(self):
+        data = HEADER + 'D-6,Bad date,ST,MECH,,,05/01/2025,maybe\n,No number,ST,MECH,,,,\n'
+        result = import_register(self.project, io.StringIO(data))
+        self.assertEqual(result.created, 0)
+        self.assertEqual(sorted((e.line, e.column) for e in result.errors),
+                         [(2, 'penalty'), (2, 'required_by'), (3, 'document_number')])
+
+    def test_missing_required_column(self):
+        result = import_register(self.project, io.StringIO('title,stub\nA,B\n'))
+        self.assertEqual(result.created, 0)
+        self.assertEqual(result.errors[0].column, 'document_number, discipline')
+
+    def test_dry_run_writes_nothing(self):
+        result = import_register(self.project, io.StringIO(HEADER + 'D-7,T,ST,MECH,,,,\n'),
+                                 dry_run=True)
+        self.assertEqual(result.created, 1)
+        self.assertFalse(Document.objects.filter(document_number='D-7').exists())
+
+    def test_exported_register_can_be_imported(self):
+        other = Project.objects.create(
+            wa_number='WA-IM2', client_number='C', drm_ref_number='D',
+            title='T', stub='S', client_title='CT', country='N'
+        )
+        rows = export.iter_register_rows(self.project)
+        data = ''.join(export.stream_csv(export.register_header(), rows))
+        data = data.replace('D-EXIST', 'D-COPY').replace('C-EXIST', 'C-COPY')
+        result = import_register(other, io.StringIO(data))
+        self.assertEqual(result.created, 1)
+        self.assertEqual(other.documents.get().client_number, 'C-COPY')
+
+    def test_conflict_checks_use_constant_queries_per_batch(self):
+        data = HEADER + ''.join(f'N-{i},T,ST,MECH,C-{i},S-{i},,\n' for i in range(50))
+        # savepoint + 3 lookups + insert + 3 statistics writes + version
+        # bump + release
+        with self.assertNumQueries(10):
+            import_register(self.project, io.StringIO(data))
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write(HEADER + 'D-8,T,ST,MECH,,,,\nD-EXIST,T,ST,MECH,,,,\n')
+        out, err = io.StringIO(), io.StringIO()
+        try:
+            call_command('import_vds', 'WA-IM', f.name, stdout=out, stderr=err)
+        finally:
+            os.unlink(f.name)
+        self.assertIn('1 of 2 rows imported', out.getvalue())
+        self.assertIn('conflict: line 3: document_number', err.getvalue())
+
+    def test_upload_view(self):
+        upload = SimpleUploadedFile('register.csv', (HEADER + 'D-9,T,ST,MECH,,,,\n').encode())
+        response = self.client.post(reverse('vds:document_import', args=(self.project.id,)),
+                                    {'register': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['result'].created, 1)
+        self.assertTrue(Document.objects.filter(document_number='D-9').exists())
+
+    def test_non_utf8_upload_is_reported(self):
+        rows = ''.join(f'D-{i},Title,ST,MECH,,,,\n' for i in range(2000))
+        data = (HEADER + rows + 'D-X,Vanne à boisseau,ST,MECH,,,,\n').encode('latin-1')
+        upload = SimpleUploadedFile('register.csv', data)
+        response = self.client.post(reverse('vds:document_import', args=(self.project.id,)),
+                                    {'register': upload})
+        self.assertEqual(response.status_code, 200)
+        result = response.context['result']
+        self.assertEqual(result.created, 0)
+        self.assertEqual(result.errors[-1].column, 'encoding')
+        self.assertContains(response, 'is not UTF-8')
+        self.assertFalse(Document.objects.filter(document_number='D-1').exists())
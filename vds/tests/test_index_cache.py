@@ -0,0 +1,94 @@
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+import datetime
+import tempfile
+
+from vds import caching
+from vds.models import Project
+from vds.tests.helpers import create_project
+
+
+class IndexCacheTests(TestCase):
+    def setUp(self):
+        caching.get_cache().clear()
+        self.url = reverse('vds:index')
+
+    def test_fragments_are_served_from_cache(self):
+        create_project('WA-C1')
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'WA-C1')
+
+    def test_project_writes_invalidate(self):
+        project = create_project('WA-C2')
+        self.client.get(self.url)
+        create_project('WA-C3')
+        self.assertContains(self.client.get(self.url), 'WA-C3')
+
+        project.title = 'Renamed title'
+        project.save()
+        self.assertContains(self.client.get(self.url), 'Renamed title')
+
+        project.delete()
+        self.assertNotContains(self.client.get(self.url), 'WA-C2')
+
+    def test_transmittal_writes_invalidate(self):
+        project = create_project('WA-C4')
+        self.client.get(self.url)
+        transmittal = project.create_transmittal('HOUSE')
+        self.assertContains(self.client.get(self.url), str(transmittal))
+
+        transmittal.number = 'TR-777'
+        transmittal.save()
+        self.assertContains(self.client.get(self.url), 'TR-777')
+
+        transmittal.delete()
+        self.assertNotContains(self.client.get(self.url), 'TR-777')
+
+    def test_project_delete_drops_cascaded_transmittals(self):
+        project = create_project('WA-C5')
+        project.transmittals.create(number='CASC-1', source='S', date_sent=datetime.date.today())
+        self.assertContains(self.client.get(self.url), 'CASC-1')
+        project.delete()
+        self.assertNotContains(self.client.get(self.url), 'CASC-1')
+
+    def test_fragment_refilled_during_write_is_dropped_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            create_project('WA-C6')
+            # another request re-fills the cache before the write commits
+            caching.get_cache().set(caching.LATEST_PROJECTS_KEY, 'stale')
+        self.assertIsNone(caching.get_cache().get(caching.LATEST_PROJECTS_KEY))
+        self.assertContains(self.client.get(self.url), 'WA-C6')
+
+
+class IndexCacheBackendTests(TestCase):
+    """Invalidation works the same with the file and database backends."""
+
+    def _check_backend(self):
+        caching.get_cache().clear()
+        url = reverse('vds:index')
+        project = create_project('WA-B1')
+        self.assertContains(self.client.get(url), 'WA-B1')
+        Project.objects.filter(pk=project.pk).get().delete()
+        self.assertNotContains(self.client.get(url), 'WA-B1')
+
+    def test_file_backend(self):
+        with tempfile.TemporaryDirectory() as location:
+            with override_settings(CACHES={'vds': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': location,
+            }}, VDS_CACHE_ALIAS='vds'):
+                self._check_backend()
+                caches['vds'].close()
+
+    def test_database_backend(self):
+        with override_settings(CACHES={'vds': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'vds_cache_table',
+        }}, VDS_CACHE_ALIAS='vds'):
+            call_command('createcachetable', verbosity=0)
+            self._check_backend()
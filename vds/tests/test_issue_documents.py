@@ -0,0 +1,105 @@
+from django.test import TestCase
+from django.urls import reverse
+import datetime
+
+from vds.models import Project, Document, Revision, Transmittal
+
+
+class TransmittalIssueDocumentsTests(TestCase):
+    def setUp(self):
+        self.project = Project.objects.create(
+            wa_number='WA-I', client_number='C-I', drm_ref_number='DRMI',
+            title='P I', stub='PI', client_title='PIT', country='Nowhere'
+        )
+
+    def _create_documents(self, count, start=0):
+        return Document.objects.bulk_create([
+            Document(project=self.project, title=f'Doc {i}', stub='ST',
+                     discipline='MECH', document_number=f'DOC-{i:05d}')
+            for i in range(start, start + count)
+        ])
+
+    def test_issue_sets_labels_and_updates_documents(self):
+        first, second = self._create_documents(2)
+        second.revision_number = '03'
+        second.save()
+        t = self.project.create_transmittal()
+        created = t.issue_documents([first.id, second.id])
+
+        self.assertEqual(len(created), 2)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.revision_number, '0')
+        self.assertEqual(second.revision_number, '04')
+        self.assertEqual(first.latest_issue, datetime.date.today())
+        self.assertEqual(
+            set(t.revisions.values_list('revision_number', flat=True)), {'0', '04'}
+        )
+
+    def test_signatories_copied_from_latest_revision(self):
+        doc, = self._create_documents(1)
+        old = self.project.transmittals.create(number='OLD-001', source='HOUSE',
+                                               date_sent=datetime.date(2024, 1, 1))
+        Revision.objects.create(transmittal=old, document=doc, revision_number='A',
+                                date=datetime.date(2024, 1, 1), purpose='IFR',
+                                prepared_by='AA', reviewed_by='BB', approved_by='CC')
+        Revision.objects.create(transmittal=self.project.transmittals.create(
+                                    number='OLD-002', source='HOUSE',
+                                    date_sent=datetime.date(2024, 2, 1)),
+                                document=doc, revision_number='B',
+                                date=datetime.date(2024, 2, 1), purpose='IFR',
+                                prepared_by='DD', reviewed_by='EE', approved_by='FF')
+        doc.revision_number = 'B'
+        doc.save()
+
+        t = self.project.create_transmittal('NEW')
+        rev, = t.issue_documents([doc.id])
+        self.assertEqual(rev.revision_number, 'C')
+        self.assertEqual((rev.prepared_by, rev.reviewed_by, rev.approved_by),
+                         ('DD', 'EE', 'FF'))
+
+    def test_foreign_documents_are_ignored(self):
+        other = Project.objects.create(
+            wa_number='WA-O', client_number='C-O', drm_ref_number='DRMO',
+            title='P O', stub='PO', client_title='POT', country='Nowhere'
+        )
+        foreign = Document.objects.create(project=other, title='F', stub='F',
+                                          discipline='CIV', document_number='F-1')
+        t = self.project.create_transmittal()
+        self.assertEqual(t.issue_documents([foreign.id]), [])
+        self.assertFalse(Revision.objects.exists())
+
+    def test_query_count_independent_of_selection_size(self):
+        small = [d.id for d in self._create_documents(2)]
+        large = [d.id for d in self._create_documents(40, start=100)]
+        t1 = self.project.transmittals.create(number='Q-001', source='Q',
+                                              date_sent=datetime.date.today())
+        t2 = self.project.transmittals.create(number='Q-002', source='Q',
+                                              date_sent=datetime.date.today())
+        # select documents + bulk insert + update, then the statistics
+        # (create missing rows, select their ids, one update) and the project
+        # version, in a savepoint
+        with self.assertNumQueries(9):
+            t1.issue_documents(small)
+        with self.assertNumQueries(9):
+            t2.issue_documents(large)
+        self.assertEqual(t2.revisions.count(), 40)
+
+    def test_issue_action_is_atomic(self):
+        docs = self._create_documents(3)
+        # a clashing revision label makes the bulk insert fail
+        blocker = self.project.transmittals.create(number='B-001', source='B',
+                                                   date_sent=datetime.date(2024, 1, 1))
+        Revision.objects.create(transmittal=blocker, document=docs[2],
+                                revision_number='0', date=datetime.date(2024, 1, 1),
+                                purpose='IFR')
+        url = reverse('vds:document_list', args=(self.project.id,))
+        response = self.client.post(url, {'action': 'issue',
+                                          'selected': [str(d.id) for d in docs]})
+        # the clash is reported with the preview of the selection
+        self.assertContains(response, 'Nothing was issued', status_code=409)
+        self.assertEqual([row.document_id for row in response.context['preview'].clashes],
+                         [docs[2].id])
+        # neither the transmittal nor any revision was left behind
+        self.assertEqual(Transmittal.objects.count(), 1)
+        self.assertEqual(Revision.objects.count(), 1)
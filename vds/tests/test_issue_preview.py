@@ -0,0 +1,80 @@
+import datetime
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from vds.models import Revision, Transmittal, TransmittalSequence
+from vds.preview import preview_issue
+
+from .helpers import create_documents, create_project
+
+
+class IssuePreviewTests(TestCase):
+    def setUp(self):
+        self.project = create_project('WA-P')
+        self.docs = create_documents(self.project, 4)
+        self.old = self.project.transmittals.create(number='P-007', source='CLIENT',
+                                                    date_sent=datetime.date(2024, 1, 1))
+        Revision.objects.create(transmittal=self.old, document=self.docs[0], revision_number='A',
+                                date=datetime.date(2024, 1, 1), purpose='IFR',
+                                prepared_by='AA', reviewed_by='BB', approved_by='CC')
+        self.docs[0].revision_number = 'A'
+        self.docs[0].save()
+
+    def test_preview_matches_the_issue(self):
+        ids = [d.id for d in self.docs[:2]]
+        preview = preview_issue(self.project, ids)
+        self.assertEqual((preview.source, preview.transmittal_number), ('CLIENT', 'P-008'))
+        first, second = preview.rows
+        self.assertEqual((first.current_revision, first.new_revision), ('A', 'B'))
+        self.assertEqual((first.prepared_by, first.reviewed_by, first.approved_by),
+                         ('AA', 'BB', 'CC'))
+        self.assertEqual((second.current_revision, second.new_revision, second.prepared_by),
+                         (None, '0', None))
+        self.assertEqual(preview.clashes, [])
+
+        transmittal = self.project.create_transmittal()
+        transmittal.issue_documents(ids)
+        self.assertEqual(transmittal.number, preview.transmittal_number)
+        self.assertEqual(
+            dict(transmittal.revisions.values_list('document_id', 'revision_number')),
+            {row.document_id: row.new_revision for row in preview.rows},
+        )
+
+    def test_clashes_are_flagged(self):
+        # a label that already exists for the document, e.g. after a manual
+        # revision edit, would break the unique constraint on issue
+        Revision.objects.create(transmittal=self.old, document=self.docs[1], revision_number='0',
+                                date=datetime.date(2024, 1, 1), purpose='IFR')
+        # '0' exists for docs[2] too, but is not its new label
+        Revision.objects.create(
+            transmittal=self.project.transmittals.create(number='P-009', source='CLIENT',
+                                                         date_sent=datetime.date(2024, 2, 1)),
+            document=self.docs[2], revision_number='1', date=datetime.date(2024, 2, 1),
+            purpose='IFR')
+        preview = preview_issue(self.project, [d.id for d in self.docs])
+        self.assertEqual([row.document_id for row in preview.clashes], [self.docs[1].id])
+
+    def test_writes_nothing_with_constant_queries(self):
+        more = create_documents(self.project, 100, start=100)
+        with CaptureQueriesContext(connection) as small:
+            preview_issue(self.project, [self.docs[0].id])
+        with CaptureQueriesContext(connection) as large:
+            preview = preview_issue(self.project, [d.id for d in self.docs + more] + [0])
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        self.assertFalse([q for q in large.captured_queries
+                          if not q['sql'].startswith('SELECT')])
+        self.assertEqual(preview.missing, [0])
+        self.assertEqual(len(preview.rows), 104)
+        self.assertFalse(TransmittalSequence.objects.exists())
+        self.assertEqual(Transmittal.objects.count(), 1)
+
+    def test_document_list_preview_action(self):
+        response = self.client.post(reverse('vds:document_list', args=(self.project.id,)),
+                                    {'action': 'preview', 'select_all_matching': '1'})
+        self.assertContains(response, 'Transmittal <strong>P-008</strong>')
+        self.assertContains(response, 'name="select_all_matching"')
+        self.assertEqual(len(response.context['preview'].rows), 4)
+        self.assertEqual(Transmittal.objects.count(), 1)
@@ -0,0 +1,261 @@
+import datetime
+import io
+import shutil
+import tempfile
+import time
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from vds import jobs
+from vds.models import Document, Job, Transmittal
+
+from .helpers import create_documents, create_project
+
+calls = []
+
+
+@jobs.handler('test_flaky')
+def flaky(progress, fail_times):
+    calls.append(fail_times)
+    progress(len(calls), fail_times + 1)
+    if len(calls) <= fail_times:
+        raise RuntimeError(f"attempt {len(calls)} failed")
+    return {'calls': len(calls)}
+
+
+@jobs.handler('test_slow')
+def slow(progress, seconds):
+    time.sleep(seconds)
+    # what the heartbeats left behind while this handler was busy
+    locked_at = Job.objects.filter(pk=progress.job_id).values_list('locked_at', flat=True).get()
+    return {'locked_at': locked_at.isoformat()}
+
+
+class JobFilesMixin:
+    def setUp(self):
+        super().setUp()
+        calls.clear()
+        self.files = tempfile.mkdtemp()
+        self.settings_override = override_settings(VDS_JOB_FILES_DIR=self.files)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.files, ignore_errors=True)
+        super().tearDown()
+
+
+class JobQueueTests(JobFilesMixin, TestCase):
+    def test_unknown_kind_is_rejected(self):
+        with self.assertRaises(ValueError):
+            jobs.enqueue('no_such_kind')
+
+    def test_claims_oldest_due_job_once(self):
+        later = jobs.enqueue('test_flaky', fail_times=0)
+        Job.objects.filter(pk=later.pk).update(run_after=timezone.now() - datetime.timedelta(seconds=5))
+        first = jobs.enqueue('test_flaky', fail_times=0)
+        Job.objects.filter(pk=first.pk).update(run_after=timezone.now() - datetime.timedelta(seconds=10))
+        future = jobs.enqueue('test_flaky', fail_times=0)
+        Job.objects.filter(pk=future.pk).update(run_after=timezone.now() + datetime.timedelta(hours=1))
+
+        claimed = jobs.claim('w1')
+        self.assertEqual((claimed.pk, claimed.state, claimed.locked_by, claimed.attempts),
+                         (first.pk, Job.RUNNING, 'w1', 1))
+        self.assertEqual(jobs.claim('w2').pk, later.pk)
+        # the remaining job is not due yet
+        self.assertIsNone(jobs.claim('w3'))
+
+    def test_claim_falls_back_to_compare_and_set(self):
+        job = jobs.enqueue('test_flaky', fail_times=0)
+        features = connection.features
+        skip_locked = features.has_select_for_update_skip_locked
+        features.has_select_for_update_skip_locked = False
+        try:
+            self.assertEqual(jobs.claim('w1').pk, job.pk)
+            self.assertIsNone(jobs.claim('w2'))
+        finally:
+            features.has_select_for_update_skip_locked = skip_locked
+
+    @override_settings(VDS_JOB_RETRY_DELAY=10)
+    def test_failures_are_retried_with_backoff(self):
+        job = jobs.enqueue('test_flaky', max_attempts=3, fail_times=1)
+        before = timezone.now()
+        job = jobs.run(jobs.claim('w1'))
+        self.assertEqual((job.state, job.attempts), (Job.QUEUED, 1))
+        self.assertIn('attempt 1 failed', job.error)
+        self.assertGreaterEqual(job.run_after, before + datetime.timedelta(seconds=10))
+        # not due until the delay has passed
+        self.assertIsNone(jobs.claim('w1'))
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        job = jobs.run(jobs.claim('w1'))
+        self.assertEqual((job.state, job.attempts, job.result), (Job.DONE, 2, {'calls': 2}))
+        self.assertEqual((job.progress_done, job.progress_total), (2, 2))
+        self.assertIsNotNone(job.finished_at)
+
+    @override_settings(VDS_JOB_RETRY_DELAY=0)
+    def test_fails_after_max_attempts(self):
+        job = jobs.enqueue('test_flaky', max_attempts=2, fail_times=5)
+        self.assertEqual(jobs.work(once=True), 2)
+        job.refresh_from_db()
+        self.assertEqual((job.state, job.attempts), (Job.FAILED, 2))
+        self.assertEqual(jobs.status(job)['error'], 'RuntimeError: attempt 2 failed')
+
+    @override_settings(VDS_JOB_TIMEOUT=60, VDS_JOB_RETRY_DELAY=0)
+    def test_stale_running_jobs_are_requeued(self):
+        job = jobs.enqueue('test_flaky', fail_times=0)
+        jobs.claim('dead-worker')
+        self.assertEqual(jobs.requeue_stale(), 0)
+        Job.objects.filter(pk=job.pk).update(
+            locked_at=timezone.now() - datetime.timedelta(minutes=5))
+        self.assertEqual(jobs.requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.state, Job.QUEUED)
+        self.assertIn('dead-worker', job.error)
+        self.assertEqual(jobs.work(once=True), 1)
+
+    def test_worker_command_runs_due_jobs(self):
+        jobs.enqueue('test_flaky', fail_times=0)
+        out = io.StringIO()
+        call_command('vds_worker', '--once', stdout=out)
+        self.assertIn('1 jobs run', out.getvalue())
+        self.assertEqual(Job.objects.get().state, Job.DONE)
+
+
+    @override_settings(VDS_JOB_TIMEOUT=60)
+    def test_heartbeats_keep_a_slow_job_running(self):
+        job = jobs.enqueue('test_flaky', fail_times=0)
+        claimed = jobs.claim('slow-worker')
+        old = timezone.now() - datetime.timedelta(minutes=5)
+        Job.objects.filter(pk=job.pk).update(locked_at=old)
+        self.assertTrue(jobs.Heartbeat(claimed).beat())
+        self.assertEqual(jobs.requeue_stale(), 0)
+
+        # progress counts as a heartbeat as well
+        Job.objects.filter(pk=job.pk).update(locked_at=old)
+        jobs.Progress(claimed)(1, 2)
+        self.assertEqual(jobs.requeue_stale(), 0)
+
+        # once the job was handed to another worker, the old one's beats stop counting
+        Job.objects.filter(pk=job.pk).update(locked_by='other-worker')
+        self.assertFalse(jobs.Heartbeat(claimed).beat())
+
+
+class HeartbeatThreadTests(JobFilesMixin, TransactionTestCase):
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("in-memory SQLite is not shared with the heartbeat thread")
+        super().setUp()
+
+    @override_settings(VDS_JOB_HEARTBEAT=0.05)
+    def test_heartbeat_runs_while_the_handler_works(self):
+        jobs.enqueue('test_slow', seconds=0.5)
+        claimed = jobs.claim('w1')
+        claimed_at = claimed.locked_at
+        job = jobs.run(claimed)
+        self.assertEqual(job.state, Job.DONE)
+        self.assertGreater(datetime.datetime.fromisoformat(job.result['locked_at']), claimed_at)
+
+
+class JobViewTests(JobFilesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.project = create_project('WA-JOB')
+        self.docs = create_documents(self.project, 3)
+
+    def test_issue_in_background(self):
+        response = self.client.post(reverse('vds:document_list', args=(self.project.id,)),
+                                    {'action': 'issue', 'background': '1',
+                                     'selected': [d.id for d in self.docs]})
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(Transmittal.objects.exists())
+        status_url = response.context['status_url']
+        self.assertEqual(self.client.get(status_url).json()['state'], Job.QUEUED)
+
+        jobs.work(once=True)
+        status = self.client.get(status_url).json()
+        transmittal = Transmittal.objects.get()
+        self.assertEqual((status['state'], status['result']['revisions']), (Job.DONE, 3))
+        self.assertEqual(status['links'],
+                         {'transmittal': reverse('vds:transmittal_details', args=(transmittal.id,))})
+
+    @override_settings(VDS_JOB_TIMEOUT=60, VDS_JOB_RETRY_DELAY=0)
+    def test_issue_is_not_repeated_after_its_worker_died(self):
+        job = jobs.enqueue('issue', project_id=self.project.id,
+                           document_ids=[d.id for d in self.docs])
+        claimed = jobs.claim('dead-worker')
+        # the issue commits, then the worker dies before marking the job done
+        jobs.issue(jobs.Progress(claimed), **claimed.params)
+        Job.objects.filter(pk=job.pk).update(
+            locked_at=timezone.now() - datetime.timedelta(minutes=5))
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(jobs.work(once=True), 1)
+        job.refresh_from_db()
+        transmittal = Transmittal.objects.get()
+        self.assertEqual((job.state, job.result['transmittal_id']), (Job.DONE, transmittal.id))
+        self.assertEqual(transmittal.revisions.count(), 3)
+
+    @override_settings(VDS_JOB_TIMEOUT=60, VDS_JOB_RETRY_DELAY=0)
+    def test_import_is_not_repeated_after_its_worker_died(self):
+        name = jobs.save_upload(SimpleUploadedFile('register.csv', (
+            b'document_number,title,stub,discipline\nD-ONCE,Once,ST,MECH\n')))
+        job = jobs.enqueue('import_register', project_id=self.project.id, file=name)
+        claimed = jobs.claim('dead-worker')
+        # the import commits, then the worker dies before marking the job done
+        jobs.import_register(jobs.Progress(claimed), **claimed.params)
+        Job.objects.filter(pk=job.pk).update(
+            locked_at=timezone.now() - datetime.timedelta(minutes=5))
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(jobs.work(once=True), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.state, job.result['created'], job.result['conflict_count']),
+                         (Job.DONE, 1, 0))
+        self.assertEqual(Document.objects.filter(document_number='D-ONCE').count(), 1)
+        self.assertEqual(list(jobs.files_dir().iterdir()), [])
+
+    def test_failed_import_removes_its_upload(self):
+        name = jobs.save_upload(SimpleUploadedFile('register.csv', b'document_number,title\n'))
+        jobs.enqueue('import_register', max_attempts=1, project_id=999999, file=name)
+        jobs.work(once=True)
+        self.assertEqual(Job.objects.get().state, Job.FAILED)
+        self.assertEqual(list(jobs.files_dir().iterdir()), [])
+
+    def test_import_in_background(self):
+        upload = SimpleUploadedFile('register.csv', (
+            b'document_number,title,stub,discipline\n'
+            b'D-NEW,New,ST,MECH\n'
+            b'D-NEW,Duplicate,ST,MECH\n'), content_type='text/csv')
+        response = self.client.post(reverse('vds:document_import', args=(self.project.id,)),
+                                    {'register': upload, 'background': '1'})
+        self.assertEqual(response.status_code, 202)
+        jobs.work(once=True)
+        result = Job.objects.get().result
+        self.assertEqual((result['created'], result['conflict_count']), (1, 1))
+        self.assertTrue(Document.objects.filter(document_number='D-NEW').exists())
+        # the uploaded file is removed once imported
+        self.assertEqual(list(jobs.files_dir().iterdir()), [])
+
+    def test_export_in_background(self):
+        response = self.client.get(reverse('vds:document_export', args=(self.project.id,)),
+                                   {'format': 'csv', 'background': '1'})
+        self.assertEqual(response.status_code, 202)
+        job = response.context['job']
+        download = reverse('vds:job_download', args=(job.id,))
+        self.assertEqual(self.client.get(download).status_code, 404)
+
+        jobs.work(once=True)
+        links = self.client.get(reverse('vds:job_status', args=(job.id,))).json()['links']
+        self.assertEqual(links, {'download': download})
+        response = self.client.get(download)
+        self.assertEqual(response['Content-Disposition'],
+                         'attachment; filename="WA-JOB-vds.csv"')
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(len(body.strip().splitlines()), 4)
+
+    def test_unknown_job_status(self):
+        self.assertEqual(self.client.get(reverse('vds:job_status', args=(999,))).status_code, 404)
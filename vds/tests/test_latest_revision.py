@@ -0,0 +1,121 @@
+import datetime
+import importlib
+from types import SimpleNamespace
+
+from django.apps import apps
+from django.db import connection
+from django.test import TestCase
+
+from vds import deletion
+from vds.models import Document, Revision
+
+from .helpers import create_documents, create_project
+
+backfill = importlib.import_module('vds.migrations.0017_backfill_latest_revision')
+
+
+class LatestRevisionTests(TestCase):
+    def setUp(self):
+        self.project = create_project('WA-LR')
+        self.docs = create_documents(self.project, 3)
+        self.ids = [d.id for d in self.docs]
+
+    def _latest(self, document):
+        return Document.objects.values_list('latest_revision', flat=True).get(pk=document.pk)
+
+    def _expected(self, document):
+        return Revision.objects.filter(document=document).order_by('-date', '-id').values_list(
+            'pk', flat=True).first()
+
+    def test_issue_points_at_the_new_revisions(self):
+        first = self.project.create_transmittal()
+        first.issue_documents(self.ids)
+        # same date as the first issue: the later revision wins the tie
+        second = self.project.create_transmittal()
+        created = second.issue_documents(self.ids[:2])
+        self.assertEqual([self._latest(d) for d in self.docs[:2]], [r.pk for r in created])
+        self.assertEqual(self._latest(self.docs[2]),
+                         first.revisions.get(document=self.docs[2]).pk)
+
+    def test_revision_new_points_at_the_new_revision(self):
+        transmittal = self.project.create_transmittal()
+        revision = Revision.revision_new(transmittal.id, self.docs[0].id)
+        self.assertEqual(self._latest(self.docs[0]), revision.pk)
+
+    def test_revision_edits_and_deletes_move_the_pointer(self):
+        transmittal = self.project.create_transmittal()
+        old, = transmittal.issue_documents([self.docs[0].id])
+        new = Revision.objects.create(transmittal=self.project.create_transmittal(),
+                                      document=self.docs[0], revision_number='9',
+                                      date=datetime.date.today(), purpose='IFR')
+        self.assertEqual(self._latest(self.docs[0]), new.pk)
+
+        new.date = datetime.date(2020, 1, 1)
+        new.save()
+        self.assertEqual(self._latest(self.docs[0]), old.pk)
+
+        # a revision moved to another document leaves the first one too
+        old.document = self.docs[1]
+        old.save()
+        self.assertEqual((self._latest(self.docs[0]), self._latest(self.docs[1])),
+                         (new.pk, old.pk))
+
+        new.delete()
+        self.assertIsNone(self._latest(self.docs[0]))
+
+    def test_full_save_of_a_stale_instance_keeps_the_pointer(self):
+        document = Document.objects.get(pk=self.docs[0].pk)
+        revision, = self.project.create_transmittal().issue_documents([document.id])
+        document.notes = 'edited'
+        document.save()
+        self.assertEqual(self._latest(document), revision.pk)
+
+    def test_save_of_a_deferred_instance_writes_only_loaded_fields(self):
+        document = Document.objects.only('id', 'project', 'notes').get(pk=self.docs[0].pk)
+        revision, = self.project.create_transmittal().issue_documents([document.id])
+        document.notes = 'edited'
+        # the UPDATE and the project's change version: no deferred field is fetched
+        with self.assertNumQueries(2):
+            document.save()
+        self.assertEqual(self._latest(document), revision.pk)
+        self.assertEqual(Document.objects.get(pk=document.pk).notes, 'edited')
+
+        # the pointer is loaded but not named: still left alone
+        document = Document.objects.only('id', 'latest_revision').get(pk=self.docs[0].pk)
+        document.latest_revision = None
+        document.save()
+        self.assertEqual(self._latest(document), revision.pk)
+
+    def test_save_of_a_deleted_document_inserts_it_again(self):
+        document = Document.objects.get(pk=self.docs[0].pk)
+        Document.objects.filter(pk=document.pk).delete()
+        document.save()
+        self.assertTrue(Document.objects.filter(pk=document.pk,
+                                                document_number=document.document_number).exists())
+
+    def test_set_based_deletion_restores_the_pointer(self):
+        first = self.project.create_transmittal()
+        first.issue_documents(self.ids)
+        second = self.project.create_transmittal()
+        second.issue_documents(self.ids[:2])
+        # a label set by hand keeps its label, not the pointer
+        Document.objects.filter(pk=self.ids[1]).update(revision_number='X')
+
+        deletion.delete_transmittal(second)
+        for document in self.docs:
+            self.assertEqual(self._latest(document), self._expected(document))
+        deletion.delete_transmittal(first)
+        self.assertEqual([self._latest(d) for d in self.docs], [None, None, None])
+
+    def test_backfill(self):
+        self.project.create_transmittal().issue_documents(self.ids)
+        self.project.create_transmittal().issue_documents(self.ids[1:])
+        Document.objects.update(latest_revision=None)
+        size = backfill.BATCH_SIZE
+        backfill.BATCH_SIZE = 2
+        try:
+            backfill.backfill(apps, SimpleNamespace(connection=connection))
+        finally:
+            backfill.BATCH_SIZE = size
+        for document in self.docs:
+            self.assertEqual(self._latest(document), self._expected(document))
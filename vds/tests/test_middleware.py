@@ -0,0 +1,70 @@
+from django.contrib.auth.models import User
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+import json
+
+from vds.middleware import QueryInstrumentationMiddleware, RequestStats, request_stats
+from vds.tests.helpers import create_documents, create_project
+
+
+class InstrumentationMiddlewareTests(TestCase):
+    def setUp(self):
+        request_stats.clear()
+        self.project = create_project('WA-MW')
+        create_documents(self.project, 3)
+
+    def test_disabled_by_default(self):
+        self.client.get(reverse('vds:document_list', args=(self.project.id,)))
+        self.assertEqual(request_stats.snapshot(), {})
+
+    def test_disabled_middleware_is_not_installed(self):
+        # Django then leaves it out of the handler chain: no per-request cost
+        with self.assertRaises(MiddlewareNotUsed):
+            QueryInstrumentationMiddleware(lambda request: HttpResponse())
+        with override_settings(VDS_INSTRUMENTATION=True):
+            middleware = QueryInstrumentationMiddleware(lambda request: HttpResponse())
+        middleware(RequestFactory().get('/'))
+        self.assertEqual(list(request_stats.snapshot()), ['<unresolved>'])
+
+    @override_settings(VDS_INSTRUMENTATION=True)
+    def test_records_view_queries_and_logs_json(self):
+        url = reverse('vds:document_list', args=(self.project.id,))
+        with self.assertLogs('vds.requests', 'INFO') as logs:
+            self.client.get(url)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'vds:document_list')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['queries'], 4)
+        self.assertIn('SELECT', record['slowest_sql'])
+        self.assertGreaterEqual(record['duration_ms'], record['sql_ms'])
+
+        stats = request_stats.snapshot()['vds:document_list']
+        self.assertEqual((stats['count'], stats['mean_queries']), (1, 4))
+
+    @override_settings(VDS_INSTRUMENTATION=True)
+    def test_stats_endpoint_is_staff_only(self):
+        url = reverse('vds:request_stats')
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        staff = User.objects.create_user('staff', password='pw', is_staff=True)
+        self.client.force_login(staff)
+        self.client.get(reverse('vds:index'))
+        data = self.client.get(url).json()
+        self.assertTrue(data['enabled'])
+        self.assertIn('vds:index', data['views'])
+
+
+class RequestStatsTests(TestCase):
+    def test_percentiles_over_rolling_window(self):
+        stats = RequestStats(window_size=100)
+        for ms in range(1, 201):
+            stats.add('v', ms / 1000, queries=2)
+        snapshot = stats.snapshot()['v']
+        # only the last 100 durations (101..200 ms) are kept
+        self.assertEqual(snapshot['window'], 100)
+        self.assertEqual(snapshot['count'], 200)
+        self.assertEqual((snapshot['p50_ms'], snapshot['p95_ms'], snapshot['p99_ms']),
+                         (150.0, 195.0, 199.0))
+        self.assertEqual(snapshot['mean_queries'], 2)
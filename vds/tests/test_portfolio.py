@@ -0,0 +1,80 @@
+import csv
+import datetime
+import io
+
+from django.test import TestCase
+from django.urls import reverse
+
+from vds import caching, portfolio
+from vds.models import Document
+
+from .helpers import create_documents, create_project
+
+
+class PortfolioTests(TestCase):
+    def setUp(self):
+        caching.get_cache().clear()
+        self.today = datetime.date.today()
+        self.first = create_project('WA-PF1', title='First')
+        self.second = create_project('WA-PF2', title='Second')
+        # only inactive documents: not part of the portfolio
+        self.closed = create_project('WA-PF3', title='Closed')
+        create_documents(self.first, 3, penalty=True)
+        issued, = create_documents(self.first, 1, start=3, vds_status='Void', priority=True,
+                                   latest_issue=self.today)
+        Document.objects.filter(pk=issued.pk).update(discipline='ELEC')
+        create_documents(self.second, 2, milestone=True)
+        create_documents(self.closed, 2, vds_status='Void')
+        for project, number, source, date in (
+                (self.first, 'T-1', 'HOUSE', self.today),
+                (self.first, 'T-2', 'HOUSE', self.today),
+                (self.first, 'T-3', 'CLIENT', self.today),
+                (self.second, 'T-4', 'HOUSE', self.today),
+                # outside the reported months
+                (self.second, 'T-5', 'HOUSE', self.today - datetime.timedelta(days=800))):
+            project.transmittals.create(number=number, source=source, date_sent=date)
+
+    def test_build(self):
+        with self.assertNumQueries(3):
+            report = portfolio.build(self.today)
+        month = self.today.strftime('%Y-%m')
+        self.assertEqual([row.wa_number for row in report.projects], ['WA-PF1', 'WA-PF2'])
+        self.assertEqual((report.statuses, report.disciplines, report.sources),
+                         (['Active', 'Void'], ['ELEC', 'MECH'], ['CLIENT', 'HOUSE']))
+        self.assertEqual(len(report.months), 12)
+        self.assertEqual(report.months[-1], month)
+
+        first, second = report.projects
+        self.assertEqual((first.documents, first.by_status, first.by_discipline),
+                         (4, {'Active': 3, 'Void': 1}, {'MECH': 3, 'ELEC': 1}))
+        # the priority document was issued, so it is not outstanding
+        self.assertEqual(first.outstanding, {'penalty': 3, 'milestone': 0, 'priority': 0})
+        self.assertEqual(first.transmittals, {(month, 'HOUSE'): 2, (month, 'CLIENT'): 1})
+        self.assertEqual(second.transmittals, {(month, 'HOUSE'): 1})
+        self.assertEqual((report.totals.documents, report.totals.outstanding['milestone'],
+                          report.totals.transmittals[(month, 'HOUSE')]), (6, 2, 3))
+
+    def test_report_is_cached(self):
+        self.assertEqual(portfolio.report().totals.documents, 6)
+        Document.objects.filter(project=self.second).delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(portfolio.report().totals.documents, 6)
+        self.assertEqual(portfolio.report(refresh=True).totals.documents, 4)
+
+    def test_page_and_csv(self):
+        url = reverse('vds:portfolio')
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertContains(response, reverse('vds:project_details', args=(self.first.id,)))
+        self.assertNotContains(response, 'WA-PF3')
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'format': 'csv'})
+        self.assertEqual(response['Content-Disposition'],
+                         'attachment; filename="vds-portfolio.csv"')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        header = rows[0]
+        self.assertEqual(header[:4], ['WA number', 'Title', 'Documents', 'Status: Active'])
+        self.assertEqual([row[0] for row in rows[1:]], ['WA-PF1', 'WA-PF2', 'Total'])
+        column = header.index(f"Transmittals {self.today.strftime('%Y-%m')} HOUSE")
+        self.assertEqual([row[column] for row in rows[1:]], ['2', '1', '3'])
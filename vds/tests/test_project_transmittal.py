@@ -15,7 +15,7 @@ class ProjectCreateTransmittalTests(TestCase):
         p = self._create_project()
         t = p.create_transmittal(source=None)
         self.assertIsInstance(t, Transmittal)
-        self.assertEqual(t.number, 'TR-001')
+        self.assertEqual(t.number, 'WA-X-HOUSE-001')
         self.assertEqual(t.source, 'HOUSE')
 
     def test_increment_trailing_digits_preserves_padding(self):
@@ -63,5 +63,5 @@ class ProjectCreateTransmittalTests(TestCase):
         p = self._create_project()
         t = p.create_transmittal('BrandNew')
         self.assertEqual(t.source, 'BrandNew')
-        # new numbering starts at TR-001 per new policy
-        self.assertEqual(t.number, 'TR-001')
+        # new numbering starts at 001 under the project and source
+        self.assertEqual(t.number, 'WA-X-BrandNew-001')
@@ -0,0 +1,235 @@
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.urls import URLPattern, reverse
+import datetime
+import json
+import shutil
+import tempfile
+
+from vds import caching, jobs, urls
+from vds.models import Job, Revision
+from vds.tests.helpers import QueryBudgetTestCase, create_documents, create_project
+
+
+class ViewQueryBudgetTests(QueryBudgetTestCase):
+    """Every vds view has a fixed query budget, independent of data size.
+
+    The fixture is large enough that one query per row would blow every
+    budget.
+    """
+    documents = 60
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = create_project('WA-Q')
+        cls.docs = create_documents(cls.project, cls.documents, revision_number='0')
+        cls.transmittal = cls.project.transmittals.create(
+            number='TR-001', source='HOUSE', date_sent=datetime.date(2025, 1, 1))
+        Revision.objects.bulk_create([
+            Revision(transmittal=cls.transmittal, document=d, revision_number='0',
+                     date=datetime.date(2025, 1, 1), purpose='IFR', prepared_by='AB')
+            for d in cls.docs
+        ])
+        for i in range(12):
+            cls.project.transmittals.create(number=f'X-{i:03d}', source='X',
+                                            date_sent=datetime.date(2025, 2, 1))
+
+    def test_index(self):
+        self.assertQueryBudget(2, reverse('vds:index'), status=200)
+
+    def test_project_details(self):
+        # the project and its statistics dashboard
+        self.assertQueryBudget(2, reverse('vds:project_details', args=(self.project.id,)),
+                               status=200)
+
+    def test_document_list(self):
+        # project version (ETag), project, page, total count
+        self.assertQueryBudget(4, reverse('vds:document_list', args=(self.project.id,)),
+                               status=200)
+
+    def test_document_list_issue(self):
+        ids = [str(d.id) for d in self.docs]
+        response = self.assertQueryBudget(
+            24, reverse('vds:document_list', args=(self.project.id,)), method='post',
+            data={'action': 'issue', 'selected': ids}, status=200)
+        self.assertEqual(len(response.context['revisions']), self.documents)
+
+    def test_document_list_preview(self):
+        # project version (ETag), project, documents with signatories,
+        # clashes, default source, sequence, source's latest transmittal
+        response = self.assertQueryBudget(
+            7, reverse('vds:document_list', args=(self.project.id,)), method='post',
+            data={'action': 'preview', 'selected': [str(d.id) for d in self.docs]}, status=200)
+        self.assertEqual(len(response.context['preview'].rows), self.documents)
+
+    def test_document_list_delete(self):
+        ids = [str(d.id) for d in self.docs[:30]]
+        # statistics aggregates, then one set-based delete per table (due
+        # notices, revisions, documents); see vds.deletion
+        self.assertQueryBudget(
+            12, reverse('vds:document_list', args=(self.project.id,)), method='post',
+            data={'action': 'delete', 'selected': ids}, status=302)
+
+    def test_document_export(self):
+        response = self.assertQueryBudget(
+            2, reverse('vds:document_export', args=(self.project.id,)), status=200)
+        with self.assertMaxQueries(1):
+            b''.join(response.streaming_content)
+
+    def test_document_import_form(self):
+        self.assertQueryBudget(1, reverse('vds:document_import', args=(self.project.id,)),
+                               status=200)
+
+    def test_document_search(self):
+        self.assertQueryBudget(4, reverse('vds:document_search'),
+                               data={'q': 'WA-Q', 'project': self.project.id}, status=200)
+
+    def test_document_details(self):
+        self.assertQueryBudget(0, reverse('vds:document_details', args=(self.docs[0].id,)),
+                               status=200)
+
+    def test_transmittal_list(self):
+        self.assertQueryBudget(3, reverse('vds:transmittal_list', args=(self.project.id,)),
+                               status=200)
+
+    def test_transmittal_details(self):
+        response = self.assertQueryBudget(
+            3, reverse('vds:transmittal_details', args=(self.transmittal.id,)), status=200)
+        self.assertContains(response, f'{self.docs[5].document_number} - ST')
+
+    def test_transmittal_grid(self):
+        # every row, two column sets: transmittal, edited revisions,
+        # savepoint, one bulk update per column set, version, release
+        data = {f'cell-{r.pk}-{"notes" if r.pk % 2 else "purpose"}': 'Edited'
+                for r in self.transmittal.revisions.all()}
+        self.assertQueryBudget(
+            7, reverse('vds:transmittal_grid', args=(self.transmittal.id,)), method='post',
+            data=data, status=302)
+        self.assertEqual(Revision.objects.filter(notes='Edited').count(), self.documents // 2)
+
+    def test_revision_edit(self):
+        revision = self.transmittal.revisions.first()
+        self.assertQueryBudget(1, reverse('vds:revision_edit', args=(revision.id,)), status=302)
+
+    def test_transmittal_new(self):
+        self.assertQueryBudget(13, reverse('vds:transmittal_new', args=(self.project.id,)),
+                               status=200)
+
+    def test_transmittal_delete(self):
+        # revision count (background threshold), statistics aggregates,
+        # affected documents before and after pointing them back at their
+        # latest remaining revision, one set-based delete per table
+        self.assertQueryBudget(
+            13, reverse('vds:transmittal_delete', args=(self.transmittal.id,)), method='post',
+            status=302)
+
+    def test_transmittal_add(self):
+        self.assertQueryBudget(0, reverse('vds:transmittal_add'), status=302)
+
+    def test_transmittal_download(self):
+        response = self.assertQueryBudget(
+            1, reverse('vds:transmittal_download', args=(self.transmittal.id,)), status=200)
+        with self.assertMaxQueries(1):
+            b''.join(response.streaming_content)
+
+    def test_transmittal_comments(self):
+        url = reverse('vds:transmittal_comments', args=(self.transmittal.id,))
+        # transmittal, stored reviews
+        self.assertQueryBudget(2, url, status=200)
+        sheet = 'Document number,Revision,Review code\n' + ''.join(
+            f'{d.document_number},0,A\n' for d in self.docs)
+        # transmittal, revisions, savepoint, bulk update, version, release, stored reviews
+        response = self.assertQueryBudget(
+            7, url, method='post', status=200,
+            data={'sheet': SimpleUploadedFile('sheet.csv', sheet.encode())})
+        self.assertEqual(response.context['result'].updated, self.documents)
+
+    def test_transmittal_finalise(self):
+        # locked transmittal, existing snapshot, revisions, snapshot insert
+        # and version, inside a transaction
+        self.assertQueryBudget(
+            8, reverse('vds:transmittal_finalise', args=(self.transmittal.id,)), method='post',
+            status=302)
+
+    def test_portfolio(self):
+        caching.get_cache().clear()
+        self.assertQueryBudget(3, reverse('vds:portfolio'), status=200)
+        # then served from the cache
+        self.assertQueryBudget(0, reverse('vds:portfolio'), data={'format': 'csv'}, status=200)
+
+    def test_job_status(self):
+        job = jobs.enqueue('delete_transmittal', transmittal_id=self.transmittal.id)
+        self.assertQueryBudget(1, reverse('vds:job_status', args=(job.id,)), status=200)
+
+    def test_job_download(self):
+        files = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, files, ignore_errors=True)
+        with override_settings(VDS_JOB_FILES_DIR=files):
+            (jobs.files_dir() / 'export.csv').write_text('a,b\n')
+            job = Job.objects.create(kind='export_register', params={}, state=Job.DONE,
+                                     result={'file': 'export.csv', 'filename': 'WA-Q.csv'})
+            response = self.assertQueryBudget(
+                1, reverse('vds:job_download', args=(job.id,)), status=200)
+            self.assertEqual(b''.join(response.streaming_content), b'a,b\n')
+
+    def test_request_stats(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'a@example.com', 'pw'))
+        # session and user for the staff check
+        self.assertQueryBudget(2, reverse('vds:request_stats'), status=200)
+
+    def assertApiBudget(self, budget, name, args=(), body=None, status=200):
+        url = reverse(f'vds:{name}', args=args)
+        with self.assertMaxQueries(budget):
+            if body is None:
+                response = self.client.get(url)
+            else:
+                response = self.client.post(url, json.dumps(body), content_type='application/json')
+        self.assertEqual(response.status_code, status)
+        return response
+
+    def test_api_project_list(self):
+        self.assertApiBudget(1, 'api_project_list')
+
+    def test_api_project_detail(self):
+        self.assertApiBudget(1, 'api_project_detail', (self.project.id,))
+
+    def test_api_document_list(self):
+        response = self.assertApiBudget(2, 'api_document_list', (self.project.id,))
+        self.assertEqual(len(response.json()['results']), self.documents)
+
+    def test_api_document_batch(self):
+        self.client.force_login(User.objects.create_user('staff', password='pw', is_staff=True))
+        # session and user for the staff check, then the batch
+        self.assertApiBudget(
+            11, 'api_document_batch', (self.project.id,),
+            body={'update': [{'id': d.id, 'vds_status': 'Hold'} for d in self.docs]})
+
+    def test_api_document_detail(self):
+        self.assertApiBudget(1, 'api_document_detail', (self.docs[0].id,))
+
+    def test_api_document_revisions(self):
+        self.assertApiBudget(2, 'api_document_revisions', (self.docs[0].id,))
+
+    def test_api_transmittal_list(self):
+        self.assertApiBudget(2, 'api_transmittal_list', (self.project.id,))
+
+    def test_api_transmittal_detail(self):
+        self.assertApiBudget(1, 'api_transmittal_detail', (self.transmittal.id,))
+
+    def test_api_transmittal_revisions(self):
+        response = self.assertApiBudget(2, 'api_transmittal_revisions', (self.transmittal.id,))
+        self.assertEqual(len(response.json()['results']), self.documents)
+
+    def test_api_issue(self):
+        self.client.force_login(User.objects.create_user('staff', password='pw', is_staff=True))
+        self.assertApiBudget(26, 'api_issue', (self.project.id,), status=201,
+                             body={'documents': [d.id for d in self.docs]})
+
+    def test_every_view_has_a_budget(self):
+        # a test named after the URL, e.g. test_document_list or test_document_list_issue
+        tests = [name for name in dir(self) if name.startswith('test_')]
+        missing = [pattern.name for pattern in urls.urlpatterns
+                   if isinstance(pattern, URLPattern)
+                   and not any(name.startswith(f'test_{pattern.name}') for name in tests)]
+        self.assertEqual(missing, [])
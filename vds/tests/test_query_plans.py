@@ -0,0 +1,86 @@
+from django.db import connection
+from django.db.models import OuterRef, Subquery
+from django.test import TestCase
+import datetime
+
+from vds.digest import due_queryset
+from vds.models import Document, Revision, Transmittal, TransmittalSequence
+from vds.pagination import _seek
+from vds.tests.helpers import create_documents, create_project
+
+
+class HotQueryPlanTests(TestCase):
+    """The hot queries must be answered from an index.
+
+    Each query is EXPLAINed and fails on a full table scan or a sort the
+    index should have made unnecessary (SQLite `SCAN table` / `USE TEMP
+    B-TREE`, PostgreSQL `Seq Scan` / `Sort`). On PostgreSQL sequential scans
+    are disabled for the check, since the test tables are tiny.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = create_project('WA-PLAN')
+        cls.docs = create_documents(cls.project, 20)
+        cls.transmittal = cls.project.transmittals.create(
+            number='TR-001', source='HOUSE', date_sent=datetime.date(2025, 1, 1))
+        Revision.objects.bulk_create([
+            Revision(transmittal=cls.transmittal, document=d, revision_number='0',
+                     date=datetime.date(2025, 1, 1), purpose='IFR')
+            for d in cls.docs
+        ])
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertIndexed(self, queryset):
+        plan = queryset.explain()
+        if connection.vendor == 'sqlite':
+            for line in plan.splitlines():
+                detail = line.split(' ', 3)[-1]
+                self.assertNotIn('USE TEMP B-TREE', detail, plan)
+                if detail.startswith('SCAN ') and 'USING' not in detail:
+                    self.fail(f"full table scan:\n{plan}")
+        elif connection.vendor == 'postgresql':
+            self.assertNotIn('Seq Scan', plan)
+            self.assertNotIn('Sort', plan)
+        return plan
+
+    def test_first_transmittal_of_project(self):
+        self.assertIndexed(self.project.transmittals.order_by('date_sent', 'id')[:1])
+
+    def test_latest_transmittal_per_source(self):
+        self.assertIndexed(self.project.transmittals.filter(source='HOUSE')
+                           .order_by('-date_sent', '-id')[:1])
+
+    def test_sequence_lookup(self):
+        self.assertIndexed(TransmittalSequence.objects.filter(project=self.project,
+                                                              source='HOUSE'))
+
+    def test_latest_revision_of_document(self):
+        self.assertIndexed(Revision.objects.filter(document=self.docs[0])
+                           .order_by('-date', '-id')[:1])
+
+    def test_latest_revision_subquery(self):
+        latest = Revision.objects.filter(document=OuterRef('pk')).order_by('-date', '-id')
+        self.assertIndexed(Document.objects.filter(pk__in=[d.pk for d in self.docs[:5]])
+                           .annotate(prepared=Subquery(latest.values('prepared_by')[:1])))
+
+    def test_recent_transmittals(self):
+        self.assertIndexed(Transmittal.objects.order_by('-date_sent', '-id')[:10])
+
+    def test_document_list_first_page(self):
+        self.assertIndexed(self.project.documents.order_by('document_number', 'id')[:101])
+
+    def test_document_list_next_page(self):
+        seek = _seek(('document_number', 'id'), ['WA-PLAN-000010', self.docs[10].id], 'gt')
+        self.assertIndexed(self.project.documents.filter(seek)
+                           .order_by('document_number', 'id')[:101])
+
+    def test_transmittal_revisions(self):
+        self.assertIndexed(self.transmittal.revisions.order_by('document'))
+
+    def test_due_digest(self):
+        self.assertIndexed(due_queryset(datetime.date(2025, 1, 1), 14))
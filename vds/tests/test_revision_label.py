@@ -1,7 +1,7 @@
 import unittest
 
 from vds.models import Document
-from vds.utils import _increment_numeric, _increment_alpha
+from vds.utils import _increment_numeric, _increment_alpha, next_revision_labels
 
 
 class DummyDocument:
@@ -31,6 +31,12 @@ class TestRevisionLabelSimple(unittest.TestCase):
         # when no revision_number is set, the method now returns '0'
         self.assertEqual(result, '0')
 
+    def test_batch_labels_match_single_document_rule(self):
+        labels = ['01', None, 'A', '', 'B2', '09', 'Z', '-x', 'A']
+        expected = [Document.revision_next(DummyDocument(label)) for label in labels]
+        self.assertEqual(next_revision_labels(labels), expected)
+        self.assertEqual(next_revision_labels(iter(['8', '8'])), ['9', '9'])
+
 
 if __name__ == '__main__':
     unittest.main()
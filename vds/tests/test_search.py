@@ -0,0 +1,77 @@
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from vds.models import Document
+from vds.search import search_documents
+from vds.tests.helpers import create_project
+
+
+class DocumentSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.p1 = create_project('WA-S1')
+        cls.p2 = create_project('WA-S2')
+        cls.pump = Document.objects.create(
+            project=cls.p1, title='Centrifugal pump datasheet', stub='P', discipline='MECH',
+            document_number='NPP-100-MEC-0042', client_number='CL-778812',
+            supplier_number='SUP-99-1234')
+        cls.valve = Document.objects.create(
+            project=cls.p1, title='Valve list', stub='V', discipline='MECH',
+            document_number='NPP-100-PIP-0007', supplier_number='SUP-99-5678')
+        cls.other = Document.objects.create(
+            project=cls.p2, title='Pump foundation drawing', stub='F', discipline='CIV',
+            document_number='XYZ-200-CIV-0042')
+
+    def test_partial_numbers_match(self):
+        self.assertEqual(search_documents('778812'), [self.pump])
+        self.assertEqual(search_documents('99-56'), [self.valve])
+        self.assertEqual(set(search_documents('0042')), {self.pump, self.other})
+
+    def test_title_match_is_case_insensitive(self):
+        self.assertEqual(set(search_documents('PUMP')), {self.pump, self.other})
+
+    def test_all_fragments_must_match(self):
+        self.assertEqual(search_documents('pump 0042 MEC'), [self.pump])
+
+    def test_project_filter(self):
+        self.assertEqual(search_documents('pump', project_id=self.p2.id), [self.other])
+
+    def test_number_hits_rank_above_title_hits(self):
+        Document.objects.create(project=self.p1, title='Spare parts for NPP-100 items',
+                                stub='S', discipline='MECH', document_number='ZZZ-1')
+        results = search_documents('npp-100')
+        self.assertEqual(results[-1].document_number, 'ZZZ-1')
+
+    def test_index_follows_updates_and_deletes(self):
+        self.valve.document_number = 'RENUMBERED-1'
+        self.valve.save()
+        self.assertEqual(search_documents('PIP-0007'), [])
+        self.assertEqual(search_documents('RENUMBERED'), [self.valve])
+        self.valve.delete()
+        self.assertEqual(search_documents('RENUMBERED'), [])
+
+    def test_short_fragments_are_ignored(self):
+        self.assertEqual(search_documents('42'), [])
+
+    def test_pagination(self):
+        self.assertEqual(len(search_documents('NPP', limit=1)), 1)
+        self.assertEqual(search_documents('NPP', limit=1, offset=5), [])
+
+    def test_uses_the_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("FTS5 table is SQLite specific")
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN SELECT rowid FROM vds_document_search "
+                           "WHERE vds_document_search MATCH '\"0042\"'")
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn('VIRTUAL TABLE INDEX', plan)
+
+    def test_view(self):
+        url = reverse('vds:document_search')
+        # project + ranked ids + rows + project choices
+        with self.assertNumQueries(4):
+            response = self.client.get(url, {'q': 'pump', 'project': self.p1.id})
+        self.assertContains(response, 'NPP-100-MEC-0042')
+        self.assertNotContains(response, 'XYZ-200-CIV-0042')
+        self.assertContains(self.client.get(url, {'q': 'ab'}), 'at least 3 characters')
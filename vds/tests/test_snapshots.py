@@ -0,0 +1,86 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from vds import snapshots
+from vds.models import Revision, TransmittalSnapshot
+
+from .helpers import create_documents, create_project
+
+
+class TransmittalSnapshotTests(TestCase):
+    def setUp(self):
+        self.project = create_project('WA-SNAP')
+        self.docs = create_documents(self.project, 3)
+        self.transmittal = self.project.create_transmittal()
+        self.transmittal.issue_documents([d.id for d in self.docs])
+        Revision.objects.filter(transmittal=self.transmittal).update(prepared_by='AB')
+        self.details = reverse('vds:transmittal_details', args=(self.transmittal.id,))
+        self.download = reverse('vds:transmittal_download', args=(self.transmittal.id,))
+
+    def finalise(self):
+        response = self.client.post(reverse('vds:transmittal_finalise', args=(self.transmittal.id,)))
+        self.assertRedirects(response, self.details)
+        return TransmittalSnapshot.objects.get(pk=self.transmittal.id)
+
+    def test_finalised_page_is_served_from_the_snapshot(self):
+        live = self.client.get(self.details).content.decode()
+        self.assertIn('Finalise', live)
+        snapshot = self.finalise()
+        self.assertEqual(len(snapshot.data['rows']), 3)
+
+        # project version (ETag) and the snapshot joined to the transmittal
+        with self.assertNumQueries(2):
+            response = self.client.get(self.details)
+        self.assertContains(response, 'WA-SNAP-000000 - ST')
+        self.assertContains(response, 'Finalised')
+        self.assertNotContains(response, 'id="grid-form"')
+
+        # later edits of the live rows do not change what was sent
+        Revision.objects.filter(transmittal=self.transmittal).update(prepared_by='ZZ')
+        self.assertNotContains(self.client.get(self.details), 'ZZ')
+
+    def test_page_rendered_from_data_matches_stored_html(self):
+        snapshot = self.finalise()
+        with override_settings(VDS_SNAPSHOT_HTML=False):
+            snapshots.reopen(self.transmittal)
+            self.finalise()
+        self.assertEqual(TransmittalSnapshot.objects.get().html, '')
+        self.assertEqual(self.client.get(self.details).content.decode(), snapshot.html)
+
+    def test_download(self):
+        response = self.client.get(self.download)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], ','.join(snapshots.TRANSMITTAL_HEADER))
+        self.assertEqual(len(lines), 4)
+
+        self.finalise()
+        Revision.objects.filter(transmittal=self.transmittal).delete()
+        with self.assertNumQueries(1):
+            response = self.client.get(self.download)
+            content = b''.join(response.streaming_content).decode()
+        self.assertIn(f'WA-SNAP-000001,ST,0,{datetime.date.today().isoformat()},', content)
+        self.assertIn(f'{self.transmittal.number}.csv', response['Content-Disposition'])
+
+    def test_reopen_drops_the_snapshot(self):
+        self.finalise()
+        etag = self.client.get(self.details)['ETag']
+        self.assertEqual(self.client.post(
+            reverse('vds:transmittal_delete', args=(self.transmittal.id,))).status_code, 409)
+
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(admin)
+        self.client.post(reverse('admin:vds_transmittal_changelist'),
+                         {'action': 'reopen', '_selected_action': [self.transmittal.id]})
+        self.assertFalse(TransmittalSnapshot.objects.exists())
+        response = self.client.get(self.details)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertContains(response, 'id="grid-form"')
+
+    def test_finalise_is_idempotent_and_post_only(self):
+        first = self.finalise()
+        self.assertEqual(snapshots.finalise(self.transmittal).finalised_at, first.finalised_at)
+        self.assertEqual(self.client.get(
+            reverse('vds:transmittal_finalise', args=(self.transmittal.id,))).status_code, 405)
@@ -0,0 +1,130 @@
+import datetime
+import io
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+
+from vds import stats
+from vds.importer import import_register
+from vds.models import Document, ProjectStats, Revision
+
+from .helpers import create_documents, create_project
+
+
+class ProjectStatsTests(TestCase):
+    def setUp(self):
+        self.project = create_project('WA-S')
+        self.other = create_project('WA-O')
+
+    def assertNoDrift(self):
+        self.assertEqual(stats.drift(), {})
+
+    def _document(self, number, **fields):
+        return Document.objects.create(project=self.project, title=number, stub='ST',
+                                       discipline='MECH', document_number=number, **fields)
+
+    def test_document_writes_update_counters(self):
+        doc = self._document('S-1', penalty=True, next_due=datetime.date(2025, 1, 10))
+        self._document('S-2', vds_status='Hold')
+        self.assertNoDrift()
+
+        doc.vds_status = 'Hold'
+        doc.next_due = datetime.date(2025, 2, 1)
+        doc.latest_issue = datetime.date(2025, 1, 5)
+        doc.save()
+        self.assertNoDrift()
+
+        doc.project = self.other
+        doc.save(update_fields=['project'])
+        self.assertNoDrift()
+
+        # updates of unrelated fields do not touch the counters (only the
+        # project version is bumped)
+        with self.assertNumQueries(2):
+            doc.save(update_fields=['title'])
+
+        doc.delete()
+        self.assertNoDrift()
+
+    def test_revision_writes_update_counters(self):
+        doc = self._document('S-1', priority=True)
+        transmittal = self.project.create_transmittal()
+        Revision.revision_new(transmittal.id, doc.id)
+        self.assertNoDrift()
+
+        revision = doc.revisions.get()
+        revision.date = datetime.date(2024, 6, 1)
+        revision.save()
+        self.assertNoDrift()
+
+        revision.delete()
+        self.assertNoDrift()
+
+    def test_issue_documents_updates_counters(self):
+        create_documents(self.project, 5, penalty=True, milestone=True)
+        stats.rebuild()
+        transmittal = self.project.create_transmittal()
+        transmittal.issue_documents(list(self.project.documents.values_list('id', flat=True)))
+        self.assertNoDrift()
+        summary = stats.dashboard(self.project)
+        self.assertEqual(summary['issued_this_month'], 5)
+        self.assertEqual(summary['outstanding'], {'penalty': 0, 'milestone': 0, 'priority': 0})
+
+    def test_bulk_deletes_update_counters(self):
+        docs = create_documents(self.project, 6, next_due=datetime.date(2025, 3, 1))
+        stats.rebuild()
+        transmittal = self.project.create_transmittal()
+        transmittal.issue_documents([d.id for d in docs])
+        self.client.post(reverse('vds:document_list', args=(self.project.id,)),
+                         {'action': 'delete', 'selected': [docs[0].id, docs[1].id]})
+        self.assertNoDrift()
+
+        self.client.post(reverse('vds:transmittal_delete', args=(transmittal.id,)))
+        self.assertNoDrift()
+
+        self.project.delete()
+        self.assertFalse(ProjectStats.objects.filter(project_id=self.project.id).exists())
+        self.assertNoDrift()
+
+    def test_import_updates_counters(self):
+        csv = ("document_number,title,stub,discipline,next_due,penalty\n"
+               "IMP-1,One,ST,MECH,2025-01-01,True\n"
+               "IMP-2,Two,ST,MECH,,False\n")
+        import_register(self.project, io.StringIO(csv))
+        self.assertNoDrift()
+        import_register(self.project, io.StringIO(csv.replace('IMP', 'DRY')), dry_run=True)
+        self.assertNoDrift()
+        self.assertEqual(stats.dashboard(self.project)['documents'], 2)
+
+    def test_dashboard_reads_only_the_stats_table(self):
+        today = datetime.date(2025, 5, 15)
+        self._document('S-1', next_due=datetime.date(2025, 5, 1))
+        self._document('S-2', next_due=datetime.date(2025, 5, 20), milestone=True)
+        self._document('S-3', next_due=datetime.date(2025, 9, 1), vds_status='Hold')
+        with self.assertNumQueries(1):
+            summary = stats.dashboard(self.project, today=today)
+        self.assertEqual(summary['documents'], 3)
+        self.assertEqual(summary['by_status'], {'Active': 2, 'Hold': 1})
+        self.assertEqual(summary['overdue'], 1)
+        self.assertEqual(summary['due_soon'], 1)
+        self.assertEqual(summary['outstanding']['milestone'], 1)
+
+    def test_project_details_shows_dashboard(self):
+        self._document('S-1')
+        response = self.client.get(reverse('vds:project_details', args=(self.project.id,)))
+        self.assertContains(response, 'Documents: 1')
+
+    def test_rebuild_stats_command(self):
+        create_documents(self.project, 3)
+        out = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_stats', '--check', stdout=out)
+        self.assertIn('documents/total: stored 0, actual 3', out.getvalue())
+
+        call_command('rebuild_stats', 'WA-S', stdout=io.StringIO())
+        self.assertNoDrift()
+        call_command('rebuild_stats', '--check', stdout=io.StringIO())
+        with self.assertRaises(CommandError):
+            call_command('rebuild_stats', 'WA-MISSING', stdout=io.StringIO())
@@ -0,0 +1,89 @@
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase
+import datetime
+import threading
+
+from vds.models import Transmittal, TransmittalSequence
+
+from .helpers import create_project
+
+
+class TransmittalSequenceTests(TestCase):
+    def test_sequence_continues_existing_numbering(self):
+        p = create_project('WA-S')
+        p.transmittals.create(number='DOC-009A', source='S1', date_sent=datetime.date(2025, 1, 1))
+        self.assertEqual(p.create_transmittal('S1').number, 'DOC-010A')
+        self.assertEqual(p.create_transmittal('S1').number, 'DOC-011A')
+        seq = TransmittalSequence.objects.get(project=p, source='S1')
+        self.assertEqual((seq.prefix, seq.width, seq.value, seq.suffix), ('DOC-', 3, 11, 'A'))
+
+    def test_padding_grows_past_width(self):
+        p = create_project('WA-S')
+        p.transmittals.create(number='T99', source='S2', date_sent=datetime.date(2025, 1, 1))
+        self.assertEqual(p.create_transmittal('S2').number, 'T100')
+
+    def test_sources_and_projects_are_independent(self):
+        p1 = create_project('WA-S1')
+        p2 = create_project('WA-S2')
+        p1.transmittals.create(number='P1-005', source='A', date_sent=datetime.date(2025, 1, 1))
+        self.assertEqual(p1.create_transmittal('A').number, 'P1-006')
+        self.assertEqual(p1.create_transmittal('B').number, 'WA-S1-B-001')
+        self.assertEqual(TransmittalSequence.allocate(p2, 'A'), 'WA-S2-A-001')
+
+    def test_numbers_are_unique_across_projects_and_sources(self):
+        p1 = create_project('WA-S3')
+        p2 = create_project('WA-S4')
+        created = [p1.create_transmittal('A'), p1.create_transmittal('B'),
+                   p2.create_transmittal('A'), p2.create_transmittal('A')]
+        self.assertEqual([t.number for t in created],
+                         ['WA-S3-A-001', 'WA-S3-B-001', 'WA-S4-A-001', 'WA-S4-A-002'])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            p2.transmittals.create(number='WA-S3-A-001', source='A',
+                                   date_sent=datetime.date(2025, 1, 1))
+
+    def test_allocation_does_not_scan_transmittals(self):
+        p = create_project('WA-S')
+        p.create_transmittal('S3')
+        # UPDATE + SELECT of the sequence row, inside a savepoint
+        with self.assertNumQueries(4):
+            TransmittalSequence.allocate(p, 'S3')
+
+
+class TransmittalSequenceConcurrencyTests(TransactionTestCase):
+    """Concurrent writers must never receive the same number.
+
+    Threads only wait on each other's locks with a file-based SQLite test
+    database (see DATABASES['default']['TEST']) or a server backend.
+    """
+    writers = 8
+    per_writer = 10
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("in-memory SQLite cannot serialise concurrent writers")
+
+    def test_concurrent_writers_get_distinct_numbers(self):
+        p = create_project('WA-S')
+        errors = []
+        barrier = threading.Barrier(self.writers)
+
+        def writer():
+            try:
+                barrier.wait()
+                for _ in range(self.per_writer):
+                    p.create_transmittal('CONC')
+            except Exception as exc:  # pragma: no cover - reported below
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=writer) for _ in range(self.writers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        numbers = list(Transmittal.objects.filter(source='CONC').values_list('number', flat=True))
+        self.assertEqual(len(numbers), self.writers * self.per_writer)
+        self.assertEqual(len(set(numbers)), len(numbers))
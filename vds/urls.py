@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = 'vds'
 urlpatterns = [
@@ -8,6 +8,12 @@ urlpatterns = [
          views.project_details, name='project_details'),
     path('document/<int:project_id>/list/',
          views.document_list, name='document_list'),
+    path('document/<int:project_id>/export/',
+         views.document_export, name='document_export'),
+    path('document/<int:project_id>/import/',
+         views.document_import, name='document_import'),
+    path('document/search/',
+         views.document_search, name='document_search'),
     path('document/<int:document_id>/details/',
          views.document_details, name='document_details'),
     path('revision/<int:revision_id>/edit/',
@@ -20,6 +26,44 @@ urlpatterns = [
          views.transmittal_new, name='transmittal_new'),
     path('transmittal/add/',
          views.transmittal_add, name='transmittal_add'),    
+    path('transmittal/<int:transmittal_id>/download/',
+         views.transmittal_download, name='transmittal_download'),
+    path('transmittal/<int:transmittal_id>/grid/',
+         views.transmittal_grid, name='transmittal_grid'),
+    path('transmittal/<int:transmittal_id>/comments/',
+         views.transmittal_comments, name='transmittal_comments'),
+    path('transmittal/<int:transmittal_id>/finalise/',
+         views.transmittal_finalise, name='transmittal_finalise'),
     path('transmittal/<int:transmittal_id>/delete/',
          views.transmittal_delete, name='transmittal_delete'),
+    path('portfolio/',
+         views.portfolio_report, name='portfolio'),
+    path('job/<int:job_id>/',
+         views.job_status, name='job_status'),
+    path('job/<int:job_id>/download/',
+         views.job_download, name='job_download'),
+    path('stats/requests/',
+         views.request_stats_view, name='request_stats'),
+
+    # JSON API (vds.api)
+    path('api/v1/projects/',
+         api.project_list, name='api_project_list'),
+    path('api/v1/projects/<int:project_id>/',
+         api.project_detail, name='api_project_detail'),
+    path('api/v1/projects/<int:project_id>/documents/',
+         api.document_list, name='api_document_list'),
+    path('api/v1/projects/<int:project_id>/documents/batch/',
+         api.document_batch, name='api_document_batch'),
+    path('api/v1/projects/<int:project_id>/transmittals/',
+         api.transmittal_list, name='api_transmittal_list'),
+    path('api/v1/projects/<int:project_id>/issue/',
+         api.issue, name='api_issue'),
+    path('api/v1/documents/<int:document_id>/',
+         api.document_detail, name='api_document_detail'),
+    path('api/v1/documents/<int:document_id>/revisions/',
+         api.document_revisions, name='api_document_revisions'),
+    path('api/v1/transmittals/<int:transmittal_id>/',
+         api.transmittal_detail, name='api_transmittal_detail'),
+    path('api/v1/transmittals/<int:transmittal_id>/revisions/',
+         api.transmittal_revisions, name='api_transmittal_revisions'),
 ]
\ No newline at end of file
@@ -29,3 +29,36 @@ def _increment_alpha(alpha: str) -> str:
         else:
             newrev.append(chr(ord(ch) + 1))
     return ''.join(newrev)
+
+
+_LABEL_RE = re.compile(r'^([0-9]+|[A-Za-z]+)')
+
+
+def next_revision_label(label: str | None) -> str:
+    """Return the revision label following `label`.
+
+    '0' when there is no label yet; otherwise the leading numeric or
+    alphabetic group is incremented with `_increment_numeric` or
+    `_increment_alpha` (anything after it is dropped). A label starting
+    with neither is returned unchanged.
+    """
+    if not label:
+        return '0'
+    m = _LABEL_RE.match(label)
+    if not m:
+        return label
+    rev = m.group(1)
+    if rev.isdigit():
+        return _increment_numeric(rev)
+    return _increment_alpha(rev)
+
+
+def next_revision_labels(labels) -> list[str]:
+    """Batch form of `next_revision_label`, in the order of `labels`.
+
+    A register holds few distinct labels, so each one is incremented once
+    and the result shared by every document carrying it.
+    """
+    labels = list(labels)
+    following = {label: next_revision_label(label) for label in set(labels)}
+    return [following[label] for label in labels]
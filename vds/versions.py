@@ -0,0 +1,115 @@
+"""Per-project change versions and the conditional GETs they drive.
+
+Every write to a project, its documents, transmittals or revisions bumps
+the project's ProjectVersion (see the handlers in vds.signals and the bulk
+paths, which call `touch`). Pages of one project decorated with
+`conditional_on_project` then carry a strong ETag built from that version,
+and its change time as Last-Modified; a request whose If-None-Match (or
+If-Modified-Since) still matches gets a 304 after one query on the version
+table, without the view running at all.
+
+Bulk paths wrap their work in `batch()`, which bumps each touched project
+once on exit.
+"""
+import hashlib
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .models import ProjectVersion
+
+_local = threading.local()
+
+
+@contextmanager
+def batch():
+    """Collect the projects touched inside the block and bump them on exit.
+
+    Nested batches join the outermost one; nothing is bumped when the block
+    raises or the surrounding transaction is marked for rollback.
+    """
+    if getattr(_local, 'pending', None) is not None:
+        yield
+        return
+    _local.pending = set()
+    try:
+        yield
+        pending = _local.pending
+    finally:
+        _local.pending = None
+    if not (transaction.get_connection().in_atomic_block and transaction.get_rollback()):
+        _bump(pending)
+
+
+def touch(*project_ids):
+    """Bump the version of the given projects, now or at the end of the batch."""
+    ids = {pk for pk in project_ids if pk is not None}
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        pending.update(ids)
+    else:
+        _bump(ids)
+
+
+def _bump(project_ids):
+    if project_ids:
+        ProjectVersion.objects.filter(project_id__in=project_ids).update(
+            version=F('version') + 1, changed_at=timezone.now())
+
+
+def _etag(project_id, version, request, vary_on_csrf: bool) -> str:
+    tag = f'{project_id}.{version}'
+    if vary_on_csrf:
+        # pages with forms embed a token tied to the CSRF cookie
+        cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+        tag += '.' + hashlib.md5(cookie.encode(), usedforsecurity=False).hexdigest()[:12]
+    return f'"{tag}"'
+
+
+def conditional_on_project(version_queryset, vary_on_csrf: bool = False):
+    """Decorate an async view of one project's data with ETag/Last-Modified.
+
+    `version_queryset(**view_kwargs)` returns a queryset whose first row of
+    `values_list(project_id, version, changed_at)` gives the version of
+    the page; an empty result (unknown object) runs the view unchanged,
+    which then answers 404. Responses are marked `private, no-cache`, so
+    browsers always revalidate them.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await view(request, *args, **kwargs)
+            row = await version_queryset(**kwargs).afirst()
+            if row is None:
+                return await view(request, *args, **kwargs)
+            project_id, version, changed_at = row
+            etag = _etag(project_id, version, request, vary_on_csrf)
+            last_modified = int(changed_at.timestamp())
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response.headers.setdefault('ETag', etag)
+                response.headers.setdefault('Last-Modified', http_date(last_modified))
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return inner
+    return decorator
+
+
+def project_version(project_id):
+    return ProjectVersion.objects.filter(project_id=project_id).values_list(
+        'project_id', 'version', 'changed_at')
+
+
+def transmittal_project_version(transmittal_id):
+    return ProjectVersion.objects.filter(project__transmittals=transmittal_id).values_list(
+        'project_id', 'version', 'changed_at')
@@ -1,13 +1,65 @@
-from django.http import HttpResponse, HttpResponseRedirect
+import io
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import IntegrityError, transaction
+from django.http import (FileResponse, Http404, HttpResponse, HttpResponseRedirect, JsonResponse,
+                         StreamingHttpResponse)
 from django.urls import reverse
-from django.shortcuts import render, get_object_or_404
+from django.shortcuts import aget_object_or_404, get_object_or_404, render
+
+from . import (caching, comments, deletion, export, grid, importer, jobs, portfolio, preview, search,
+               snapshots, stats, versions)
+from .middleware import request_stats
+from .models import Job, Project, Revision, Transmittal, TransmittalSnapshot
+from .pagination import InvalidCursor, akeyset_paginate
+
+# Columns displayed by vds/document_list.html; nothing else is loaded.
+DOCUMENT_LIST_FIELDS = ('id', 'revision_number', 'latest_issue', 'stub', 'document_number')
+DOCUMENT_LIST_ORDERING = ('document_number', 'id')
+# Columns displayed by vds/transmittal_details.html for each revision.
+TRANSMITTAL_REVISION_FIELDS = (
+    'id', 'transmittal_id', 'revision_number', 'date', 'purpose', 'prepared_by',
+    'reviewed_by', 'approved_by', 'notes', 'review_code', 'client_reviewer',
+    'document__document_number', 'document__stub',
+)
+
+
+def _page_size(request) -> int:
+    """Return the requested page size, clamped to the configured maximum."""
+    default = getattr(settings, 'VDS_PAGE_SIZE', 100)
+    maximum = getattr(settings, 'VDS_MAX_PAGE_SIZE', 1000)
+    try:
+        size = int(request.GET.get('page_size', default))
+    except ValueError:
+        size = default
+    return max(1, min(size, maximum))
+
 
-from .models import Project, Document, Revision, Transmittal
+def _selected_document_ids(request, project) -> list[int]:
+    """Return the document IDs an action on `document_list` applies to.
+
+    With `select_all_matching` posted, every document of the project is
+    selected on the server (not only the rows rendered on the current
+    page); otherwise the posted `selected` checkboxes are used.
+    """
+    if request.POST.get('select_all_matching'):
+        return list(project.documents.values_list('id', flat=True))
+    selected = request.POST.getlist('selected')
+    # normalize to ints
+    return [int(x) for x in selected if x.isdigit()]
 
 
 
 # Create your views here.
-def index(request):
+#
+# The read-only pages (index, project details, the document list GET,
+# transmittal list and details) are async views using the async ORM, so
+# under ASGI a request waiting on the database does not hold a worker
+# thread. Views that write stay synchronous.
+
+async def index(request):
     '''
     Home page of site.
     Displays a list of the latest projects set up.
@@ -16,12 +68,24 @@ def index(request):
     A couple of buttons will be added, for creating a new project or a new
     transmittal, as well as de-activating a project.
     A project cannot formally be deleted.
+    Both lists are rendered as fragments cached until a Project or
+    Transmittal is written (see vds.caching).
     '''
-    latest_project_list = Project.objects.order_by("-wa_number")[:5]
-    recent_transmittals = Transmittal.objects.order_by('-date_sent')[:10]
+    async def latest_projects():
+        projects = Project.objects.only('id', 'wa_number', 'title').order_by("-wa_number")[:5]
+        return {'latest_project_list': [p async for p in projects]}
+
+    async def recent_transmittals():
+        transmittals = Transmittal.objects.only(
+            'id', 'number', 'date_sent').order_by('-date_sent', '-id')[:10]
+        return {'recent_transmittals': [t async for t in transmittals]}
+
     context = {
-        'latest_project_list': latest_project_list,
-        'recent_transmittals': recent_transmittals,
+        'latest_projects_html': await caching.acached_fragment(
+            caching.LATEST_PROJECTS_KEY, 'vds/_latest_projects.html', latest_projects),
+        'recent_transmittals_html': await caching.acached_fragment(
+            caching.RECENT_TRANSMITTALS_KEY, 'vds/_recent_transmittals.html',
+            recent_transmittals),
     }
     return render(request,'vds/index.html',context)
 
@@ -39,12 +103,16 @@ def vds(request, project_id):
     "as well as the complete VDS for the currently selected project (if any).<BR>" \
     "You will also have a button to create a new project and its respective VDS.")
 
-def project_details(request, project_id):
-    project = get_object_or_404(Project, pk=project_id)
-    return render(request, "vds/project_details.html", {"project": project})
+async def project_details(request, project_id):
+    project = await aget_object_or_404(Project, pk=project_id)
+    return render(request, "vds/project_details.html", {
+        "project": project,
+        "dashboard": await stats.adashboard(project),
+    })
 
 
-def document_list(request, project_id):
+@versions.conditional_on_project(versions.project_version, vary_on_csrf=True)
+async def document_list(request, project_id):
     """List documents for a project, showing latest revision and key fields.
 
     The page supports selecting one or more documents and submitting an action
@@ -52,44 +120,157 @@ def document_list(request, project_id):
     action='delete' by deleting the selected documents and redirecting back.
     Other actions are redirected to the first selected document's details
     page (placeholder behavior).
-    """
-    project = get_object_or_404(Project, pk=project_id)
 
+    Documents are shown in pages ordered by document number, using keyset
+    pagination (`after`/`before` cursors and `page_size` in the query
+    string). Selections are kept across pages by the page script, and
+    `select_all_matching` applies the action to the whole register.
+
+    The GET is served asynchronously, with an ETag/Last-Modified from the
+    project's change version (a refresh of an unchanged register is a 304,
+    see vds.versions); actions run in the synchronous `_document_list_action`.
+    """
     if request.method == 'POST':
-        action = request.POST.get('action')
-        selected = request.POST.getlist('selected')
-        # normalize to ints
-        ids = [int(x) for x in selected if x.isdigit()]
-        if action == 'delete' and ids:
-            # Delete documents and cascade revisions
-            Document.objects.filter(pk__in=ids, project=project).delete()
-            return HttpResponseRedirect(reverse('vds:document_list', args=(project_id,)))
-        if action in ('replace') and ids:
-            # Redirect to first selected document's details as a placeholder
-            return HttpResponseRedirect(reverse('vds:document_details', args=(ids[0],)))
-        if action in ('issue') and ids:
-            transmittal = project.create_transmittal()
-            for doc_id in ids:
-                # create a new revision for this document with the new transmittal
-                Revision.revision_new(transmittal.id, doc_id)
-            # Redirect transmittal details
-            # load related revisions ordered by document number (smallest first)
-            revisions = transmittal.revisions.order_by('document')
-            return render(request, "vds/transmittal_details.html", {"transmittal": transmittal, "revisions": revisions})
-        # Unknown/no-op -> reload
-        return HttpResponseRedirect(reverse('vds:document_list', args=(project_id,)))
+        return await sync_to_async(_document_list_action)(request, project_id)
 
     # GET: show documents
     # Use the revision information already stored on the Document object
     # (Document.revision_number). Do not attempt to compute the latest
     # revision from related Revision objects here; if the field is null,
     # that's acceptable and will be displayed as empty.
-    documents = list(project.documents.all())
-
+    project = await aget_object_or_404(Project, pk=project_id)
+    documents = project.documents.values(*DOCUMENT_LIST_FIELDS)
+    page_size = _page_size(request)
+    try:
+        page = await akeyset_paginate(documents, DOCUMENT_LIST_ORDERING, page_size,
+                                      after=request.GET.get('after'),
+                                      before=request.GET.get('before'))
+    except InvalidCursor:
+        page = await akeyset_paginate(documents, DOCUMENT_LIST_ORDERING, page_size)
 
     return render(request, 'vds/document_list.html', {
         'project': project,
-        'documents': documents,
+        'documents': page.items,
+        'page': page,
+        'total_count': await project.documents.acount(),
+    })
+
+
+def _issue_background_threshold() -> int:
+    return getattr(settings, 'VDS_ISSUE_BACKGROUND_THRESHOLD', 2000)
+
+
+def _document_list_action(request, project_id):
+    """Apply the action posted from `document_list` to the selection."""
+    project = get_object_or_404(Project, pk=project_id)
+    action = request.POST.get('action')
+    ids = _selected_document_ids(request, project)
+    if action == 'delete' and ids:
+        # set-based delete of the documents with their revisions; large
+        # selections are deleted in the background
+        if len(ids) > deletion.background_threshold():
+            job = jobs.enqueue('delete_documents', project_id=project.pk, document_ids=ids)
+            return _job_started(request, job, reverse('vds:document_list', args=(project_id,)))
+        deletion.delete_documents(project, ids)
+        return HttpResponseRedirect(reverse('vds:document_list', args=(project_id,)))
+    if action in ('replace') and ids:
+        # Redirect to first selected document's details as a placeholder
+        return HttpResponseRedirect(reverse('vds:document_details', args=(ids[0],)))
+    if action == 'preview' and ids:
+        # what an issue of the selection would do, without writing anything
+        return render(request, "vds/issue_preview.html", {
+            "project": project,
+            "preview": preview.preview_issue(project, ids),
+            "select_all_matching": bool(request.POST.get('select_all_matching')),
+        })
+    if action in ('issue') and ids and (
+            request.POST.get('background') or len(ids) > _issue_background_threshold()):
+        job = jobs.enqueue('issue', project_id=project.pk, document_ids=ids)
+        return _job_started(request, job, reverse('vds:transmittal_list', args=(project_id,)))
+    if action in ('issue') and ids:
+        # create the transmittal and all its revisions atomically, so a
+        # failure never leaves a half-issued transmittal behind
+        try:
+            with transaction.atomic(), versions.batch():
+                transmittal = project.create_transmittal()
+                transmittal.issue_documents(ids)
+        except IntegrityError:
+            # a new label that already exists (unique_revision_per_document):
+            # the preview shows which documents clash
+            return render(request, "vds/issue_preview.html", {
+                "project": project,
+                "preview": preview.preview_issue(project, ids),
+                "select_all_matching": bool(request.POST.get('select_all_matching')),
+                "error": "Nothing was issued: a new revision label or the transmittal number "
+                         "is already taken.",
+            }, status=409)
+        # Redirect transmittal details
+        revisions = _transmittal_revisions(transmittal)
+        return render(request, "vds/transmittal_details.html", {"transmittal": transmittal, "revisions": revisions})
+    # Unknown/no-op -> reload
+    return HttpResponseRedirect(reverse('vds:document_list', args=(project_id,)))
+
+
+def document_export(request, project_id):
+    """Stream the full VDS register of a project as a spreadsheet.
+
+    Query string options:
+    - `format`: 'csv' (default) or 'xlsx';
+    - `revisions`: when set, append the latest revision metadata of each
+      document.
+    - `background`: when set, the file is written by a background job
+      (vds.jobs) and downloaded from its status page.
+    Rows are streamed from a chunked query, so memory use does not grow
+    with the size of the register.
+    """
+    project = get_object_or_404(Project, pk=project_id)
+    fmt = request.GET.get('format', 'csv')
+    include_revisions = bool(request.GET.get('revisions'))
+    if request.GET.get('background') and fmt in ('csv', 'xlsx'):
+        job = jobs.enqueue('export_register', project_id=project.pk, format=fmt,
+                           revisions=include_revisions)
+        return _job_started(request, job, reverse('vds:document_list', args=(project_id,)))
+    header = export.register_header(include_revisions)
+    rows = export.iter_register_rows(project, include_revisions)
+
+    if fmt == 'xlsx':
+        response = StreamingHttpResponse(
+            export.stream_xlsx(header, rows, sheet_name=project.wa_number),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+    elif fmt == 'csv':
+        response = StreamingHttpResponse(export.stream_csv(header, rows),
+                                         content_type='text/csv')
+    else:
+        return HttpResponse(f"Unknown export format '{fmt}'.", status=400,
+                            content_type='text/plain')
+    response['Content-Disposition'] = f'attachment; filename="{project.wa_number}-vds.{fmt}"'
+    return response
+
+
+def document_import(request, project_id):
+    """Upload a CSV register and bulk import it into the project.
+
+    The uploaded file is decoded and parsed as a stream; conflicting or
+    invalid rows are reported and skipped, the valid ones are created in
+    one transaction. Ticking 'dry run' only reports what would happen;
+    ticking 'in the background' hands the file to a background job.
+    """
+    project = get_object_or_404(Project, pk=project_id)
+    result = None
+    if request.method == 'POST' and request.FILES.get('register'):
+        upload = request.FILES['register']
+        if request.POST.get('background'):
+            job = jobs.enqueue('import_register', project_id=project.pk,
+                               file=jobs.save_upload(upload),
+                               dry_run=bool(request.POST.get('dry_run')))
+            return _job_started(request, job, reverse('vds:document_list', args=(project_id,)))
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        result = importer.import_register(project, stream,
+                                          dry_run=bool(request.POST.get('dry_run')))
+    return render(request, 'vds/document_import.html', {
+        'project': project,
+        'result': result,
     })
 
 
@@ -98,24 +279,125 @@ def document_details(request, document_id):
 
 
 def revision_edit(request, revision_id):
-    revision = Revision.objects.get(pk=revision_id)
+    """Revisions are edited in the grid of their transmittal: go to the row."""
+    revision = get_object_or_404(Revision.objects.only('id', 'transmittal_id'), pk=revision_id)
+    url = reverse("vds:transmittal_details", args=(revision.transmittal_id,))
+    return HttpResponseRedirect(f"{url}#revision-{revision.pk}")
 
-    return render(request, "vds/revision_edit.html", 
-            {
-                "revision": revision,
-            })
 
+@versions.conditional_on_project(versions.project_version)
+async def transmittal_list(request, project_id):
+    project = await aget_object_or_404(Project, pk=project_id)
+    transmittals = [t async for t in project.transmittals.only('id', 'project_id', 'number')]
+    return render(request, "vds/transmittal_list.html",
+                  {"project": project, "transmittals": transmittals})
 
-def transmittal_list(request, project_id):
-    project = get_object_or_404(Project, pk=project_id)
-    return render(request, "vds/transmittal_list.html", {"project": project})
+def _transmittal_revisions(transmittal):
+    """Return the revisions of a transmittal as rendered in its details page.
 
-def transmittal_details(request, transmittal_id):
-    transmittal = get_object_or_404(Transmittal, pk=transmittal_id)
+    The document columns shown next to each revision are joined in the same
+    query, so the page costs the same whatever the number of revisions.
+    """
     # load related revisions ordered by document number (smallest first)
-    revisions = transmittal.revisions.order_by('document')
+    return (
+        transmittal.revisions
+        .select_related('document')
+        .only(*TRANSMITTAL_REVISION_FIELDS)
+        .order_by('document')
+    )
+
+
+# the page holds forms: its CSRF token must not outlive the cookie
+@versions.conditional_on_project(versions.transmittal_project_version, vary_on_csrf=True)
+async def transmittal_details(request, transmittal_id):
+    """Show a transmittal; a finalised one is served from its snapshot."""
+    transmittal = await aget_object_or_404(
+        Transmittal.objects.select_related('project', 'snapshot'), pk=transmittal_id)
+    try:
+        snapshot = transmittal.snapshot
+    except TransmittalSnapshot.DoesNotExist:
+        snapshot = None
+    if snapshot is not None:
+        if snapshot.html:
+            return HttpResponse(snapshot.html)
+        return render(request, "vds/transmittal_details.html", snapshots.context(snapshot))
+    revisions = grid.attach_cells([r async for r in _transmittal_revisions(transmittal)])
     return render(request, "vds/transmittal_details.html", {"transmittal": transmittal, "revisions": revisions})
 
+
+def transmittal_grid(request, transmittal_id):
+    """Save the cells changed in the revision grid of transmittal_details.
+
+    Only the changed cells are posted; they are validated and saved
+    together (vds.grid). If any is invalid nothing is saved and the page
+    is shown again with the posted values and the errors.
+    """
+    if request.method != 'POST':
+        return HttpResponse(status=405)
+    transmittal = get_object_or_404(
+        Transmittal.objects.select_related('project', 'snapshot')
+        .defer('snapshot__data', 'snapshot__html'),
+        pk=transmittal_id)
+    if hasattr(transmittal, 'snapshot'):
+        return HttpResponse("A finalised transmittal must be reopened by an admin before its "
+                            "revisions can be edited.", status=409)
+    cells = grid.parse_cells(request.POST)
+    result = grid.apply_grid_edits(transmittal, cells)
+    if not result.errors:
+        return HttpResponseRedirect(reverse("vds:transmittal_details", args=(transmittal_id,)))
+    revisions = grid.attach_cells(list(_transmittal_revisions(transmittal)), cells, result.errors)
+    return render(request, "vds/transmittal_details.html", {
+        "transmittal": transmittal,
+        "revisions": revisions,
+        "grid_errors": result.errors,
+    })
+
+
+def transmittal_download(request, transmittal_id):
+    """Stream the revisions of a transmittal as CSV, as sent once finalised."""
+    transmittal = get_object_or_404(Transmittal.objects.select_related('snapshot'),
+                                    pk=transmittal_id)
+    try:
+        rows = snapshots.rows(transmittal.snapshot)
+    except TransmittalSnapshot.DoesNotExist:
+        rows = snapshots.live_rows(transmittal.pk).iterator(chunk_size=export.CHUNK_SIZE)
+    response = StreamingHttpResponse(export.stream_csv(snapshots.TRANSMITTAL_HEADER, rows),
+                                     content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{transmittal.number}.csv"'
+    return response
+
+
+def transmittal_comments(request, transmittal_id):
+    """Upload the comment sheet a client returned for this transmittal.
+
+    Review codes, client reviewers and notes are matched to the revisions
+    by document number and revision and saved together (vds.comments);
+    rows that match nothing are listed. Ticking 'dry run' only reports.
+    The page also lists the client review stored for every revision, which
+    the snapshot of a finalised transmittal (the content as sent) lacks.
+    """
+    transmittal = get_object_or_404(Transmittal.objects.select_related('project'),
+                                    pk=transmittal_id)
+    result = None
+    if request.method == 'POST' and request.FILES.get('sheet'):
+        stream = io.TextIOWrapper(request.FILES['sheet'].file, encoding='utf-8-sig', newline='')
+        result = comments.apply_comment_sheet(transmittal, stream,
+                                              dry_run=bool(request.POST.get('dry_run')))
+    return render(request, 'vds/transmittal_comments.html', {
+        'transmittal': transmittal,
+        'result': result,
+        'reviews': comments.reviews(transmittal),
+    })
+
+
+def transmittal_finalise(request, transmittal_id):
+    """Freeze the transmittal into its snapshot (vds.snapshots), then show it."""
+    if request.method != 'POST':
+        return HttpResponse(status=405)
+    transmittal = get_object_or_404(Transmittal, pk=transmittal_id)
+    snapshots.finalise(transmittal)
+    return HttpResponseRedirect(reverse("vds:transmittal_details", args=(transmittal_id,)))
+
 def transmittal_new(request, project_id):
     project = Project.objects.get(pk=project_id)
     transmittal = project.create_transmittal()
@@ -140,9 +422,123 @@ def transmittal_delete(request, transmittal_id):
     if request.method != 'POST':
         return HttpResponse(status=405)
 
-    transmittal = get_object_or_404(Transmittal, pk=transmittal_id)
-    project_id = transmittal.project_id
-    # cascade delete of revisions will occur because Revision FK uses CASCADE
-    transmittal.delete()
-    return HttpResponseRedirect(reverse("vds:transmittal_list", args=(project_id,)))
+    transmittal = get_object_or_404(
+        Transmittal.objects.select_related('snapshot').defer('snapshot__data', 'snapshot__html'),
+        pk=transmittal_id)
+    if hasattr(transmittal, 'snapshot'):
+        return HttpResponse("A finalised transmittal must be reopened by an admin before it "
+                            "can be deleted.", status=409)
+    done_url = reverse("vds:transmittal_list", args=(transmittal.project_id,))
+    # set-based delete of the revisions and the transmittal (vds.deletion);
+    # large transmittals are deleted in the background
+    revisions = transmittal.revisions.count()
+    if revisions > deletion.background_threshold():
+        job = jobs.enqueue('delete_transmittal', transmittal_id=transmittal.pk)
+        return _job_started(request, job, done_url)
+    deletion.delete_transmittal(transmittal)
+    return HttpResponseRedirect(done_url)
+
+
+def portfolio_report(request):
+    """Document and transmittal figures of all active projects (vds.portfolio).
 
+    Served from a short-lived cache; `?format=csv` downloads the same
+    table as CSV.
+    """
+    report = portfolio.report()
+    header = portfolio.csv_header(report)
+    rows = portfolio.csv_rows(report)
+    if request.GET.get('format') == 'csv':
+        response = StreamingHttpResponse(export.stream_csv(header, rows), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="vds-portfolio.csv"'
+        return response
+    return render(request, 'vds/portfolio.html', {
+        'portfolio': report,
+        'header': header,
+        'rows': list(zip(report.projects + [report.totals], rows)),
+        'timeout': getattr(settings, 'VDS_PORTFOLIO_TIMEOUT', 60),
+    })
+
+
+def _job_started(request, job, done_url):
+    return render(request, "vds/job_progress.html", {
+        "job": job,
+        "status_url": reverse("vds:job_status", args=(job.pk,)),
+        "done_url": done_url,
+    }, status=202)
+
+
+def job_status(request, job_id):
+    """State, progress and result of a background job as JSON, for polling.
+
+    Links to what the job produced are added under `links`.
+    """
+    job = Job.objects.filter(pk=job_id).first()
+    if job is None:
+        return JsonResponse({"error": f"job {job_id} not found"}, status=404)
+    data = jobs.status(job)
+    result = job.result or {}
+    links = {}
+    if job.state == Job.DONE and result.get('transmittal_id'):
+        links['transmittal'] = reverse('vds:transmittal_details', args=(result['transmittal_id'],))
+    if job.state == Job.DONE and result.get('file'):
+        links['download'] = reverse('vds:job_download', args=(job.pk,))
+    data['links'] = links
+    return JsonResponse(data)
+
+
+def job_download(request, job_id):
+    """Download the file written by a finished background job."""
+    job = get_object_or_404(Job, pk=job_id, state=Job.DONE)
+    result = job.result or {}
+    path = jobs.files_dir() / result.get('file', '')
+    if not result.get('file') or not path.is_file():
+        raise Http404("This job has no file to download.")
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=result['filename'])
+
+
+
+def document_search(request):
+    """Search documents by number fragments or title, in one or all projects.
+
+    Query string: `q` (fragments of at least three characters), optional
+    `project` (ID), `page` and `page_size`. Results are ranked by the search
+    index, best matches first.
+    """
+    query = request.GET.get('q', '').strip()
+    project = None
+    if request.GET.get('project', '').isdigit():
+        project = get_object_or_404(Project.objects.only('id', 'wa_number', 'title'),
+                                    pk=request.GET['project'])
+    page_size = _page_size(request)
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        page = 1
+    # fetch one extra row to know whether there is a next page
+    results = search.search_documents(query, project.id if project else None,
+                                      limit=page_size + 1, offset=(page - 1) * page_size)
+    return render(request, 'vds/search.html', {
+        'query': query,
+        'project': project,
+        'projects': Project.objects.only('id', 'wa_number').order_by('wa_number'),
+        'results': results[:page_size],
+        'page': page,
+        'page_size': page_size,
+        'has_next': len(results) > page_size,
+        'too_short': bool(query) and not search.search_terms(query),
+        'min_length': search.MIN_TERM_LENGTH,
+    })
+
+
+@staff_member_required
+def request_stats_view(request):
+    """Staff-only JSON dump of the per-view latency percentiles.
+
+    Filled by QueryInstrumentationMiddleware when VDS_INSTRUMENTATION is on;
+    the numbers are per process, not aggregated across workers.
+    """
+    return JsonResponse({
+        'enabled': getattr(settings, 'VDS_INSTRUMENTATION', False),
+        'views': request_stats.snapshot(),
+    })